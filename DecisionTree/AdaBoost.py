@@ -0,0 +1,91 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# AdaBoost（多分类的SAMME）：每一轮用当前的样本权重训练一棵浅的决策树（默认是CART树桩），
+# 错分样本的权重乘以exp(alpha)，alpha = learning_rate * (ln((1 - err) / err) + ln(K - 1))，预测时按alpha加权投票
+# 各轮的数据都相同，只有样本权重不同：编码、判断连续性、量化和预先排序只在Base.prepare中做一次，
+# 每轮的Base.refit只复制一份排好序的样本下标，训练集上的预测直接由各叶节点的样本范围得到
+from DecisionTree.CvDTree import CartTree
+import numpy as np
+
+
+class AdaBoost:
+    """
+    self.tree_cls, self.tree_kwargs: 弱分类器的决策树类型（CartTree, ID3Tree, C45Tree）及其参数，默认max_depth=1（树桩）
+    self.n_estimators: 最多的轮数，某一轮加权错误率为0或不比随机猜好时提前停止
+    self.learning_rate: 各轮alpha的缩放系数
+    self.trees, self.alphas: 各轮的树编译成的FlatTree（不带encoder，预测时输入只编码一次）和它们的权重
+    self.errors: 各轮的加权错误率
+    self.labels: 训练集中出现过的所有类别（排好序），各棵树的类别编码是其中的位置
+    self.encoder: 所有树共用的离散特征编码
+    """
+    def __init__(self, tree_cls=CartTree, n_estimators=50, learning_rate=1.0, **tree_kwargs):
+        self.tree_cls, self.tree_kwargs = tree_cls, dict({"max_depth": 1}, **tree_kwargs)
+        self.n_estimators, self.learning_rate = n_estimators, learning_rate
+        self.trees, self.alphas, self.errors = [], [], []
+        self.labels = self.encoder = None
+
+    def __str__(self):
+        return "AdaBoost ({})".format(len(self.trees))
+
+    __repr__ = __str__
+
+    # feature_bound和max_bins与Base.fit的含义相同；提升一般用全部特征，所以feature_bound默认为None
+    def fit(self, x, y, sample_weight=None, feature_bound=None, max_bins=None, eps=1e-8):
+        x = np.atleast_2d(x)
+        self.labels, y = np.unique(y, return_inverse=True)
+        n, n_class = len(y), len(self.labels)
+        w = np.full(n, 1 / n) if sample_weight is None else np.asarray(sample_weight, dtype=float) / np.sum(
+            sample_weight)
+        tree = self.tree_cls(**self.tree_kwargs).prepare(x, y, max_bins)
+        self.encoder = tree.encoder
+        self.trees, self.alphas, self.errors = [], [], []
+        try:
+            for _ in range(self.n_estimators):
+                tree.refit(w, eps, feature_bound)
+                wrong = tree._train_pred != y
+                err = np.sum(w[wrong])
+                # 不比随机猜好时这一轮的树不要（第一轮除外，否则没有分类器）
+                if err >= 1 - 1 / n_class and self.trees:
+                    break
+                self.trees.append(self._compile(tree))
+                self.errors.append(float(err))
+                if err <= 0:
+                    self.alphas.append(1.0)
+                    break
+                alpha = self.learning_rate * (np.log((1 - err) / err) + np.log(n_class - 1))
+                self.alphas.append(float(alpha))
+                w = w * np.exp(alpha * wrong)
+                w /= np.sum(w)
+        finally:
+            tree.release()
+        return self
+
+    # 所有树共用一个encoder，FlatTree中不再保留，预测时输入只编码一次
+    @staticmethod
+    def _compile(tree):
+        flat = tree.compile()
+        flat.encoder = None
+        return flat
+
+    # 各类别的加权票数(样本数, 类别数)
+    def decision_function(self, x):
+        x = self.encoder.transform(x)
+        res = np.zeros((len(x), len(self.labels)))
+        rows = np.arange(len(x))
+        for tree, alpha in zip(self.trees, self.alphas):
+            res[rows, tree.predict(x)] += alpha
+        return res
+
+    def predict(self, x):
+        return self.labels[np.argmax(self.decision_function(x), axis=1)]
+
+    def predict_proba(self, x):
+        score = self.decision_function(x)
+        return score / np.maximum(score.sum(axis=1, keepdims=True), 1e-12)
+
+    def estimate(self, x, y, get_raw_result=False):
+        y = np.array(y)
+        if not get_raw_result:
+            print("Acc: {:8.6} %".format(100 * np.sum(self.predict(x) == y) / len(y)))
+        else:
+            return np.average(self.predict(x) == y)
@@ -0,0 +1,162 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# 性能基准：在合成的连续、离散和混合数据上，按行数、列数、离散特征的取值个数、max_depth和feature_bound的各种组合
+# 训练ID3Tree, C45Tree, CartTree，记录训练时间（其中剪枝的时间）、批量和逐行预测的吞吐量以及训练时的峰值内存，存成JSON
+# 同一份配置在不同的提交上各跑一次，再用compare比较两份结果，就能看出对Cluster或Node的修改是变快了还是变慢了
+#     python -m DecisionTree.Benchmark --rows 1000 10000 --cols 8 --out new.json
+#     python -m DecisionTree.Benchmark --compare old.json new.json
+from DecisionTree.CvDTree import ID3Tree, C45Tree, CartTree
+from itertools import product
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+import numpy as np
+
+TREES = {"ID3Tree": ID3Tree, "C45Tree": C45Tree, "CartTree": CartTree}
+
+# 每组结果中用来识别配置的字段，compare按这些字段对齐两份结果
+KEYS = ("tree", "kind", "rows", "cols", "cardinality", "max_depth", "feature_bound")
+
+
+# 合成数据：kind为continuous（标准正态）、categorical（0到cardinality-1的整数）或mixed（前一半列连续，其余离散）
+# 类别由前几列决定再加上一些噪声，返回x, y和各列是否连续
+def make_data(kind, rows, cols, cardinality=8, n_class=2, noise=0.1, seed=0):
+    rng = np.random.RandomState(seed)
+    n_cont = {"continuous": cols, "categorical": 0, "mixed": cols // 2}[kind]
+    whether_continuous = np.arange(cols) < n_cont
+    x = np.empty((rows, cols))
+    x[:, :n_cont] = rng.randn(rows, n_cont)
+    x[:, n_cont:] = rng.randint(cardinality, size=(rows, cols - n_cont))
+    # 连续特征的贡献是随机的线性组合，离散特征的贡献是每个取值随机的得分
+    score = x[:, :n_cont][:, :4].dot(rng.randn(min(4, n_cont)))
+    for feat in range(n_cont, min(cols, n_cont + 4)):
+        score += rng.randn(cardinality)[x[:, feat].astype(int)]
+    y = np.searchsorted(np.quantile(score, np.linspace(0, 1, n_class + 1)[1:-1]), score)
+    flip = rng.rand(rows) < noise
+    y[flip] = rng.randint(n_class, size=int(np.sum(flip)))
+    return x, y, whether_continuous
+
+
+# 跑一组配置，训练repeat次取最快的一次；memory为True时另外在tracemalloc下训练一次，记录峰值内存
+def run_one(tree, kind, rows, cols, cardinality=8, max_depth=None, feature_bound=None, repeat=1, memory=True,
+            seed=0):
+    x, y, whether_continuous = make_data(kind, rows, cols, cardinality, seed=seed)
+
+    def _fit():
+        _tree = TREES[tree](max_depth=max_depth, whether_continuous=whether_continuous, stats=True,
+                            random_state=seed)
+        _tree.fit(x, y, feature_bound=feature_bound)
+        return _tree
+
+    fitted = [_fit() for _ in range(repeat)]
+    best = min(fitted, key=lambda _tree: _tree.stats.timings["fit"])
+    res = {"tree": tree, "kind": kind, "rows": rows, "cols": cols, "cardinality": cardinality,
+           "max_depth": max_depth, "feature_bound": feature_bound,
+           "fit_seconds": best.stats.timings["fit"], "prune_seconds": best.stats.timings.get("prune", 0.0),
+           "split_search_seconds": best.stats.timings.get("split_search", 0.0),
+           "partition_seconds": best.stats.timings.get("partition", 0.0),
+           "n_nodes": len(best.nodes), "height": best.root.height,
+           "thresholds": best.stats.counters.get("thresholds", 0)}
+    # 编译FlatTree的时间不算在预测里
+    best.compile()
+    _start = time.perf_counter()
+    pred = best.predict(x)
+    res["predict_rows_per_second"] = rows / max(time.perf_counter() - _start, 1e-9)
+    res["train_acc"] = float(np.mean(pred == y))
+    _rows = x[:min(rows, 2000)].tolist()
+    function = best.to_function()
+    _start = time.perf_counter()
+    for row in _rows:
+        function(row)
+    res["predict_one_us"] = (time.perf_counter() - _start) / len(_rows) * 1e6
+    if memory:
+        tracemalloc.start()
+        try:
+            _fit()
+            res["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return res
+
+
+# 对各参数列表的笛卡尔积逐一运行，离散特征的取值个数只对categorical和mixed数据有意义
+def run(trees=("ID3Tree", "C45Tree", "CartTree"), kinds=("continuous", "categorical", "mixed"), rows=(1000, 10000),
+        cols=(8,), cardinality=(8,), max_depth=(None,), feature_bound=(None,), repeat=1, memory=True, seed=0,
+        verbose=True):
+    results = []
+    for _tree, _kind, _rows, _cols, _card, _depth, _bound in product(
+            trees, kinds, rows, cols, cardinality, max_depth, feature_bound):
+        if _kind == "continuous" and _card != cardinality[0]:
+            continue
+        res = run_one(_tree, _kind, _rows, _cols, _card, _depth, _bound, repeat, memory, seed)
+        results.append(res)
+        if verbose:
+            print("{tree:8} {kind:11} rows={rows:<8} cols={cols:<4} card={cardinality:<4} depth={max_depth} "
+                  "bound={feature_bound}  fit {fit_seconds:8.3f}s  prune {prune_seconds:7.3f}s  "
+                  "predict {predict_rows_per_second:12.0f} rows/s".format(**res))
+    return {"meta": _meta(), "results": results}
+
+
+def _meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit or None, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+# 比较两份结果中相同配置的各项指标，返回[(配置, {指标: 新/旧}), ...]，大于1表示新的结果数值更大
+def compare(old, new, metrics=("fit_seconds", "prune_seconds", "predict_rows_per_second", "peak_mb")):
+    old_res = {tuple(res[key] for key in KEYS): res for res in old["results"]}
+    rows = []
+    for res in new["results"]:
+        key = tuple(res[key] for key in KEYS)
+        if key not in old_res:
+            continue
+        rows.append((dict(zip(KEYS, key)), {
+            metric: res[metric] / old_res[key][metric] for metric in metrics
+            if metric in res and old_res[key].get(metric)}))
+    return rows
+
+
+def _none_or(cast):
+    return lambda value: None if value.lower() == "none" else cast(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DecisionTree benchmark")
+    parser.add_argument("--trees", nargs="+", default=["ID3Tree", "C45Tree", "CartTree"], choices=sorted(TREES))
+    parser.add_argument("--kinds", nargs="+", default=["continuous", "categorical", "mixed"],
+                        choices=["continuous", "categorical", "mixed"])
+    parser.add_argument("--rows", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--cols", nargs="+", type=int, default=[8])
+    parser.add_argument("--cardinality", nargs="+", type=int, default=[8])
+    parser.add_argument("--max-depth", nargs="+", type=_none_or(int), default=[None])
+    parser.add_argument("--feature-bound", nargs="+", type=_none_or(str), default=[None],
+                        help="None, log或整数")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="不在tracemalloc下测峰值内存")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="结果存成JSON的路径")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="比较两份JSON结果")
+    args = parser.parse_args(argv)
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            for config, ratios in compare(json.load(f_old), json.load(f_new)):
+                print(" ".join("{}={}".format(key, config[key]) for key in KEYS), " ".join(
+                    "{} x{:.3f}".format(metric, ratio) for metric, ratio in ratios.items()))
+        return
+    feature_bound = [int(b) if b is not None and b.isdigit() else b for b in args.feature_bound]
+    report = run(args.trees, args.kinds, args.rows, args.cols, args.cardinality, args.max_depth, feature_bound,
+                 args.repeat, not args.no_memory, args.seed)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 from DecisionTree.Cluster import Cluster
+from DecisionTree.FlatTree import FlatTree
+from itertools import count
 import numpy as np
+import heapq
 
 # affected是向上移动，pruned是下移（也就是如果当前节点要剪枝，当前节点的父节点affected=True, 而其子节点pruned=True)
 #  更新_parent=self.parent 会导致，self.root.height==1这显然是错误的，也会导致draw(),list index out of range
@@ -19,19 +22,21 @@ import numpy as np
 # 这里处理的数据是数值化后的
 class Node:
     """
-    self._x,self._y：存放数据
+    self._start,self._stop: 该节点的样本在tree._orders各行中的范围[start, stop)，节点本身不保存数据
+    self._n,self._counts: 该节点的样本数和各类别的样本数（有样本权重时是各类别的权重之和，节点的类别按它确定）
     self.base：对数的基底
     self.chaos：当前的不确定度
     self.criterion : 记录该节点用来计算信息增益所用的方法
     self.category: 记录该节点所属的类别
     self.left_child,self.right_child：记录节点的左右子节点
-    self._children,self.leafs: 记录该节点的所有子节点和叶节点(大字典里存小字典)字典可以用pop删除任意元素
-    self.sample_weight: 记录样本权重
+    self._children: 记录该节点的所有子节点
+    self.n_leafs,self.leaf_cost,self._height: 以该节点为根的子树的叶节点数、各叶节点的样本数*不确定度之和、高度，
+    生成结束后由update_aggregates统计一次，剪枝时只沿着到根节点的路径更新
     self.wc: 记录各个维度的特征是否是连续的列表(whether continuous)
     self.tree: 记录该节点所属的树
     self.feature_dim: 记录作为划分标准的特征的维度（作为划分标准的特征）
-    self.tar: 针对连续型特征和cart，记录二分标准
-    self.feats: 记录该节点所能进行选择的作为划分标准的特征的维度(self._x[feat]说明指定就是特征)
+    self.tar: 针对连续型特征和cart，记录二分标准（cart离散特征的二分标准是分到左边的取值组成的frozenset）
+    self.feats: 记录该节点所能进行选择的作为划分标准的特征的维度
     obviously, on one road the same feature can't be choose twice.因此生成新节点时需要减去上一个被选属性
     self.feats最初是所有属性，self.depth+1,self.feats数目减一
     self.parent: 记录该节点的父节点
@@ -45,12 +50,13 @@ class Node:
     """
     def __init__(self, tree=None, base=2, chaos=None, depth=0,
                  parent=None, is_root=True, prev_feats="Root"):
-        self._x = self._y = None
+        self._start = self._stop = self._n = 0
+        self._counts = None
         self.base, self.chaos = base, chaos
         self.criterion = self.category = None
         self.left_child = self.right_child = None
-        self._children, self.leafs = {}, {}  # _children 和leafs存在dict中的，可以用pop弹出不需要的信息。来剪枝,{0:{},1:{}}
-        self.sample_weight = None
+        self._children = {}
+        self.n_leafs, self.leaf_cost, self._height = 1, 0, 1
         self.wc = None
         self.tree = tree  # label_dict,y_transformer,max_depth,feature_sets,reduce_nodes,layers,nodes,max_depth
         # 如果传入了TREE就进行相应的初始化
@@ -110,28 +116,35 @@ class Node:
         } if (self.is_cart or self.is_continuous) else self._children
     # if is_cart or continuous return left and right child,else return _children
 
-    # 递归定义height属性
     # 叶节点高度都定义为1，其余节点高度定义为最高的子节点的高度+1
+    # 不再递归计算，而是返回update_aggregates和prune维护的缓存
     @property
     def height(self):
-        # 如果当前节点的标记类别不为空，也就是叶节点，叶节点高度都为1，返回1
-        # print("children: {}\n".format(self.children))
+        return self._height
+
+    # 由子节点的统计量重新计算该节点的叶节点数、叶节点代价之和与高度
+    # 叶节点记为(1, 样本数*不确定度, 1)，没有样本（没有继续生成）的子节点记为(0, 0, 1)
+    def _aggregate(self):
         if self.category is not None:
-            return 1
-        # 否则返回1+最大子节点的高度
-        # if self.tree.max_depth is not None:  # AttributeError: 'NoneType' object has no attribute 'max_depth'
-            # 如果cut_tree那么哪里还有tree呢，无论max_depth
-            # return self.tree.max_depth
+            self.n_leafs, self.leaf_cost, self._height = 1, self.chaos * self._n, 1
+        elif self.feature_dim is None:
+            self.n_leafs, self.leaf_cost, self._height = 0, 0, 1
         else:
-            return 1 + max([_child.height if _child is not None else 0 for _child in self.children.values()])
-
-    # 定义信息字典属性，记录该节点的主要信息
-    # 在更新各个Node的叶节点时，被记录进各个self.leafs属性的就是该字典
-    # property 的优点在于调用的时候不需要加后面的括号
-    # info_dic store the leaf node's message % _parent.leafs[id(self)] = self.info_dic
-    @property
-    def info_dic(self):
-        return {"chaos": self.chaos, "y": self._y}
+            _children = [_child for _child in self.children.values() if _child is not None]
+            self.n_leafs = sum(_child.n_leafs for _child in _children)
+            self.leaf_cost = sum(_child.leaf_cost for _child in _children)
+            self._height = 1 + max([_child._height for _child in _children] or [0])
+
+    # 按后序（先子节点后父节点）统计以该节点为根的子树中各节点的统计量，用栈代替递归
+    def update_aggregates(self):
+        _stack, _order = [self], []
+        while _stack:
+            node = _stack.pop()
+            _order.append(node)
+            if node.category is None:
+                _stack += [_child for _child in node.children.values() if _child is not None]
+        for node in reversed(_order):
+            node._aggregate()
 
     # 实现生成算法的准备工作，定义停止生成的准则，定义停止后该节点的行为
     # 定义停止准则1：当特征维度(样本数)为0或当前Node的数据几属于同一类别
@@ -141,7 +154,7 @@ class Node:
 
     def stop1(self, eps):
         if(
-            self._x.shape[1] == 0 or len(self.feats) == 1 or(self.chaos is not None and self.chaos <= eps)
+            self.tree.n_dim == 0 or len(self.feats) == 1 or(self.chaos is not None and self.chaos <= eps)
                 or (self.tree.max_depth is not None and self._depth >= self.tree.max_depth)
         ):
             # 定义处理停止情况的方法，核心思想就是把该Node转化为一个叶节点
@@ -161,43 +174,23 @@ class Node:
     # 利用bincount方法定义根据数据生成该Node所属类别的方法
     def get_category(self):
         # np.argmax(a,axis=None)返回最大值对应的索引,np.bincount是从0开始，所以argmax对应的也就是位置了，即类别
-        return np.argmax(np.bincount(self._y))
+        return np.argmax(self._counts)
 
     def _handle_terminate(self):
-        # 首先要生成该Node所属的类
+        # 生成该Node所属的类，各节点的统计量在生成结束后由update_aggregates一次算好
         self.category = self.get_category()
-        # 然后一路回溯，更新父节点，等等，记录叶节点的的属性leafs
-        # id(o)返回地址
-        _parent = self.parent  # _parent = self -> _parent=self.parent
-        while _parent is not None:
-            _parent.leafs[id(self)] = self.info_dic
-            _parent = _parent.parent
 
     # 局部剪枝
     # 定义一个方法使其能将一个有子节点的Node转化为叶节点（局部剪枝）
     # 定义一个方法使其能挑选出最好的划分标准
     # 定义一个方法使其能根据划分标准进行生成
     def prune(self):
-        """把当前节点变成叶节点，当前节点的子节点，叶节点清空
-        重新定义当前属性值，并通过递归对父节点，父节点的父节点的叶节点更新
+        """把当前节点变成叶节点，当前节点的子节点清空
+        重新定义当前属性值，并沿着到根节点的路径更新各父节点的统计量（叶节点数、叶节点代价之和、高度）
         但是当前节点还是存在，并没有从self.tree.nodes中删除
         """
         # 调用相应方法计算该Node所属类别
         self.category = self.get_category()
-        # 记录由于该Node转化为叶节点而剪去的、下属的叶节点
-        _pop_lst = [key for key in self.leafs]
-        # 然后一路回溯，更新各个parent的属性leafs（使用id作为key以避免重复）
-        # _parent = self
-        _parent = self.parent  # 对所有当前节点的父节点标记
-        while _parent is not None:
-            _parent.affected = True
-            for _k in _pop_lst:
-                # 删去由于局部剪枝而被剪掉的叶节点
-                _parent.leafs.pop(_k)  # KeyError
-            _parent.leafs[id(self)] = self.info_dic
-            _parent = _parent.parent  # self.parent -> _parent.parent
-            # _parent.affected = True  # AttributeError: 'NoneType' object has no attribute 'affected'
-        #     根节点的parent=None,这就是问题所在
         # 调用mark_pruned方法将自己所有的子节点、子节点的子节点
         # 的pruned的属性置为True，因为他们都被’剪掉‘了
         self.mark_pruned()
@@ -205,135 +198,302 @@ class Node:
         self.feature_dim = None
         self.left_child = self.right_child = None
         self._children = {}
-        self.leafs = {}
+        _d_leafs, _d_cost = 1 - self.n_leafs, self.chaos * self._n - self.leaf_cost
+        self._aggregate()
+        # 然后一路回溯，标记并更新各个parent
+        _parent = self.parent
+        while _parent is not None:
+            _parent.affected = True
+            _parent.n_leafs += _d_leafs
+            _parent.leaf_cost += _d_cost
+            _parent._height = 1 + max([_child._height for _child in _parent.children.values() if _child is not None])
+            _parent = _parent.parent
 
     def mark_pruned(self):
-        self.pruned = True
-        # 遍历各个子节点
-        for _child in self.children.values():
-            # 如果当前的子节点不是None的话，递归调用mark_pruned方法
-            # 连续型特征和CART算法有可能导致children中出现None，因为此时children有left_child和right_child组成
-            # 他们有可能是None
-            if _child is not None:
-                _child.mark_pruned()
-
-    def fit(self, x, y, sample_weight, feature_bound=None, eps=1e-8):
+        # 遍历各个子节点，用栈代替递归
+        # 连续型特征和CART算法有可能导致children中出现None，因为此时children有left_child和right_child组成
+        _stack = [self]
+        while _stack:
+            node = _stack.pop()
+            node.pruned = True
+            _stack += [_child for _child in node.children.values() if _child is not None]
+
+    def fit(self, start, stop, feature_bound=None, eps=1e-8):
         """
-        fit 是寻找最佳增益的特征维度和划分值，更新相关属性，并且判断是否局部剪枝,把当前节点变成叶节点
-        然后调用gen_children对数据分割，然后重复调用fit，实现生成整个决策树。
+        fit 从该节点开始生成整棵（子）树：不再递归，而是用一个优先队列记录待划分的节点
+        每个节点先调用_find_split寻找最佳增益的特征维度和划分值（满足停止准则时变成叶节点），
+        然后依次取出队列中的节点，调用_gen_children对数据分割，再对各子节点寻找划分
+        数据由tree共享（tree._x, tree._y, tree._w），该节点的样本是tree._orders各行中[start, stop)的部分
+        tree.max_leaf_nodes不为None时，按增益（乘以样本数）从大到小划分，叶节点数达到上限就停止划分；
+        否则按深度优先的顺序划分
         """
-        self._x, self._y = np.atleast_2d(x), np.array(y)
-        self.sample_weight = sample_weight
-        # 若满足第一停止准则，退出函数体
-        if self.stop1(eps):
-            return
-        # 用该节点的数据实例化Cluster类以计算各种信息量
-        _cluster = Cluster(self._x, self._y, self.sample_weight, self.base)
+        _budget, _stats = self.tree.max_leaf_nodes, self.tree.stats
+        _heap, _counter, _n_leafs = [], count(), 1
+
+        def _push(node, _start, _stop, _hist=None):
+            if _stats is None:
+                _split = node._find_split(_start, _stop, feature_bound, eps, _hist)
+            else:
+                with _stats.timer("split_search", node._depth):
+                    _split = node._find_split(_start, _stop, feature_bound, eps, _hist)
+            if _split is not None:
+                _key = -_split[0] * node._n if _budget is not None else -next(_counter)
+                heapq.heappush(_heap, (_key, next(_counter), node, _split))
+
+        _push(self, start, stop)
+        while _heap:
+            _, _, node, _split = heapq.heappop(_heap)
+            _gain, _feature, _tar, _chaos_lst, _cluster, _hist, _n_children = _split
+            # 再划分就会超出叶节点数的上限，该节点直接变成叶节点
+            if _budget is not None and _n_leafs + _n_children - 1 > _budget:
+                node._handle_terminate()
+                _n_leafs -= node.parent._merge() if node.parent is not None else 0
+                continue
+            # 更新相关属性
+            node.feature_dim, node.tar = _feature, _tar
+            # 调用根据划分标准进行生成的方法，之前是条件熵的生成子节点后就称为了信息熵，计算方式一致，集合大小变了而已
+            if _stats is None:
+                _children = node._gen_children(_chaos_lst, _cluster, _hist)
+            else:
+                with _stats.timer("partition", node._depth):
+                    _children = node._gen_children(_chaos_lst, _cluster, _hist)
+                _stats.add("splits")
+                _stats.add("nodes", len(_children))
+            _n_leafs += len(_children) - 1
+            # 子节点逆序入栈，深度优先时先生成左（第一个）子节点
+            for child, _start, _stop, _child_hist in _children[::-1]:
+                _push(child, _start, _stop, _child_hist)
+            _n_leafs -= node._merge()
+        # 调用tree的相关方法，将被剪掉的Node从Tree的记录所有Nodes中出去
+        self.tree.reduce_nodes()
+        self.update_aggregates()
+
+    # 如果左右孩子都是叶节点且所属类别一样，那就将他们合并，亦进行局部剪枝
+    # 合并后父节点可能也满足条件，所以一路向上检查，返回合并的次数
+    def _merge(self):
+        node, merged = self, 0
+        while node is not None and node.category is None and (node.is_cart or node.is_continuous) and (
+                node.left_child.category is not None
+        ) and (
+                node.left_child.category == node.right_child.category):
+            node.prune()
+            node, merged = node.parent, merged + 1
+        return merged
+
+    # 寻找该节点最佳增益的特征维度和划分值
+    # 满足停止准则时把该节点变成叶节点并返回None，否则返回(增益, 特征维度, 划分值, 熵表, cluster, 直方图, 子节点数)
+    def _find_split(self, start, stop, feature_bound=None, eps=1e-8, hist=None):
+        """hist: 直方图模式下该节点各连续特征的直方图，为None时由该节点的数据计算"""
+        self._start, self._stop, self._n = start, stop, stop - start
+        _indices = self.tree._orders[0, start:stop]
+        _w = None if self.tree._w is None else self.tree._w[_indices]
+        self._counts = np.bincount(self.tree._y[_indices], weights=_w, minlength=len(self.tree.label_dict))
+        # 用该节点的样本下标实例化Cluster类以计算各种信息量，不复制数据
+        _cluster = Cluster(self.tree._x, self.tree._y, self.tree._w, self.base, indices=_indices)
+        _cluster.stats = self.tree.stats
+        # 根节点的不确定度要在停止准则之前算好，根节点直接成为叶节点时也要用它计算代价
         if self.is_root:
             if self.criterion == 'gini':
                 self.chaos = _cluster.gini()
             else:
                 self.chaos = _cluster.ent()
+        # 若满足第一停止准则，退出函数体
+        if self.stop1(eps):
+            return None
+        # 直方图模式（tree.bin_edges不为None）下，连续特征的分割在各箱的类别直方图上进行
+        if hist is None and self.tree.bin_edges is not None and len(self.tree.hist_feats) > 0:
+            hist = _cluster.histogram(self.tree.hist_feats, self.tree.max_bins, len(self.tree.label_dict))
         _max_gain, _chaos_lst = 0, []  # 最佳增益，熵表
         _max_feature = None  # 最大增益的属性维度,返回给feature_dim
         _max_tar = None  # 最佳划分二分类分割点,返回给self.tar
-        # 遍历还能选择的特征
+        _n_children = 2
+        tmp_feat = self._candidate_feats(feature_bound)
+
+        # tmp_feat 存的是原x中的一个列，对应同一个属性
+        # tree._executor不为None时各特征在线程池中同时计算（只读共享该节点的数据），再按原来的顺序取最佳增益
+        _executor = self.tree._executor
+        # 极端随机树的随机数在这里一次抽好，多线程时结果也不受计算顺序的影响
+        _u = self._random_u(len(tmp_feat))
+
+        # 逐点扫描模式下的极端随机树：各连续特征的随机阈值一起计算，比逐个特征计算少了很多次函数调用
+        _done = {}
+        if self.tree.splitter == "random" and hist is None:
+            _cont = [i for i, feat in enumerate(tmp_feat) if self.wc[feat]]
+            if _cont:
+                _done = dict(zip([tmp_feat[i] for i in _cont], _cluster.random_bin_split(
+                    [tmp_feat[i] for i in _cont], _u[_cont], self.criterion, self.tree.min_samples_leaf)))
+
+        def _eval(feat, u=None):
+            if feat in _done:
+                return _done[feat] + (2,)
+            return self._eval_feature(feat, _cluster, hist, start, stop, u)
+
+        if _executor is not None and len(tmp_feat) > 1:
+            _results = _executor.map(_eval, tmp_feat, _u)
+        else:
+            _results = map(_eval, tmp_feat, _u)
+        for feat, (_tmp_gain, _tmp_tar, _tmp_chaos_lst, _tmp_n_children) in zip(tmp_feat, _results):
+            if _tmp_gain > _max_gain:
+                (_max_gain, _chaos_lst) = (_tmp_gain, _tmp_chaos_lst)
+                _max_feature, _max_tar, _n_children = feat, _tmp_tar, _tmp_n_children
 
-        # 为了实现随机森林，加入feature_bound，实现随机的作用
+        # 若满足第二停止条件，就退出函数体
+        if self.stop2(max_gain=_max_gain, eps=eps):
+            return None
+        return _max_gain, _max_feature, _max_tar, _chaos_lst, _cluster, hist, _n_children
 
+    # 遍历还能选择的特征
+    # 为了实现随机森林，加入feature_bound，实现随机的作用
+    def _candidate_feats(self, feature_bound=None):
         feat_len = len(self.feats)
         if feature_bound is None:
             indices = range(0, feat_len)
         elif feature_bound == "log":
             # np.random.permutation(n) 对0，1，...n-1打乱循序，返回打乱后的结果。当然不同于shuffle
-            indices = np.random.permutation(feat_len)[: max(1, int(np.log(feat_len)))]
+            indices = self.tree.rng.permutation(feat_len)[: max(1, int(np.log(feat_len)))]
         else:
-            indices = np.random.permutation(feat_len)[: feature_bound]
-        tmp_feat = [self.feats[i] for i in indices]
-
-        # tmp_feat 存的是原x中的一个列，对应同一个属性
-        # update: for feat in self.feats:
-        for feat in tmp_feat:
-            # feat就是取这一列中的元素，现在来找分割点集
-            # 我觉得直接对这列元素排序，然后求和取平均就可以了
-            # 如果是连续型特征或者是CART算法，需要另外计算二分标准的取舍集合
-            if self.wc[feat]:
-                _features = self.tree.feature_sets[feat]  # set(self._x.T[feat])
-                _features = np.array(list(_features), dtype=float)
-                _set = (_features[:-1] + _features[1:]) * 0.5
-            else:  # 不连续且是cart时
-                if self.is_cart:
-                    _set = self.tree.feature_sets[feat]  # set(self._x.T[feat])
-                else:
-                    _set = None
-            # 然后遍历这些二分标准并且调用二类问题相关的计算信息量的方法
-            if self.is_cart or self.wc[feat]:
-                for tar in _set:
-                    _tmp_gain, _tmp_chaos_lst = _cluster.bin_info_gain(
-                        idx=feat, tar=tar, criterion=self.criterion, get_chaos_lst=True, continuous=self.wc[feat])
-                    if _tmp_gain > _max_gain:
-                        (_max_gain, _chaos_lst) = (_tmp_gain, _tmp_chaos_lst)
-                        _max_feature = feat
-                        _max_tar = tar
-            # 离散的ID3和C4.5调用一般计算信息量的算法，这时就没有tar了
-            else:
-                _tmp_gain, _tmp_chaos_lst = _cluster.info_gain(
-                    idx=feat, criterion=self.criterion, get_chaos_lst=True)  # , features=self.tree.feature_sets[feat]
-                if _tmp_gain > _max_gain:
-                    (_max_gain, _chaos_lst) = (_tmp_gain, _tmp_chaos_lst)
-                    _max_feature = feat
-
-        # 若满足第二停止条件，就退出函数体
+            indices = self.tree.rng.permutation(feat_len)[: feature_bound]
+        return [self.feats[i] for i in indices]
+
+    # tree.splitter为"random"（极端随机树）时，为每个候选特征抽取tree.n_thresholds个[0, 1)中的随机数，用来确定随机的阈值
+    # 否则返回全是None的列表
+    def _random_u(self, n_feats):
+        if self.tree.splitter != "random":
+            return [None] * n_feats
+        return self.tree.rng.rand(n_feats, self.tree.n_thresholds)
+
+    # 流式训练时由该节点的直方图寻找划分，返回值与_find_split相同（没有cluster和直方图，最后一项是各子节点的样本数）
+    # hist: 该节点所有特征的(加权)直方图(总箱数, 类别数)，各特征的箱在binner.offsets中；sizes: 不加权的样本数，没有样本权重时为None
+    # 二分标准直接换回原始取值，生成的树可以直接用原始数据路由
+    def _find_hist_split(self, hist, sizes, binner, feature_bound=None, eps=1e-8):
+        _sizes = hist if sizes is None else sizes
+        _counts = hist[binner.offsets[0]:binner.offsets[1]].sum(axis=0)
+        self._counts = _counts.astype(np.int64) if sizes is None else _counts
+        self._n = int(round(_sizes[binner.offsets[0]:binner.offsets[1]].sum()))
+        _cluster = Cluster(None, None, base=self.base)
+        _cluster.stats = self.tree.stats
+        # 与_find_split相同，根节点直接成为叶节点时也要用它的不确定度计算代价
+        if self.is_root:
+            self.chaos = _cluster.gini(_counts) if self.criterion == 'gini' else _cluster.ent(_counts)
+        if self.stop1(eps):
+            return None
+        _max_gain, _max_feature, _max_tar, _chaos_lst, _child_sizes = 0, None, None, [], []
+        tmp_feat = self._candidate_feats(feature_bound)
+        for feat, u in zip(tmp_feat, self._random_u(len(tmp_feat))):
+            _slice = slice(binner.offsets[feat], binner.offsets[feat + 1])
+            _tmp_gain, _tmp_tar, _tmp_chaos_lst, _tmp_sizes = self._eval_hist_feature(
+                feat, _cluster, hist[_slice], _sizes[_slice].sum(axis=1), binner, u)
+            if _tmp_gain > _max_gain:
+                (_max_gain, _chaos_lst) = (_tmp_gain, _tmp_chaos_lst)
+                _max_feature, _max_tar, _child_sizes = feat, _tmp_tar, _tmp_sizes
         if self.stop2(max_gain=_max_gain, eps=eps):
-            return
-        # 更新相关属性
-        self.feature_dim = _max_feature
-        if self.is_cart or self.wc[_max_feature]:
-            self.tar = _max_tar
-
-            # 调用根据划分标准进行生成的方法，之前是条件熵的生成子节点后就称为了信息熵，计算方式一致，集合大小变了而已
-            self._gen_children(_chaos_lst, feature_bound)
-            # prev_feat:Root
-            # category: left:None, right: None  AttributeError: 'NoneType' object has no attribute 'affected'
-            # 如果左右孩子都是叶节点且所属类别一样，那就将他们合并，亦进行局部剪枝
-            if (
-                    self.left_child.category is not None
-            )and (
-                    self.left_child.category == self.right_child.category):
-
-                self.prune()
-                # 调用tree的相关方法，将被剪掉的该Node的左右子节点，从Tree的记录所有Nodes中出去
-                self.tree.reduce_nodes()
-        else:
-
-            # 调用根据划分标准进行生成的方法
-            self._gen_children(_chaos_lst, feature_bound)
-
-    # Create Node,realize recursion
-    # 生成子节点，不考虑局部修剪，然后递归调用fit生成
-    def _gen_children(self, chaos_lst, feature_bound=None):
+            return None
+        return _max_gain, _max_feature, _max_tar, _chaos_lst, _child_sizes
+
+    # 由某个特征的直方图(该特征的箱数, 类别数)和各箱的样本数计算最佳增益，返回(增益, 划分值, 熵表, 各子节点的样本数)
+    # 多叉时各子节点按tree.feature_sets[feat]的顺序排列；u: 极端随机树的随机数，为None时寻找最佳划分
+    def _eval_hist_feature(self, feat, cluster, hist, sizes, binner, u=None):
+        _min_leaf = self.tree.min_samples_leaf
+        if self.wc[feat]:
+            _gain, _tar, _chaos_lst = cluster.best_hist_split(hist, criterion=self.criterion, min_leaf=_min_leaf,
+                                                              sizes=sizes, u=u)
+            if _tar is None:
+                return 0, None, [], []
+            _left = int(np.sum(sizes[:_tar]))
+            return _gain, binner.edges[feat][_tar - 1], _chaos_lst, [_left, int(np.sum(sizes)) - _left]
+        if self.is_cart:
+            _rows = np.flatnonzero(sizes > 0)
+            _gain, _left, _chaos_lst = cluster.best_subset_split(
+                hist[_rows], criterion=self.criterion, min_leaf=_min_leaf, sizes=sizes[_rows])
+            if _left is None:
+                return 0, None, [], []
+            _n_left = int(np.sum(sizes[_rows[_left]]))
+            return _gain, frozenset(binner.values[feat][_rows[_left]].tolist()), _chaos_lst, [
+                _n_left, int(np.sum(sizes)) - _n_left]
+        # 各箱就是feature_sets[feat]中按顺序排列的各取值
+        if np.any((sizes > 0) & (sizes < _min_leaf)):
+            return 0, None, [], []
+        _gain, _chaos_lst = cluster.table_gain(hist, self.criterion)
+        return _gain, None, _chaos_lst, [int(size) for size in sizes]
+
+    # 计算用某个特征划分该节点的最佳增益，返回(增益, 划分值, 熵表, 子节点数)
+    # 只读取该节点的数据，不修改任何属性，可以在多个线程中同时调用
+    # u: 极端随机树的随机数，给定时连续特征只比较随机抽取的几个阈值
+    def _eval_feature(self, feat, cluster, hist=None, start=0, stop=0, u=None):
+        _max_gain, _max_tar, _chaos_lst, _n_children = 0, None, [], 2
+        # 每个子节点至少要有的样本数
+        _min_leaf = self.tree.min_samples_leaf
+        # feat就是取这一列中的元素，现在来找分割点集
+        # 连续型特征：对该节点的数据排序一次，一趟扫描得到所有相邻取值中点中的最佳二分标准
+        # 直方图模式下则直接扫描该特征的直方图，二分标准是箱的编码
+        if self.wc[feat]:
+            if hist is not None:
+                _sizes = None
+                if _min_leaf > 1 and self.tree._w is not None:
+                    _sizes = np.bincount(cluster.column(feat).astype(np.intp), minlength=self.tree.max_bins)
+                return cluster.best_hist_split(hist[self.tree.hist_slots[feat]], criterion=self.criterion,
+                                               min_leaf=_min_leaf, sizes=_sizes, u=u) + (2,)
+            if u is not None:
+                return cluster.random_bin_split([feat], [u], criterion=self.criterion, min_leaf=_min_leaf)[0] + (2,)
+            # 该特征预先排好序的样本下标，划分子节点时保持有序，这里不用再排序
+            _order = self.tree._orders[self.tree.order_slots[feat], start:stop]
+            return cluster.best_bin_split(
+                idx=feat, criterion=self.criterion, order=_order, min_leaf=_min_leaf) + (2,)
+        # 离散特征训练时已编码为0到取值个数-1的整数，列联表的各行就是各编码
+        _table, _sizes = cluster.con_table(idx=feat, n_values=len(self.tree.feature_sets[feat]))
+        # 不连续且是cart时，二分标准是分到左边的取值（编码）集合：只看该节点中出现过的取值，按类别比例排序后一趟扫描
+        if self.is_cart:
+            _rows = np.flatnonzero(_sizes > 0)
+            _max_gain, _left, _chaos_lst = cluster.best_subset_split(
+                _table[_rows], criterion=self.criterion, min_leaf=_min_leaf, sizes=_sizes[_rows])
+            if _left is not None:
+                _max_tar = frozenset(_rows[_left].tolist())
+            return _max_gain, _max_tar, _chaos_lst, 2
+        # 离散的ID3和C4.5调用一般计算信息量的算法，这时就没有tar了
+        if np.any((_sizes > 0) & (_sizes < _min_leaf)):
+            return _max_gain, None, _chaos_lst, 0
+        _max_gain, _chaos_lst = cluster.table_gain(_table, self.criterion)
+        return _max_gain, None, _chaos_lst, int(np.sum(_sizes > 0))
+
+    # Create Node
+    # 生成子节点，不考虑局部修剪，返回各个有样本的子节点及其范围、直方图，由fit继续生成
+    # 不再把数据复制给子节点，而是在tree._orders中原地划分该节点的样本下标，子节点只记录自己的范围
+    def _gen_children(self, chaos_lst, cluster=None, hist=None):
         feat, tar = self.feature_dim, self.tar
         self.is_continuous = continuous = self.wc[feat]
-        # sample = self._x[..., feat]  # x[:,1]=x[...,1]
-        features = self._x.T[feat]
-        #  features改成sample是不是更好,因为这个语句相当于取了x中的一个样本
-        new_feats = self.feats.copy()  # new_feats是原feats的复制，new_feats的变化不影响原feats
+        features = cluster.column(feat)
+        # branch记录每个样本分到第几个子节点
         # 特征取值连续
         if continuous:
-            mark = features < tar  # mark 样本中小于tar的部分
-            marks = [mark, ~mark]  # 互补,masks存放二分类结果
+            branch = (features >= tar).astype(np.intp)  # 小于tar的部分分到左边(0)
         else:  # cart决策树，在特征取值离散时亦二分
+            _codes = features.astype(np.intp)
             if self.is_cart:
-                mark = features == tar
-                marks = [mark, ~mark]
-                self.tree.feature_sets[feat].discard(tar)  # 弃牌？
-            else:  # 一般情况，特征取值离散，ID3，C4.5
-                marks = None
-        if self.is_cart or continuous:
+                _left = np.zeros(len(self.tree.feature_sets[feat]), dtype=bool)
+                _left[list(tar)] = True
+                branch = (~_left[_codes]).astype(np.intp)  # 编码在tar中的分到左边(0)
+            else:  # 一般情况，特征取值离散，ID3，C4.5，编码就是子节点的序号
+                _values = list(range(len(self.tree.feature_sets[feat])))
+                branch = _codes
+        n_branch = 2 if (self.is_cart or continuous) else len(_values)
+        # 先算好子节点的直方图，再划分下标（划分后cluster里的下标就变了）
+        hists = self._children_hist(branch, n_branch, cluster, hist)
+        bounds = self._partition(branch, n_branch)
+        nodes = self._make_children(
+            chaos_lst, [stop - start for start, stop in bounds], None if (self.is_cart or continuous) else _values)
+        return [(node, start, stop, local_hist)
+                for node, (start, stop), local_hist in zip(nodes, bounds, hists) if node is not None]
+
+    # 按划分标准生成各子节点，sizes是各子节点的样本数，返回按划分顺序排列的子节点，没有样本的子节点为None
+    # values: 多叉时各子节点对应的特征取值，二分时为None
+    def _make_children(self, chaos_lst, sizes, values=None):
+        tar, continuous = self.tar, self.is_continuous
+        new_feats = self.feats.copy()  # new_feats是原feats的复制，new_feats的变化不影响原feats
+        if values is None:
             # CART and continuous 是二分类
             # if not continuous,feats=[tar,"+"] else feats=["tar-", "tar+"]
             # [tar,"+"]怎么匹配啊，左边是tar,右边是+
-            feats = [tar, "+"] if not continuous else ["{:6.4}-".format(tar), "{:6.4}+".format(tar)]
+            feats = [tar, "+"] if not continuous else ["{:6.4}-".format(float(tar)), "{:6.4}+".format(float(tar))]
             for feat, side, chaos in zip(feats, ["left_child", "right_child"], chaos_lst):
                 # 用可选的特征维度喂给各新的Node，生成当前节点子节点
                 new_node = self.__class__(
@@ -343,45 +503,61 @@ class Node:
                 setattr(self, side, new_node)  # 将当前Node中的side（也就是将左右孩子的）属性值设为new_node
                 # setattr 从内部赋值
                 # self._children[side] = new_node  self.left_child = new_node
-            for node, feat_mark in zip([self.left_child, self.right_child], marks):
-                # node 对应当前所取节点的子节点，feat_mark对应当前所取的子集[True,False]
-                # feat_mark 对应当前类别的分类结果
-                if self.sample_weight is None:
-                    local_weights = None
-                else:
-                    local_weights = self.sample_weight[feat_mark]
-                    local_weights /= np.sum(local_weights)  # 对样本权重归一化
-                tmp_data, tmp_label = self._x[feat_mark, ...], self._y[feat_mark]
-                # x[1, ...] = x[1,:] 第二行 x[...,1]=x[:,1]第二列
-                if len(tmp_label) == 0:
-                    # 当前节点样本数为0
-                    continue
-                node.feats = new_feats
-                node.fit(tmp_data, tmp_label, local_weights, feature_bound)
+            nodes = [self.left_child, self.right_child]
         # 划分标准是离散特征，需要将ID3或者C4.5,需将该特征对应的维度从新Node的self.feats属性中除去
         # 若算法是CART，需要将二分标准从新Node的二分标准取值集合中除去
-        # 最后对新Node调用fit方法，完成递归
         else:
             # ID3 and C4.5 may not create binary tree,we don't have left and right child.
             new_feats.remove(self.feature_dim)  # from current feats remove feature_dim
-            for feat, chaos in zip(self.tree.feature_sets[self.feature_dim], chaos_lst):
-                feat_mark = features == feat
-                tmp_x = self._x[feat_mark, ...]  # 该特征维度取值为feat_mark对应的样本
-                tmp_y = self._y[feat_mark]
-                if len(tmp_x) == 0:
+            nodes = []
+            for feat, chaos, size in zip(values, chaos_lst, sizes):
+                if size == 0:
+                    nodes.append(None)
                     continue
                 # new node will marked with feat as leaf node's label.
                 new_node = self.__class__(
                     self.tree, self.base, chaos, depth=self._depth + 1,
                     parent=self, is_root=False, prev_feats=feat)
-                new_node.feats = new_feats
                 self.children[feat] = new_node
-                if self.sample_weight is None:
-                    local_weights = None
-                else:
-                    local_weights = self.sample_weight[feat_mark]
-                    local_weights = local_weights / np.sum(local_weights)
-                new_node.fit(tmp_x, tmp_y, local_weights, feature_bound)
+                nodes.append(new_node)
+        for i, size in enumerate(sizes):
+            if size == 0:
+                # 当前节点样本数为0
+                nodes[i] = None
+            else:
+                nodes[i].feats = new_feats
+        return nodes
+
+    # 按样本所属的子节点，对tree._orders每一行的[start, stop)部分做稳定的划分
+    # 各行内部原有的顺序（各特征预先排好的顺序）因此得以保持，返回各子节点的范围
+    def _partition(self, branch, n_branch):
+        start, stop = self._start, self._stop
+        orders, _branch = self.tree._orders, self.tree._branch
+        _branch[orders[0, start:stop]] = branch
+        for row in orders:
+            seg = row[start:stop]
+            seg[:] = seg[np.argsort(_branch[seg], kind="stable")]
+        if self.tree.stats is not None:
+            self.tree.stats.add("bytes_copied", orders.shape[0] * (stop - start) * orders.itemsize)
+        bounds = start + np.concatenate([[0], np.cumsum(np.bincount(branch, minlength=n_branch))])
+        return [(bounds[i], bounds[i + 1]) for i in range(n_branch)]
+
+    # 直方图模式下各子节点的直方图：样本最多的子节点用“父节点直方图 - 其余子节点直方图”得到，不必再统计一遍
+    def _children_hist(self, branch, n_branch, cluster=None, hist=None):
+        if hist is None:
+            return [None] * n_branch
+        sizes = np.bincount(branch, minlength=n_branch)
+        largest = int(np.argmax(sizes))
+        hists, rest = [None] * n_branch, hist.copy()
+        for i in range(n_branch):
+            if i == largest or sizes[i] == 0:
+                continue
+            hists[i] = cluster.histogram(self.tree.hist_feats, self.tree.max_bins, hist.shape[2], branch == i)
+            rest -= hists[i]
+        hists[largest] = rest
+        if self.tree.stats is not None:
+            self.tree.stats.add("hist_bytes", hist.nbytes * int(np.sum(sizes > 0)))
+        return hists
 
     # if the children of current node exist,update current layer,add this node to this layer
     def update_layers(self):
@@ -402,12 +578,12 @@ class Node:
     # 定义当前节点的损失函数（用于ID3和C4.5的剪枝）
     def cost(self, pruned=False):
         if not pruned:  # 有叶节点
-            return sum([leaf["chaos"] * len(leaf["y"]) for leaf in self.leafs.values()])
-        return self.chaos * len(self._y)  # 无叶节点
+            return self.leaf_cost
+        return self.chaos * self._n  # 无叶节点
 
     # 剪枝阈值，希望叶子节点少，剪枝前后的代价变化大（CART剪枝）
     def get_threshold(self):
-        return (self.cost(pruned=True) - self.cost()) / (len(self.leafs) - 1)
+        return (self.cost(pruned=True) - self.cost()) / (self.n_leafs - 1)
 
     def cut_tree(self):
         # make current node's children self.tree=None
@@ -437,7 +613,7 @@ class Node:
                 return self.left_child.predict_one(x)
             return self.right_child.predict_one(x)
         if self.is_cart:
-            if x[self.feature_dim] == self.tar:
+            if x[self.feature_dim] in self.tar:
                 return self.left_child.predict_one(x)
             return self.right_child.predict_one(x)
         else:
@@ -447,7 +623,11 @@ class Node:
                 return self.get_category()
 
     # 对输入数据预测，返回预测结果
+    # 数值型的输入先编译成FlatTree再批量预测，否则逐行预测
     def predict(self, x):  # 在tree.prune_中调用了计算acc，因此我为了形式的一致对它结果数值化
+        x = np.asarray(x)
+        if x.dtype.kind in "biuf":
+            return FlatTree(self, [self.label_dict[i] for i in range(len(self.label_dict))]).predict(x)
         return np.array([self.label_dict[self.predict_one(xx)] for xx in x])
 
     def view(self, indent=4):
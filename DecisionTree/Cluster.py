@@ -9,18 +9,32 @@ from math import log
 class Cluster(object):
     """
     self._x,self._y: 记录数据集的变量
+    self._data,self._labels,self._weights,self._indices: 传入indices时记录整个数据集及该Cluster对应样本的下标
+    self.con_counts: 最近一次con_chaos或bin_con_chaos中各子集的样本数（不加权）
     self._counters: 类别向量的计数器，记录第i类数据的个数
     self._sample_weight: 记录样本权重的属性
     self._con_chaos_cache,self._ent_cache,self._gini_cache: 记录中间结果的属性
     self._base :记录对数的底
+    self.stats: 记录训练统计量的Stats（不记录时为None），由Node在创建后设置
     """
 
-    def __init__(self, x, y, sample_weight=None, base=2):
-        self._x, self._y = x.T, y
+    def __init__(self, x, y, sample_weight=None, base=2, indices=None):
+        # indices不为None时，x,y,sample_weight是整个数据集，该Cluster只统计indices对应的样本，不复制特征矩阵
+        self._data, self._labels, self._weights, self._indices = x, y, sample_weight, indices
+        if indices is not None and y is not None:
+            y = y[indices]
+            sample_weight = sample_weight[indices] if sample_weight is not None else None
+            self._x = None
+        else:
+            self._x = x.T if x is not None else None
+        self._y = y
         # 利用样本权重对类别向量y进行计数
         # np.bincount没有Counter好用，Counter可统计字符,但是没法用样本权重
         # 在运行速度上np.bincount更快
-        if sample_weight is None:
+        if y is None:
+            # 不给定数据时只用于在给定的计数（列联表、直方图）上计算信息量，例如流式训练
+            self._counters = None
+        elif sample_weight is None:
             self._counters = np.bincount(self._y)  # 要提前把Target的元素变成数，不然会报错
             # self._counters = Counter(self._y)
         else:
@@ -28,28 +42,33 @@ class Cluster(object):
             # self._counters = Counter(self._y)
         self._sample_weight = sample_weight  # 样本数*1
         self._con_chaos_cache = self._ent_cache = self._gini_cache = None
+        self.con_counts = None
         self._base = base
+        self.stats = None
 
     def __str__(self):
         return "Cluster"
 
     __repr__ = __str__
 
+    # 获取该Cluster的样本在某个（或某几个）维度上的取值，idx为列表时返回len(idx)*样本数的矩阵
+    def column(self, idx):
+        if self._indices is None:
+            return self._x[idx]
+        if isinstance(idx, (list, tuple, np.ndarray)):
+            return self._data[np.ix_(self._indices, idx)].T
+        return self._data[self._indices, idx]
+
     # 定义信息熵
     def ent(self, ent=None, eps=1e-12):
         # ent是分类情况
-        # 我的想法是这里都是要求ent 为空，不然都没法进行
         # 若已计算过熵（self._ent_cache），且这次调用时没有给定个类别的数目（即ent），就直接调用上次计算的结果
         if self._ent_cache is not None and ent is None:
             return self._ent_cache
-        _len = len(self._y)
-        # if self._ent_cache is None and ent is None,并调用时没有给定各类别数目，就需要自己计算
-        if ent is None:
-            ent = self._counters
         # 使用eps提高算法稳定度
         # 实际上，在对数据集分割时，有些类别的数据可能就不可避免的没有了，这时候需要注意这点
-        _ent_cache = max(eps, -sum([_c/_len * log(_c/_len, self._base) if _c != 0 else 0 for _c in ent]))
-        # 如果调用时没有给各类别样本数，就将计算的熵存下，这两个if语句是可以合并的
+        _ent_cache = float(Cluster.chaos(self._counters if ent is None else ent, "ent", self._base, eps))
+        # 如果调用时没有给各类别样本数，就将计算的熵存下
         if ent is None:
             self._ent_cache = _ent_cache
         return _ent_cache
@@ -60,69 +79,66 @@ class Cluster(object):
         # 若已经有计算过gini_cache，则直接返回gini_cache
         if self._gini_cache is not None and p is None:
             return self._gini_cache
-        _len = len(self._y)
-        if p is None:
-            p = self._counters
-        _gini_cache = max(eps, (1 - sum((_p / _len)**2 if _p != 0 else 0 for _p in p)))
+        _gini_cache = float(Cluster.chaos(self._counters if p is None else p, "gini", self._base, eps))
         if p is None:
             self._gini_cache = _gini_cache
         return _gini_cache
 
+    # 统计该维度（取值，类别）的列联表，features是该维度的取值空间，表的各行按features的顺序排列
+    # 给定n_values时该维度已编码为0到n_values-1的整数，表的各行就是各编码
+    # 返回列联表和各取值的样本数（不加权），不修改实例的属性，可以在多个线程中同时调用
+    def con_table(self, idx, features=None, n_values=None):
+        # 根据输入获取相应维度的向量,获取某个属性的所有值
+        data = self.column(idx)
+        if n_values is not None:
+            features, inverse = range(n_values), data.astype(np.intp)
+        # 如果调用时没有给该维度的取值空间features，就用np.unique得到对应的取值空间
+        elif features is None:
+            features, inverse = np.unique(data, return_inverse=True)
+        else:
+            features = np.array(list(features))
+            order = np.argsort(features, kind="mergesort")
+            inverse = order[np.searchsorted(features[order], data)]
+        n_class = len(self._counters)
+        table = np.bincount(inverse * n_class + self._y, weights=self._sample_weight,
+                            minlength=len(features) * n_class).reshape(len(features), n_class)
+        counts = table.sum(axis=1) if self._sample_weight is None else np.bincount(inverse, minlength=len(features))
+        return table, counts
+
     # 定义计算H(y|A)和 gini(y|A)
     def con_chaos(self, idx, criterion="ent", features=None):
-        # features是当前选择的类别
-        # label_lst: 存放各个类别的集合
-        # tmp_labels: 存放各个类别的数据的集合
-        # chaos_lst: 存放各个类别的条件熵
-        # 根据不同准则调用不同方法
-        if criterion == "ent":
-            _method = lambda cluster: cluster.ent()  # lambda可以将类实例化
-        elif criterion == "gini":
-            _method = lambda cluster: cluster.gini()
-        else:
+        # features是该维度的取值空间，chaos_lst按features的顺序给出各取值对应子集的不确定性
+        # 用一次加权的bincount统计（取值，类别）列联表，再对每一行同时计算不确定性，不再为每个取值生成Cluster
+        if criterion not in ("ent", "gini"):
             raise NotImplementedError("Conditional info criterion '{} not defined".format(criterion))
-        # 根据输入获取相应维度的向量,获取某个属性的所有值
-        data = self._x[idx]
-        # 如果调用时没有给该维度的取值空间features，就调用set函数得到对应的取值空间
-        # 调用set函数耗时，最好预先给定
-        if features is None:
-            features = set(data)
-        # feature = Counter(data).keys()
-        # 返回的是一个列表，列表中的每个元素都是以矩阵，矩阵长度是data的长度
-        # 矩阵中的元素是布尔运算的结果，True or False。列表长度为feature个数
-        # 所以我不懂这个tmp_labels是干啥的iris中是35*150
-        # 获取该维度不同取值对于的数据
-        tmp_labels = [data == feature for feature in features]
-        self._con_chaos_cache = [np.sum(_label) for _label in tmp_labels]  # 返回不同类别数目,如果对他求信息量
-        # self._con_chaos_cache = Counter(data).values()
-        # 获得各个类别
-        label_lst = [self._y[label] for label in tmp_labels]  # _y[label]是一个一维数组，是label中为True值
-        # 以tmp_labels[0]为例，于第一个类别对应的是第三和第三十个样本，因此y[tmp_label[0]]返回第3和第30对应
-        # 的输出0 0
-        res, chaos_lst = 0, []
-        # 遍历各下标和对应的类别向量
-        # data_label is callable? of course
-        for data_label, tar_label in zip(tmp_labels, label_lst):
-            # 获取相应的数据
-            tmp_data = self._x.T[data_label]
-            # data_label对应的样本,因为data_label是一个布尔符号组成的矩阵
-            # 以iris为例，data=x[:,0]有150个元素，tmp_labels[0]中第三个和第三十个是True
-            # 因此返回x中满足True的样本x[2],x[30]
-            # 根据相应数据、类别向量和样本权重计算出不确定性
-            if self._sample_weight is None:
-                # _chaos存放当前类别的熵，可是实际计算ent没有用上tmp_data，只是Cluster初始化有
-                _chaos = _method(Cluster(tmp_data, tar_label, base=self._base))
-            else:
-                _new_weight = self._sample_weight[data_label]
-                _chaos = _method(Cluster(tmp_data, tar_label, _new_weight, base=self._base))
-            # 依概率加权，同时把各个初始条件不确定性记录下来
-            # res 存条件熵，chaos_lst存这个属性中各个类别的熵
-            res += len(tmp_data)/len(data) * _chaos
-            chaos_lst.append(_chaos)
-        return res, chaos_lst
+        table, self.con_counts = self.con_table(idx, features)
+        # 各取值的（加权）样本数，计算信息增益比时要用到
+        self._con_chaos_cache = _len = table.sum(axis=1)
+        chaos_lst = Cluster.chaos(table, criterion, self._base)
+        # 依概率加权，res 存条件熵，chaos_lst存这个属性中各个取值的熵
+        res = float(np.sum(_len / np.sum(_len) * chaos_lst))
+        return res, list(chaos_lst)
+
+    # 由（子集，类别）列联表计算信息增益，返回增益和各子集的不确定性
+    # 不修改实例的属性，可以在多个线程中同时调用
+    def table_gain(self, table, criterion="ent"):
+        if criterion not in ("ent", "ratio", "gini"):
+            raise NotImplementedError("table_gain criterion '{} not defined".format(criterion))
+        _method = "gini" if criterion == "gini" else "ent"
+        if self.stats is not None:
+            self.stats.add("thresholds")
+        _len = table.sum(axis=1)
+        chaos_lst = Cluster.chaos(table, _method, self._base)
+        _gain = float(Cluster.chaos(table.sum(axis=0), _method, self._base)) - float(
+            np.sum(_len / np.sum(_len) * chaos_lst))
+        if criterion == "ratio":
+            _gain /= float(Cluster.chaos(_len, "ent", self._base))
+        return _gain, list(chaos_lst)
 
     # 定义计算信息增益的函数，参数get_chaos_lst用于控制输出
     def info_gain(self, idx, criterion="ent", get_chaos_lst=False, features=None):
+        if self.stats is not None:
+            self.stats.add("thresholds")
         # 根据不同的准则，获取相应的“条件不确定性”
         if criterion in ("ent", "ratio"):
             _con_chaos, _chaos_lst = self.con_chaos(idx, "ent", features)
@@ -136,44 +152,203 @@ class Cluster(object):
             raise NotImplementedError("info_gain criterion '{} not defined".format(criterion))
         return (_gain, _chaos_lst) if get_chaos_lst else _gain
 
+    # 二分问题的列联表：第一行是满足二分标准的子集（离散特征 == tar，连续特征 < tar），第二行是其余样本
+    # 返回列联表和两个子集的样本数（不加权），不修改实例的属性
+    def bin_table(self, idx, tar, continuous=False):
+        data = self.column(idx)
+        # 根据二分标准划分数据，注意要分离离散和连续两种情况讨论
+        tar = data == tar if not continuous else data < tar
+        weights = self._sample_weight[tar] if self._sample_weight is not None else None
+        # 左子集的类别计数，右子集 = 总数 - 左子集
+        left = np.bincount(self._y[tar], weights=weights, minlength=len(self._counters))
+        _left_len = int(np.sum(tar))
+        return np.vstack([left, self._counters - left]), np.array([_left_len, len(tar) - _left_len])
+
     # 定义二分类问题条件的不确定性
     # 参数tar即是二分标准，参数continuous则告诉我们该维度的特征是否连续
     def bin_con_chaos(self, idx, tar, criterion="gini", continuous=False):
         """根据驶入的属性和划分的阈值，返回条件熵，和属性下各取值的熵列表"""
-        # 根据不同准则调用不同方法
+        if criterion not in ("ent", "gini"):
+            raise NotImplementedError("Conditional info criterion '{} not defined".format(criterion))
+        table, self.con_counts = self.bin_table(idx, tar, continuous)
+        self._con_chaos_cache = _len = table.sum(axis=1)
+        chaos_lst = Cluster.chaos(table, criterion, self._base)
+        res = float(np.sum(_len / np.sum(_len) * chaos_lst))
+        return res, list(chaos_lst)
+
+    # 对一组类别计数（每行一组）同时计算不确定性，计数全为0的行视为空集，返回eps
+    @staticmethod
+    def chaos(counts, criterion="ent", base=2, eps=1e-12):
+        counts = np.asarray(counts, dtype=float)
+        _len = counts.sum(axis=-1)
+        p = counts / np.where(_len > 0, _len, 1)[..., None]
         if criterion == "ent":
-            _method = lambda cluster: cluster.ent()  # lambda可以将类实例化
+            _chaos = -np.sum(p * np.log(np.where(p > 0, p, 1)), axis=-1) / log(base)
         elif criterion == "gini":
-            _method = lambda cluster: cluster.gini()
+            _chaos = 1 - np.sum(p ** 2, axis=-1)
         else:
-            raise NotImplementedError("Conditional info criterion '{} not defined".format(criterion))
-        data = self._x[idx]
-        # 根据二分标准划分数据，注意要分离离散和连续两种情况讨论
-        tar = data == tar if not continuous else data < tar
-        # if not continuous data == tar,else data < tar ,return the res to tar.
-        # if not continuous --> cart
-        #  if continuous --> element is continuous
-        tmp_labels = [tar, ~tar]  # 二分类，两个类别是不相容的，一个是True到另一个就是False
-        self._con_chaos_cache = [np.sum(label) for label in tmp_labels]
-        label_lst = [self._y[label] for label in tmp_labels]
-        res = 0
-        chaos_lst = []
-        for data_label, tar_label in zip(tmp_labels, label_lst):
-            tmp_data = self._x.T[data_label]
-            if self._sample_weight is None:
-                _chaos = _method(Cluster(tmp_data, tar_label, base=self._base))
-
-            else:
-                _new_weight = self._sample_weight[data_label]  # _new_weight还需要归一化
-                _chaos = _method(
-                    Cluster(tmp_data, tar_label, _new_weight / np.sum(_new_weight), base=self._base))
-            res += len(tar_label)/len(data) * _chaos
-            chaos_lst.append(_chaos)
-            # print("_chaos:{}, data_label:{}\n".format(_chaos, tmp_labels))
-        return res, chaos_lst
+            raise NotImplementedError("Chaos criterion '{} not defined".format(criterion))
+        return np.maximum(eps, np.where(_len > 0, _chaos, eps))
+
+    # 给定所有候选二分的左子集类别计数left（每行一个候选）和总计数total，一次算出所有候选的增益
+    def bin_scan(self, left, total, criterion="gini"):
+        _method = "gini" if criterion == "gini" else "ent"
+        if criterion not in ("ent", "ratio", "gini"):
+            raise NotImplementedError("bin_scan criterion '{} not defined".format(criterion))
+        if self.stats is not None:
+            self.stats.add("thresholds", len(left))
+        right = total - left
+        left_len, right_len = left.sum(axis=1), right.sum(axis=1)
+        _len = left_len + right_len
+        left_chaos = Cluster.chaos(left, _method, self._base)
+        right_chaos = Cluster.chaos(right, _method, self._base)
+        _gain = Cluster.chaos(total, _method, self._base) - (
+            left_len * left_chaos + right_len * right_chaos) / _len
+        if criterion == "ratio":
+            _gain /= Cluster.chaos(np.column_stack([left_len, right_len]), "ent", self._base)
+        return _gain, left_chaos, right_chaos
+
+    # 连续型特征的二分：排序一次，用累积的类别计数一次性算出所有相邻取值中点的增益
+    # 返回最佳增益、对应的二分标准以及左右子集的不确定性
+    # order: 预先排好序的样本下标（针对传入Cluster的整个数据集），给定时就不用在这里排序了
+    # min_leaf: 左右子集至少要有的样本数
+    def best_bin_split(self, idx, criterion="gini", order=None, min_leaf=1):
+        if order is None:
+            data = self.column(idx)
+            order = np.argsort(data, kind="mergesort")
+            data, y = data[order], self._y[order]
+            weights = self._sample_weight[order] if self._sample_weight is not None else None
+        else:
+            data, y = self._data[order, idx], self._labels[order]
+            weights = self._weights[order] if self._weights is not None else None
+        # 只有相邻两个取值不同的位置才是候选的分割点
+        cut = np.flatnonzero(data[:-1] != data[1:])
+        cut = cut[(cut + 1 >= min_leaf) & (len(data) - cut - 1 >= min_leaf)]
+        if len(cut) == 0:
+            return 0, None, []
+        counts = np.zeros((len(data), len(self._counters)))
+        counts[np.arange(len(data)), y] = 1 if weights is None else weights
+        counts = np.cumsum(counts, axis=0)
+        _gain, left_chaos, right_chaos = self.bin_scan(counts[cut], counts[-1], criterion)
+        p = np.argmax(_gain)  # type: int
+        tar = (data[cut[p]] + data[cut[p] + 1]) * 0.5
+        return _gain[p], tar, [left_chaos[p], right_chaos[p]]
+
+    # 极端随机树的二分：在该节点各维度的最小值和最大值之间各取若干个阈值min + u * (max - min)，不排序、不扫描所有中点
+    # idx是若干个维度，u是len(idx)*阈值个数的[0, 1)中的随机数（由调用者抽取，以便多线程时结果也可以复现）
+    # 所有维度的所有阈值一起统计：每个样本落在各维度排好序的阈值之间的第几段，一次bincount得到各段的类别计数，
+    # 累加后就是各阈值左边的计数，再一次算出所有候选的增益；返回各维度的(最佳增益, 阈值, 左右子集的不确定性)
+    def random_bin_split(self, idx, u, criterion="gini", min_leaf=1):
+        data = np.atleast_2d(self.column(list(idx)))
+        n_feat, n_class, k = len(idx), len(self._counters), np.shape(u)[1]
+        lo, hi = data.min(axis=1), data.max(axis=1)
+        tar = np.sort(lo[:, None] + np.asarray(u) * (hi - lo)[:, None], axis=1)
+        # 第i个维度上小于第j个阈值的样本分到左边，段的编号就是不大于取值的阈值个数
+        seg = np.sum(data[:, :, None] >= tar[:, None, :], axis=2)
+        keys = ((np.arange(n_feat)[:, None] * (k + 1) + seg) * n_class + self._y).ravel()
+        weights = None if self._sample_weight is None else np.tile(self._sample_weight, n_feat)
+        counts = np.bincount(keys, weights, minlength=n_feat * (k + 1) * n_class).reshape(n_feat, k + 1, n_class)
+        left = np.cumsum(counts, axis=1)[:, :k].reshape(n_feat * k, n_class)
+        sizes = np.cumsum(np.bincount(keys // n_class, minlength=n_feat * (k + 1)).reshape(n_feat, k + 1),
+                          axis=1)[:, :k].ravel()
+        valid = (sizes >= max(min_leaf, 1)) & (data.shape[1] - sizes >= max(min_leaf, 1))
+        res = [(0, None, [])] * n_feat
+        if not np.any(valid):
+            return res
+        _gain, left_chaos, right_chaos = self.bin_scan(left[valid], counts[0].sum(axis=0), criterion)
+        gain = np.full(n_feat * k, -np.inf)
+        gain[valid] = _gain
+        chaos = np.zeros((n_feat * k, 2))
+        chaos[valid, 0], chaos[valid, 1] = left_chaos, right_chaos
+        best = np.argmax(gain.reshape(n_feat, k), axis=1) + np.arange(n_feat) * k
+        for i, p in enumerate(best):
+            if valid[p]:
+                res[i] = (gain[p], tar.ravel()[p], [chaos[p, 0], chaos[p, 1]])
+        return res
+
+    # 直方图模式：各特征已经分箱为整数编码，统计每个箱中各类别的（加权）样本数
+    # 返回len(idx)*n_bins*n_class的直方图，mask用于只统计部分样本（例如某个子节点）
+    def histogram(self, idx, n_bins, n_class, mask=None):
+        codes = self.column(idx).astype(np.intp)
+        y, weights = self._y, self._sample_weight
+        if mask is not None:
+            codes, y = codes[:, mask], y[mask]
+            weights = weights[mask] if weights is not None else None
+        keys = (np.arange(len(idx))[:, None] * n_bins + codes) * n_class + y
+        if weights is not None:
+            weights = np.tile(weights, len(idx))
+        return np.bincount(keys.ravel(), weights, minlength=len(idx) * n_bins * n_class).reshape(
+            len(idx), n_bins, n_class)
+
+    # 对某个特征的直方图(n_bins*n_class)按箱累积扫描，返回最佳增益、二分标准（编码 < tar 的样本分到左边）和左右子集的不确定性
+    # min_leaf: 左右子集至少要有的样本数；sizes: 各箱的样本数（不加权），为None时由直方图得到
+    # u: 极端随机树的[0, 1)中的随机数，给定时只在随机抽取的len(u)个候选分割中比较
+    def best_hist_split(self, hist, criterion="gini", tol=1e-12, min_leaf=1, sizes=None, u=None):
+        _len = hist.sum(axis=1)
+        nonempty = np.flatnonzero(_len > tol * _len.sum())
+        if len(nonempty) < 2:
+            return 0, None, []
+        # 左边至少包含第一个非空箱，右边至少包含最后一个非空箱
+        cut = np.arange(nonempty[0], nonempty[-1])
+        if min_leaf > 1:
+            sizes = np.cumsum(_len if sizes is None else sizes)
+            cut = cut[(sizes[cut] >= min_leaf - tol) & (sizes[-1] - sizes[cut] >= min_leaf - tol)]
+            if len(cut) == 0:
+                return 0, None, []
+        if u is not None:
+            cut = np.unique(cut[(np.asarray(u) * len(cut)).astype(np.intp)])
+        counts = np.cumsum(hist, axis=0)
+        _gain, left_chaos, right_chaos = self.bin_scan(counts[cut], counts[-1], criterion)
+        p = np.argmax(_gain)  # type: int
+        return _gain[p], int(cut[p]) + 1, [left_chaos[p], right_chaos[p]]
+
+    # 离散特征的CART二分：把各取值（table的各行）按某个类别所占的比例排序，只需在排好序的取值上一趟累积扫描
+    # 二分类时按正类比例排序得到的就是所有二分中最优的（Breiman），多分类时依次按每个类别的比例排序，取其中最好的
+    # 返回最佳增益、分到左边的行和左右子集的不确定性；sizes: 各取值的样本数（不加权）
+    def best_subset_split(self, table, criterion="gini", min_leaf=1, sizes=None):
+        _len = table.sum(axis=1)
+        p = table / np.where(_len > 0, _len, 1)[:, None]
+        # 只看该节点中出现过的类别，只有两类时按其中后一类的比例排序
+        classes = np.flatnonzero(table.sum(axis=0) > 0)
+        _max_gain, _left, _chaos_lst = 0, None, []
+        for c in (classes if len(classes) > 2 else classes[-1:]):
+            order = np.argsort(p[:, c], kind="mergesort")
+            _gain, _tar, _tmp_chaos_lst = self.best_hist_split(
+                table[order], criterion, min_leaf=min_leaf, sizes=None if sizes is None else sizes[order])
+            if _tar is not None and _gain > _max_gain:
+                _max_gain, _left, _chaos_lst = _gain, order[:_tar], _tmp_chaos_lst
+        return _max_gain, _left, _chaos_lst
+
+    # 梯度提升的回归划分准则：hist是(总箱数, 3)的(梯度和, 二阶导数和, 样本数)直方图，第i个特征的箱是offsets[i]到offsets[i + 1]
+    # 增益 = G_L^2 / (H_L + λ) + G_R^2 / (H_R + λ) - G^2 / (H + λ)（平方损失时就是方差的减少），所有特征的所有分割一次算出
+    # 返回(增益, 特征, 箱编号)，统一编号 < 箱编号 的样本分到左边；没有满足min_child_weight和min_leaf的分割时返回None
+    def grad_split(self, hist, offsets, reg_lambda=1.0, min_child_weight=1e-3, min_leaf=1):
+        cum = np.cumsum(hist, axis=0)
+        # 各特征自己的累积：减去该特征之前所有箱的和
+        before = np.zeros((len(offsets) - 1, hist.shape[1]))
+        before[1:] = cum[offsets[1:-1] - 1]
+        left = cum - np.repeat(before, np.diff(offsets), axis=0)
+        total = left[offsets[1] - 1]
+        right = total - left
+        valid = (left[:, 1] >= min_child_weight) & (right[:, 1] >= min_child_weight)
+        valid &= (left[:, 2] >= min_leaf) & (right[:, 2] >= min_leaf)
+        # 每个特征的最后一个箱后面不能分割
+        valid[offsets[1:] - 1] = False
+        if self.stats is not None:
+            self.stats.add("thresholds", np.sum(valid))
+        if not np.any(valid):
+            return None
+        _gain = left[:, 0] ** 2 / (left[:, 1] + reg_lambda) + right[:, 0] ** 2 / (right[:, 1] + reg_lambda)
+        _gain[~valid] = -np.inf
+        p = int(np.argmax(_gain))
+        _gain = _gain[p] - total[0] ** 2 / (total[1] + reg_lambda)
+        feat = int(np.searchsorted(offsets, p, side="right")) - 1
+        return float(_gain), feat, p + 1
 
     # 定义计算二类问题信息增益的函数，参数get_chaos_lst用于控制输出,就是要不要chaos_lst要就True，else False
     def bin_info_gain(self, idx, tar, criterion="gini", get_chaos_lst=False, continuous=False):
+        if self.stats is not None:
+            self.stats.add("thresholds")
         # 根据不同的准则，获取相应的“条件不确定性”
         if criterion in ("ent", "ratio"):
             _con_chaos, _chaos_lst = self.bin_con_chaos(idx, tar, criterion='ent', continuous=continuous)
@@ -0,0 +1,150 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# 并行的k折交叉验证：各折在进程池中同时训练和评估，返回各折的训练、预测时间和得分
+# 决策树（Base的子类）的编码、判断连续性、量化和预先排序在主进程中只做一次（Base.prepare），结果放在共享内存里，
+# 每一折只从排好序的样本下标中筛出自己的训练样本（Base.refit(rows=...)），不再重新编码和排序，也不复制特征矩阵；
+# 所以各特征是否连续、离散特征的取值和直方图模式的分箱边界都是在全部数据上确定的，与各折单独调用Base.fit可能略有不同
+# 其他模型（例如Bayes中的MultinomialNB, GaussianNB, MergedNB）只要有fit(x, y)和predict(x)，每折复制一份模型训练
+#     res = cross_validate(CartTree(), x, y, k=5, n_jobs=-1)
+#     res["score"].mean(), res["fit_seconds"]
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from DecisionTree.CvDTree import Base
+import copy
+import os
+import pickle
+import time
+import numpy as np
+
+# 子进程中的数据：{名字: ndarray或对象}，共享内存的句柄另外保存，保证进程结束前不被回收
+_shared, _blocks = {}, []
+
+
+# 进程池的initializer：按(共享内存名, 形状, 类型)挂载数值数组；objects是不能放进共享内存的对象，每个进程只pickle一次
+def _attach(specs, objects):
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _blocks.append(shm)
+        _shared[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    for key, value in objects.items():
+        _shared[key] = pickle.loads(value) if key == "model" else value
+
+
+def _accuracy(y_true, y_pred):
+    return float(np.mean(np.asarray(y_pred) == np.asarray(y_true)))
+
+
+# 返回[(训练集下标, 测试集下标), ...]；stratified时各类别的样本轮流分到各折，各折的类别比例与整体相同
+def k_fold(y, k=5, shuffle=True, stratified=True, seed=None):
+    y = np.asarray(y)
+    order = np.random.RandomState(seed).permutation(len(y)) if shuffle else np.arange(len(y))
+    if stratified:
+        order = order[np.argsort(np.unique(y, return_inverse=True)[1].ravel()[order], kind="stable")]
+    fold = np.empty(len(y), dtype=np.int64)
+    fold[order] = np.arange(len(y)) % k
+    return [(np.flatnonzero(fold != i), np.flatnonzero(fold == i)) for i in range(k)]
+
+
+# 一折决策树：在共享的预处理结果上只用训练集的样本生成，再对测试集的原始取值预测
+# 随机特征用这一折自己的RandomState，不改变全局的np.random
+def _tree_fold(train, test, fit_kwargs, scoring, seed):
+    tree = _shared["model"]
+    if tree._x is None:
+        tree._x, tree._y, tree._sorted_orders = _shared["x_coded"], _shared["y_coded"], _shared["orders"]
+        tree._branch = np.empty(len(tree._y), dtype=np.int32)
+    _random_state, tree.random_state = tree.random_state, np.random.RandomState(seed)
+    try:
+        _start = time.perf_counter()
+        tree.refit(None, fit_kwargs.get("eps", 1e-8), fit_kwargs.get("feature_bound", "log"), rows=train,
+                   prune=fit_kwargs.get("prune", True))
+        flat = tree.compile()
+        fit_seconds = time.perf_counter() - _start
+    finally:
+        tree.random_state = _random_state
+    _start = time.perf_counter()
+    pred = flat.predict(_shared["x"][test])
+    predict_seconds = time.perf_counter() - _start
+    return fit_seconds, predict_seconds, scoring(flat.labels[tree._y[test]], pred)
+
+
+# 一折其他模型：复制一份原型，在训练集上fit
+# 这些模型只能用全局的np.random，fit时临时设定种子，之后恢复原来的状态
+def _model_fold(train, test, fit_kwargs, scoring, seed):
+    x, y = _shared["x"], _shared["y"]
+    model = copy.deepcopy(_shared["model"])
+    _state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        _start = time.perf_counter()
+        model.fit(x[train], y[train], **fit_kwargs)
+        fit_seconds = time.perf_counter() - _start
+    finally:
+        np.random.set_state(_state)
+    _start = time.perf_counter()
+    pred = model.predict(x[test])
+    predict_seconds = time.perf_counter() - _start
+    return fit_seconds, predict_seconds, scoring(y[test], pred)
+
+
+# model: 决策树（CartTree, ID3Tree, C45Tree等，fit_kwargs可以有alpha, feature_bound, eps, max_bins和prune，含义与Base.fit相同）
+# 或其他有fit/predict的模型（fit_kwargs原样传给fit）；决策树本身用来做预处理，串行时也用来训练各折，结束后保留最后一折的树
+# folds: 事先给定的[(训练集下标, 测试集下标), ...]，为None时用k_fold生成
+# scoring(y_true, y_pred): 默认是准确率，n_jobs > 1时必须是模块级的函数（要pickle给子进程）
+# 返回{"score", "fit_seconds", "predict_seconds": 各折的数组, "prepare_seconds": 预处理的时间, "folds": 各折的下标}
+def cross_validate(model, x, y, k=5, n_jobs=None, fit_kwargs=None, scoring=None, folds=None, stratified=True,
+                   seed=None):
+    fit_kwargs, scoring = dict(fit_kwargs or {}), scoring or _accuracy
+    x, y = np.atleast_2d(np.asarray(x)), np.asarray(y)
+    folds = k_fold(y, k, stratified=stratified, seed=seed) if folds is None else folds
+    seeds = np.random.RandomState(seed).randint(2 ** 31 - 1, size=len(folds))
+    _start = time.perf_counter()
+    if isinstance(model, Base):
+        model.prepare(x, y, fit_kwargs.get("max_bins"), fit_kwargs.get("alpha"))
+        arrays = {"x": x, "x_coded": model._x, "y_coded": model._y, "orders": model._sorted_orders}
+        # 模型本身只pickle不含数据的部分，子进程中再挂载共享的数据
+        _data = {key: getattr(model, key) for key in ("_x", "_y", "_w", "_orders", "_sorted_orders", "_branch")}
+        for key in _data:
+            setattr(model, key, None)
+        try:
+            objects = {"model": pickle.dumps(model)}
+        finally:
+            for key, value in _data.items():
+                setattr(model, key, value)
+        task = _tree_fold
+    else:
+        arrays, objects, task = {"x": x, "y": y}, {"model": pickle.dumps(model)}, _model_fold
+    prepare_seconds = time.perf_counter() - _start
+    n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+    args = [(train, test, fit_kwargs, scoring, s) for (train, test), s in zip(folds, seeds)]
+    if n_jobs is None or n_jobs <= 1:
+        _shared.update(arrays)
+        _shared["model"] = model
+        try:
+            results = [task(*arg) for arg in args]
+        finally:
+            _shared.clear()
+    else:
+        blocks, specs = [], {}
+        try:
+            for key, arr in arrays.items():
+                # object类型的数组（例如字符串特征）不能放进共享内存，随initializer传给各进程
+                if arr.dtype.kind not in "biuf":
+                    objects[key] = arr
+                    continue
+                arr = np.ascontiguousarray(arr)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+                blocks.append(shm)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                specs[key] = (shm.name, arr.shape, arr.dtype)
+            with ProcessPoolExecutor(min(n_jobs, len(folds)), initializer=_attach,
+                                     initargs=(specs, objects)) as pool:
+                results = list(pool.map(task, *zip(*args)))
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+    if isinstance(model, Base):
+        model.release()
+    fit_seconds, predict_seconds, scores = (np.array(col) for col in zip(*results))
+    return {"score": scores, "fit_seconds": fit_seconds, "predict_seconds": predict_seconds,
+            "prepare_seconds": prepare_seconds, "folds": folds}
@@ -1,5 +1,13 @@
 from DecisionTree.CVDNode import *
-from copy import deepcopy
+from DecisionTree.FlatTree import FlatTree, LEAF
+from DecisionTree.Encoder import Encoder
+from DecisionTree.Stats import Stats
+from DecisionTree.Distributed import ShardPool
+from DecisionTree.Stream import ChunkSource, QuantileSketch, Binner, HistogramSource, bin_edges
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import os
+import time
 import numpy as np
 import cv2
 
@@ -7,26 +15,60 @@ import cv2
 # 更新 在draw中，为了能可视化特征类别，因为我的数据事先就数值化了，在295行加入了判决self.rev_feat_dic[node.parent[self.feature_dim][node.prev_feat]来使得可以可视化
 #  self.root.label_dict = self.label_dict  # 在feed_data中加了这句话
 
+# 剪枝前后的损失函数之差在这个相对误差以内时视为相等（剪枝）：_prune逐步更新各节点缓存的代价，search每次重新求和，
+# 浮点误差不同，恰好在阈值上时两者必须得出相同的结论
+_PRUNE_TOL = 1e-9
+
+
+def _prune_ok(old, new):
+    return old >= new - _PRUNE_TOL * np.maximum(1.0, np.abs(new))
+
 
 class Base:
     """
     self.nodes: 记录所有node的列表
-    self.roots: 主要用于CART剪枝的属性
+    self.prune_path: CART剪枝依次剪掉的节点及对应的阈值[(alpha, node), ...]，prune_只剪掉了其中的前若干个
     self.max_depth: 记录决策树最大深度的属性
-    self.root,self.feature_sets: 根节点和记录可选特征维度的列表
+    self.pruned_depth: prune_to截断到的深度（相对于根节点），没有截断时为None；max_depth仍是生成时的超参数
+    self.max_leaf_nodes: 叶节点数的上限，给定时按增益从大到小生成节点，达到上限就停止
+    self.min_samples_leaf: 每个叶节点至少要有的样本数
+    self.splitter, self.n_thresholds: "best"时连续特征比较所有候选分割；"random"时是极端随机树（Extra-Trees），
+    每个候选特征只在该节点的最小值和最大值之间随机取n_thresholds个阈值，不用预先排序，也不扫描所有中点
+    self.random_state, self.rng: 随机特征、极端随机树的阈值和划分交叉验证集用的np.random.RandomState（给定整数时以它为种子），
+    为None时rng是全局的np.random
+    self.n_jobs, self._executor: 寻找划分时同时计算各特征的线程数（-1表示使用所有CPU）及训练时的线程池
+    self.root,self.feature_sets: 根节点和各特征排好序的所有取值（numpy数组，连续特征为空数组）
+    self.encoder: 训练时对类别和离散特征的编码（Encoder），fit训练的树预测时用它把输入的离散特征编码
     self.label_dic: 类别的转换字典
     self.prune_alpha，self.layers: 主要用于ID3和C4.5剪枝的两个属性，可先按下不表示
     self.prune_alpha: 惩罚因子，正则化处理最小化代价函数，是一个超参数
     self.layers: 记录每一层的Node
     self.whether_continuous: 记录各个维度特征是否连续的列表
     self.visualized: 绘制框图
+    self.max_bins, self.bin_edges: 直方图模式下每个连续特征最多的箱数和各连续特征的分箱边界
+    self.hist_feats, self.hist_slots: 直方图模式下参与统计直方图的连续特征维度，及各维度在直方图中的位置
+    self._x, self._y, self._w: 训练时所有节点共享的特征矩阵、类别向量和样本权重，训练完即释放
+    self._orders, self.order_slots: 样本下标矩阵，第0行用于记录各节点的样本，其余各行是按某个连续特征预先排好序的下标
+    （逐点扫描模式下才有），各节点只记录自己在这些行中的范围；order_slots记录各连续特征对应的行
+    self._sorted_orders, self._train_pred: prepare之后预先排好序的样本下标的原样，及最近一次refit在训练集上的类别编码
+    self.n_dim: 特征维度
+    self._flat: 编译好的FlatTree，用于批量预测，树的结构改变时置为None
+    self.record_stats, self.stats: 是否记录训练的计数和计时，及最近一次训练记录的Stats（不记录时为None）
+    流式训练（fit_stream）时没有encoder，二分标准直接是原始取值
 
     """
     def __init__(self, criterion='ent', label_dict=None, max_depth=None, whether_continuous=None, rev_feat_dict=None,
-                 is_cart=False, visualized=False):
-
-        self.nodes, self.layers, self.roots = [], [], []
-        self.max_depth = max_depth
+                 is_cart=False, visualized=False, max_leaf_nodes=None, min_samples_leaf=1, n_jobs=None, stats=False,
+                 splitter="best", n_thresholds=1, random_state=None):
+
+        self.nodes, self.layers, self.prune_path = [], [], []
+        self.max_depth, self.pruned_depth = max_depth, None
+        self.max_leaf_nodes, self.min_samples_leaf = max_leaf_nodes, min_samples_leaf
+        self.n_jobs, self._executor = n_jobs, None
+        assert splitter in ("best", "random"), "splitter应为'best'或'random'"
+        self.splitter, self.n_thresholds = splitter, n_thresholds
+        self.random_state = np.random.RandomState(random_state) if isinstance(
+            random_state, (int, np.integer)) else random_state
         self.feature_sets = []
         self.label_dict = label_dict
         self.rev_feat_dic = rev_feat_dict
@@ -35,6 +77,13 @@ class Base:
         self.is_cart = is_cart
         self.criterion = criterion
         self.visualized = visualized  #
+        self.max_bins = self.bin_edges = None
+        self.hist_feats, self.hist_slots = [], {}
+        self._x = self._y = self._w = self._orders = self._branch = None
+        self._sorted_orders = self._train_pred = None
+        self.order_slots, self.n_dim = {}, 0
+        self._flat = self.encoder = None
+        self.record_stats, self.stats = stats, None
         self.root = Node(tree=self)
 
     def __str__(self):
@@ -42,21 +91,26 @@ class Base:
 
     __repr__ = __str__
 
-    # 判断各特征的连续型并记录在whether_continuous中，及其他数据预处理
+    @property
+    def rng(self):
+        return np.random if self.random_state is None else self.random_state
+
+    # 判断各特征的连续型并记录在whether_continuous中，及其他数据预处理，返回训练用的（离散特征已编码的）矩阵
     def feed_data(self, x, continuous_rate=0.2):
         # continuous_rate 也算是超参数，需要提前给定
-        # x = np.atleast_2d(x)
         assert x.ndim == 2, "数据x是二维的"
-        # 利用set获得各个维度特征的所有可能取值
-        self.feature_sets = [set(dimension) for dimension in x.T]
-        data_len, data_dim = x.shape
-        # 判断是否连续
+        if self.encoder is None:
+            self.encoder = Encoder()
+        # 用np.unique获得各个维度特征排好序的所有可能取值，同时得到离散特征的编码
         # 如果这个特征中的可能取值个数大于样本个数的continuous倍，判定为连续，continuous的值应该随样本个数变化
-        if self.whether_continuous is None:
-            self.whether_continuous = np.array([len(feat) > continuous_rate * data_len for feat in self.feature_sets])
-        self.root.feats = [i for i in range(data_dim)]
+        self.encoder.whether_continuous = self.whether_continuous
+        x = self.encoder.fit(x, continuous_rate)
+        self.whether_continuous = self.encoder.whether_continuous
+        self.feature_sets = [np.array([]) if values is None else values for values in self.encoder.values]
+        self.root.feats = [i for i in range(x.shape[1])]
         self.root.label_dict = self.label_dict  #
         self.root.feed_tree(self)  # 在根节点有无意义呢
+        return x
 
     # Grow
     # 考虑到剪枝
@@ -65,17 +119,19 @@ class Base:
     # 对根节点调用决策树生成算法
     # 调用剪枝算法
     # 参数α和剪枝有关，cv_rate用于控制交叉验证集的大小，train_only则控制程序是否进行数据集的切分
+    # max_bins不为None时使用直方图模式：连续特征先量化为箱的编码，再在各箱的类别直方图上寻找分割
+    # prune为False时只生成不剪枝（例如fit_search之后再剪枝），随机森林（rf为True）本来就不剪枝
     def fit(self, x, y, alpha=None, sample_weight=None, eps=1e-8, cv_rate=0.2, train_only=False, feature_bound="log",
-            rf=False):
+            rf=False, max_bins=None, prune=True):
+        _fit_start = time.perf_counter()
+        self.stats = Stats() if self.record_stats else None
         x = np.atleast_2d(x)
-        # 数值化类别向量
-        _dic = {c: i for i, c in enumerate(set(y))}  # 类别的取值及类别的索引
+        self._flat, self.pruned_depth = None, None
+        # 数值化类别向量：类别编码就是类别在排好序的所有类别中的位置
+        self.encoder = Encoder()
+        y = self.encoder.fit_labels(y)
         if self.label_dict is None:
-            self.label_dict = {i: c for c, i in _dic.items()}  # 数值化后与数值化前之字典
-        y = np.array([_dic[yy] for yy in y])  # 因为类别与类别在set中的位置是一一对应的，因此可以用类别位置代替类别名
-        # 感觉就是对类别的进行了简化，计算更方便矩阵对数运算方便
-        # 也就是再颠倒回来 self.label_dic={key:value for key, value in enumerate(set(y))}
-        # dict.items() 以列表形式返回可以遍历的元组(key,value)数据
+            self.label_dict = {i: c for i, c in enumerate(self.encoder.labels)}  # 数值化后与数值化前之字典
         # 根据特征个数定出alpha
         self.prune_alpha = alpha if alpha is not None else x.shape[1] / 2
         # 如果需要划分数据集,根节点是CART
@@ -83,7 +139,7 @@ class Base:
             # 根据cv_rate将数据集随机分成训练集和交叉验证集
             # 实现的核心思想是利用下标来进行各种切分
             _train_num = int(len(x) * (1 - cv_rate))
-            indices = np.random.permutation(range(x.shape[0]))
+            indices = self.rng.permutation(range(x.shape[0]))
             _train_indices = indices[:_train_num]
             _test_indices = indices[_train_num:]
             if sample_weight is not None:
@@ -98,16 +154,275 @@ class Base:
         else:
             x_train, y_train, _train_weight = x, y, sample_weight
             x_cv, y_cv, _test_weight = None, None, None
-        self.feed_data(x_train)
-        # 调用根节点的生成算法,已经可以用来生成树了
-        self.root.fit(x_train, y_train, _train_weight, feature_bound, eps)
+        self.max_bins = self.bin_edges = None
+        x_train = self.feed_data(x_train)
+        if max_bins is not None:
+            x_train = self._quantize(x_train, max_bins)
+        self._share_data(x_train, y_train, _train_weight)
+        self._grow(feature_bound, eps)
+        self._release_data()
+        self._decode()
         # 调用对Node剪枝算法的封装
-        if not rf:  # 如果不是随机森林才可以调用剪枝方法
+        if not rf and prune:  # 如果不是随机森林才可以调用剪枝方法
             self.prune_(x_cv, y_cv, _test_weight)  # wrong? 问题在于实现随机森林不允许调用剪枝方法，这样的话我还需要加点东西
+        self._flat = None
+        if self.stats is not None:
+            self.stats.add_time("fit", time.perf_counter() - _fit_start)
         # 是否需要绘图
         if self.visualized:
             self.draw()
 
+    # 调用根节点的生成算法，n_jobs > 1时各特征在线程池中计算
+    def _grow(self, feature_bound="log", eps=1e-8):
+        _n_jobs = os.cpu_count() if self.n_jobs == -1 else self.n_jobs
+        if _n_jobs is not None and _n_jobs > 1:
+            self._executor = ThreadPoolExecutor(_n_jobs)
+        try:
+            self.root.fit(0, self._orders.shape[1], feature_bound, eps)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    # 在同一份数据上只改变样本权重反复训练（例如提升的各轮）时，编码、判断连续性、量化和预先排序只在prepare中做一次，
+    # 之后每次refit只把预先排好序的样本下标复制一份（生成时会在其中原地划分），再生成一棵新的树；用完调用release
+    # refit给定rows时只用这些样本（例如交叉验证的一折）：从排好序的各行中筛出它们仍是排好序的，也不用重新排序
+    # prune为True时与Base.fit(train_only=True)一样剪枝（CART没有验证集时不剪枝）
+    def prepare(self, x, y, max_bins=None, alpha=None):
+        x = np.atleast_2d(x)
+        self._flat = None
+        self.encoder = Encoder()
+        y = self.encoder.fit_labels(y)
+        if self.label_dict is None:
+            self.label_dict = {i: c for i, c in enumerate(self.encoder.labels)}
+        self.prune_alpha = alpha if alpha is not None else x.shape[1] / 2
+        self.max_bins = self.bin_edges = None
+        x = self.feed_data(x)
+        if max_bins is not None:
+            x = self._quantize(x, max_bins)
+        self._share_data(x, y)
+        self._sorted_orders = self._orders.copy()
+        return self
+
+    def refit(self, sample_weight=None, eps=1e-8, feature_bound=None, rows=None, prune=False):
+        _fit_start = time.perf_counter()
+        self.stats = Stats() if self.record_stats else None
+        self._flat = None
+        self.nodes, self.layers, self.prune_path = [], [], []
+        self.root = Node(tree=self)
+        self.root.feats = [i for i in range(self.n_dim)]
+        self.root.label_dict = self.label_dict
+        self.root.feed_tree(self)
+        self._w = sample_weight
+        if rows is None:
+            if self._orders is None or self._orders.shape != self._sorted_orders.shape:
+                self._orders = np.empty_like(self._sorted_orders)
+            np.copyto(self._orders, self._sorted_orders)
+        else:
+            keep = np.zeros(self._sorted_orders.shape[1], dtype=bool)
+            keep[rows] = True
+            self._orders = np.stack([order[keep[order]] for order in self._sorted_orders])
+        self._grow(feature_bound, eps)
+        self._train_pred = self._leaf_categories()
+        self._decode()
+        if prune:
+            self.prune_(None, None)
+        if self.stats is not None:
+            self.stats.add_time("fit", time.perf_counter() - _fit_start)
+        return self
+
+    # 训练集上各样本的类别编码（没有参与训练的样本为-1）：各叶节点的样本就是它在self._orders第0行中的范围，
+    # 不需要再把样本沿树走一遍
+    def _leaf_categories(self):
+        res = np.full(len(self._y), -1, dtype=np.int64)
+        _stack = [self.root]
+        while _stack:
+            node = _stack.pop()
+            if node.category is not None:
+                res[self._orders[0, node._start:node._stop]] = node.category
+            else:
+                _stack += [child for child in node.children.values() if child is not None]
+        return res
+
+    def release(self):
+        self._release_data()
+        self._sorted_orders = self._train_pred = None
+
+    # 流式（out-of-core）训练：数据不必一次读入内存，source是ChunkSource，或者是用来构造ChunkSource的
+    # (x, y)或(x, y, sample_weight)（x可以是np.memmap），或者是每次调用都返回一个新的数据块迭代器的函数
+    # 第一遍扫描用有限内存（sketch_size行的蓄水池抽样）确定类别、各特征是否连续及分箱边界，
+    # 之后逐层生成：每层扫描一遍数据，统计这一层所有待划分节点的直方图；直方图超过max_hist_bytes时分几遍统计
+    # 取值个数超过max_bins（或continuous_rate * 样本数）的特征判定为连续；cv为(x_cv, y_cv)时用于CART剪枝
+    def fit_stream(self, source, alpha=None, eps=1e-8, feature_bound="log", rf=False, max_bins=255,
+                   sketch_size=100000, continuous_rate=0.2, cv=None, max_hist_bytes=1 << 28, seed=None):
+        if not isinstance(source, ChunkSource):
+            source = ChunkSource(*source) if isinstance(source, tuple) else ChunkSource(source)
+        _fit_start = time.perf_counter()
+        self.stats = Stats() if self.record_stats else None
+        self._flat = self.encoder = None
+        sketch = None
+        for x, y, _ in source:
+            if sketch is None:
+                sketch = QuantileSketch(x.shape[1], sketch_size, max_bins, self.whether_continuous, seed)
+            sketch.update(x, y)
+        binner = self._setup_stream(sketch, alpha, max_bins, continuous_rate)
+        self._grow_levels(HistogramSource(source, binner, sketch.labels), binner, feature_bound, eps, max_hist_bytes)
+        self._finish_stream(sketch, rf, cv, _fit_start)
+
+    # 分布式训练：各worker进程各持有一部分样本（见Distributed.ShardPool），样本不汇集到一处
+    # 先合并各worker的QuantileSketch确定分箱，之后每层由各worker统计自己分片上的直方图，这里求和后选择划分
+    # 得到的树与在全部数据上fit_stream相同（分箱边界来自合并后的蓄水池抽样，连续特征取值多于max_bins时可能略有不同）
+    # pool: ShardPool，或者各worker的数据来源（fit_stream的source能接受的形式）的列表，此时在本机为每个来源启动一个进程
+    def fit_distributed(self, pool, alpha=None, eps=1e-8, feature_bound="log", rf=False, max_bins=255,
+                        sketch_size=100000, continuous_rate=0.2, cv=None, max_hist_bytes=1 << 28, seed=None):
+        _own = not isinstance(pool, ShardPool)
+        if _own:
+            pool = ShardPool(pool)
+        try:
+            _fit_start = time.perf_counter()
+            self.stats = Stats() if self.record_stats else None
+            self._flat = self.encoder = None
+            sketch = pool.sketch(sketch_size, max_bins, self.whether_continuous, seed)
+            binner = self._setup_stream(sketch, alpha, max_bins, continuous_rate)
+            pool.setup(binner, sketch.labels)
+            self._grow_levels(pool, binner, feature_bound, eps, max_hist_bytes)
+            self._finish_stream(sketch, rf, cv, _fit_start)
+        finally:
+            if _own:
+                pool.close()
+
+    # 由扫描一遍数据得到的sketch确定分箱、类别和各特征是否连续，初始化根节点，返回Binner
+    def _setup_stream(self, sketch, alpha=None, max_bins=255, continuous_rate=0.2):
+        binner = Binner.from_sketch(sketch, max_bins, continuous_rate, self.whether_continuous)
+        if self.label_dict is None:
+            self.label_dict = {i: c for i, c in enumerate(sketch.labels)}
+        self.prune_alpha = alpha if alpha is not None else sketch.sample.shape[1] / 2
+        self.whether_continuous = binner.whether_continuous
+        # 连续特征不需要记录所有取值
+        self.feature_sets = [np.array([]) if c else v for c, v in zip(binner.whether_continuous, binner.values)]
+        self.max_bins = self.bin_edges = None
+        self.n_dim = len(self.feature_sets)
+        self.root.feats = [i for i in range(self.n_dim)]
+        self.root.label_dict = self.label_dict
+        self.root.feed_tree(self)
+        return binner
+
+    def _finish_stream(self, sketch, rf=False, cv=None, _fit_start=None):
+        if not rf:
+            x_cv, y_cv = (None, None) if cv is None else (cv[0], np.searchsorted(sketch.labels, cv[1]))
+            self.prune_(x_cv, y_cv)
+        self._flat = None
+        if self.stats is not None:
+            self.stats.add_time("fit", time.perf_counter() - _fit_start)
+        if self.visualized:
+            self.draw()
+
+    # 逐层生成：hist_source(flat, slots)扫描一遍数据，返回FlatTree中slots不为-1的各节点的直方图
+    # 给定max_leaf_nodes时，每层按增益（乘以样本数）从大到小划分，叶节点数达到上限就停止
+    def _grow_levels(self, hist_source, binner, feature_bound=None, eps=1e-8, max_hist_bytes=1 << 28):
+        _budget, _n_leafs, _stats = self.max_leaf_nodes, 1, self.stats
+        frontier = [self.root]
+        while frontier:
+            _level_start, _depth = time.perf_counter(), frontier[0]._depth
+            nodes, _ = FlatTree.bfs(self.root)
+            flat, ids = FlatTree(self.root), {id(node): i for i, node in enumerate(nodes)}
+            _group = max(1, max_hist_bytes // (16 * binner.n_bins * len(self.label_dict)))
+            splits = []
+            for i in range(0, len(frontier), _group):
+                slots = np.full(len(nodes), -1, dtype=np.intp)
+                for k, node in enumerate(frontier[i:i + _group]):
+                    slots[ids[id(node)]] = k
+                hist, sizes = hist_source(flat, slots)
+                for k, node in enumerate(frontier[i:i + _group]):
+                    _split = node._find_hist_split(hist[k], None if sizes is None else sizes[k], binner,
+                                                   feature_bound, eps)
+                    if _split is not None:
+                        splits.append((node, _split))
+            if _stats is not None:
+                _stats.add_time("split_search", time.perf_counter() - _level_start, _depth)
+            # 这一层变成叶节点的节点，和兄弟节点类别相同时合并
+            for node in frontier:
+                if node.category is not None and node.parent is not None:
+                    _n_leafs -= node.parent._merge()
+            if _budget is not None:
+                splits.sort(key=lambda pair: -pair[1][0] * pair[0]._n)
+            frontier = []
+            for node, (_gain, _feature, _tar, _chaos_lst, _child_sizes) in splits:
+                if _budget is not None and _n_leafs + int(np.sum(np.array(_child_sizes) > 0)) - 1 > _budget:
+                    node._handle_terminate()
+                    _n_leafs -= node.parent._merge() if node.parent is not None else 0
+                    continue
+                node.feature_dim, node.tar = _feature, _tar
+                node.is_continuous = continuous = self.whether_continuous[_feature]
+                _values = None if (continuous or self.is_cart) else list(self.feature_sets[_feature])
+                children = [child for child in node._make_children(_chaos_lst, _child_sizes, _values)
+                            if child is not None]
+                _n_leafs += len(children) - 1
+                frontier += children
+                if _stats is not None:
+                    _stats.add("splits")
+                    _stats.add("nodes", len(children))
+        self.reduce_nodes()
+        self.root.update_aggregates()
+
+    # 训练前把数据交给tree保存一份，所有节点共享；连续特征（逐点扫描模式下）预先排好序
+    # 之后各节点只在self._orders中原地划分样本下标，不再复制数据
+    def _share_data(self, x, y, sample_weight=None):
+        self._x, self._y, self._w = x, np.asarray(y), sample_weight
+        data_len, self.n_dim = x.shape
+        _dtype = np.int32 if data_len < 2 ** 31 else np.int64
+        # 直方图模式和极端随机树不需要预先排好序的下标
+        self.order_slots = {} if (self.bin_edges is not None or self.splitter == "random") else {
+            feat: i + 1 for i, feat in enumerate(np.flatnonzero(self.whether_continuous))}
+        self._orders = np.empty((len(self.order_slots) + 1, data_len), dtype=_dtype)
+        self._orders[0] = np.arange(data_len)
+        for feat, i in self.order_slots.items():
+            self._orders[i] = np.argsort(x[:, feat], kind="mergesort")
+        self._branch = np.empty(data_len, dtype=np.int32)
+
+    def _release_data(self):
+        self._x = self._y = self._w = self._orders = self._branch = None
+
+    # 直方图模式的预处理：把每个连续特征量化为至多max_bins个箱的编码
+    # 取值个数不超过max_bins时以相邻取值的中点为边界（与逐点扫描等价），否则以分位数为边界
+    # 编码 < t 等价于 原始取值 < bin_edges[feat][t - 1]，所以训练完只需把各节点的二分标准换回原始取值
+    def _quantize(self, x, max_bins=255):
+        assert 2 <= max_bins <= 256, "max_bins应在2到256之间"
+        self.max_bins = max_bins
+        self.bin_edges = [None] * x.shape[1]
+        self.hist_feats = [i for i, continuous in enumerate(self.whether_continuous) if continuous]
+        self.hist_slots = {feat: i for i, feat in enumerate(self.hist_feats)}
+        x = np.array(x, dtype=float)
+        for feat in self.hist_feats:
+            data = x[:, feat]
+            self.bin_edges[feat] = edges = bin_edges(data, max_bins)
+            x[:, feat] = np.searchsorted(edges, data, side="right")
+        # 所有取值都是0~255的整数时（例如全是连续特征），用uint8存储，内存只有float64的1/8
+        if np.all(x >= 0) and np.all(x <= 255) and np.all(x == np.floor(x)):
+            x = x.astype(np.uint8)
+        return x
+
+    # 训练时离散特征用的是编码，直方图模式下连续特征用的是箱的编码，训练完把各节点的划分标准换回原始取值
+    # （feed_data会把根节点再记录一次，要去重）
+    def _decode(self):
+        for node in {id(node): node for node in self.nodes}.values():
+            feat = node.feature_dim
+            if feat is None:
+                continue
+            if node.is_continuous:
+                if self.bin_edges is not None:
+                    node.tar = self.bin_edges[feat][int(node.tar) - 1]
+                    node.left_child.prev_feat = "{:6.4}-".format(node.tar)
+                    node.right_child.prev_feat = "{:6.4}+".format(node.tar)
+            elif node.is_cart:
+                node.tar = node.left_child.prev_feat = frozenset(
+                    self.encoder.decode(feat, sorted(node.tar)).tolist())
+            else:
+                _values = self.encoder.decode(feat, list(node._children)).tolist()
+                for value, child in zip(_values, node._children.values()):
+                    child.prev_feat = value
+                node._children = dict(zip(_values, node._children.values()))
+
     # 将被剪掉的Node从nodes中删除，从后往前剪枝
     def reduce_nodes(self):
         for i in range(len(self.nodes) - 1, -1, -1):
@@ -120,127 +435,281 @@ class Base:
         self.layers = [[] for _ in range(self.root.height)]  # create an empty list.len(list) is the tree's height
         self.root.update_layers()
 
-    # 更新树种所有节点存放在_tmp_nodes中，计算各节点损失函数，比较新旧损失大小，然后将结果存入mask,对于需要剪掉的节点
-    # 要将节点从layers和_tmp_nodes删除，并对被影响的节点更新
-
     def _prune(self):
         """
         ID3 & C45 剪枝操作
 
-        计算各个节点的损失函数 = 求和（叶子节点样本数*叶节点的熵）+ 惩罚因子*叶节点数 ，存好在old
-        对所有节点计算剪枝后的损失函数 = 当前节点样本数*节点的熵 + 惩罚因子 ， 因为只有一个节点了 存于 new
-        从最底层比较其损失函数变化，若剪枝后的损失函数少就剪枝。更新old， new，并将剪掉的节点从树中删除
-        循环直到根节点为止
+        各节点剪枝前的损失函数 = 求和（叶子节点样本数*叶节点的熵）+ 惩罚因子*叶节点数，
+        剪枝后的损失函数 = 当前节点样本数*节点的熵 + 惩罚因子，因为只有一个节点了
+        非叶节点按深度从深到浅依次从堆中取出，若剪枝后的损失函数不比剪枝前大就剪枝
+        取出一个节点时，它的子孙都已处理完毕，各节点缓存的叶节点数和叶节点代价之和（剪枝时沿着到根节点的路径更新）
+        就是它现在的子树的统计量，不用再遍历子树
         :return:
         """
-        # 得到的是old，new,mask，_tmp_nodes这些都是经过处理的结果
-        # 第一步是更新每一层的节点,因为地下是_tmp_nodes=nodes,所以不明白这两个_tmp_nodes是否一样
-        self._update_layers()
-        _tmp_nodes = []
-        # 更新完每层的Node后，从后往前
-        for _node_lst in self.layers[::-1]:  # 最后一层，最后一个节点开始
-            for _node in _node_lst[::-1]:
-                if _node.category is None:  # _tmp_nodes存放的是非叶节点
-                    _tmp_nodes.append(_node)  # _tmp_nodes中元素和layers中元素存放是相反顺序
-        # old = np.array([_node.cost() + self.prune_alpha * len(_node.leafs)] for _node in _tmp_nodes)
-        # 生成的是生成器，就没法比较了
-        old = []
-        for _node in _tmp_nodes:
-            old.append(_node.cost() + self.prune_alpha*len(_node.leafs))
-        old = np.array(old)
-        new = np.array([_node.cost(pruned=True) + self.prune_alpha for _node in _tmp_nodes])
-        mask = old >= new  # 比较剪枝前后的损失函数
-        while True:
-            # if only root,stop the loop
+        _heap = [(-node._depth, i, node) for i, node in enumerate(self.nodes) if node.category is None]
+        heapq.heapify(_heap)
+        while _heap:
+            # 只剩根节点时停止
             if self.root.height == 1:
-                break   # return is wrong
-            p = np.argmax(mask)  # type: int
-            # p 返回第一个出现True的位置，所以mask[p]肯定是有值的
-            # mask[p]表面对于Node的剪枝是从后往前剪的，否则试想从根节点剪，那肯定会出问题
-            if mask[p]:
-                _tmp_nodes[p].prune()  # 把p对应位置的节点剪掉，变成叶节点
-                for i, _node in enumerate(_tmp_nodes):  # 所以这里遍历是从树的最后节点往前递归
-                    if _node.affected:  # 被影响的节点有当前节点的子节点和各父节点，node中定义了一个affected变量
-                        # 对被影响的Node需要更新old，new,mask对应位置
-                        old[i] = _node.cost() + self.prune_alpha * len(_node.leafs)
-                        mask[i] = old[i] >= new[i]
-                        _node.affected = False
-                # 根据被剪掉的Node，将各个变量对应的位置除去（注意从后往前遍历）（对树而言是从根部开始遍历）
-                for i in range(len(_tmp_nodes) - 1, -1, -1):
-                    if _tmp_nodes[i].pruned:
-                        _tmp_nodes.pop(i)
-                        old = np.delete(old, i)  # np.delete(arr, obj) delete arr[obj] and return new arr
-                        # np.delete() 会改变矩阵的形状，但由于这里的old是一维的，所以叶没有影响
-                        new = np.delete(new, i)
-                        mask = np.delete(mask, i)
-            else:
                 break
+            _node = heapq.heappop(_heap)[2]
+            if self.stats is not None:
+                self.stats.add("prune_iterations")
+            if _node.pruned or _node.category is not None:
+                continue
+            old = _node.cost() + self.prune_alpha * _node.n_leafs
+            new = _node.cost(pruned=True) + self.prune_alpha
+            if _prune_ok(old, new):  # 比较剪枝前后的损失函数
+                _node.prune()
+                if self.stats is not None:
+                    self.stats.add("pruned")
         self.reduce_nodes()
 
     def _cart_prune(self):
         """
-        CART Tree 剪枝
+        CART Tree 剪枝路径
 
-        用不同阈值剪枝，直到根节点
+        从整棵树开始，每次剪掉阈值（剪枝前后的代价变化 / 减少的叶节点数）最小的节点，直到根节点，
+        得到依次剪掉的节点组成的剪枝路径self.prune_path = [(阈值, 节点), ...]，第k棵子树就是依次剪掉前k个节点后的树
+        这里只是模拟剪枝：各节点的叶节点数和叶节点代价之和记录在数组里，剪掉一个节点时只更新它的各个父节点，
+        不修改树本身，也不再为每一棵子树做深拷贝
         :return:
         """
-        # 得到_threshold,_tmp_nodes
-        # 暂时将所有节点记录所属的Tree的属性置为None，为什么呢
-        # 这里的tmp_nodes每次循环都会改变，删除一些节点，而且这个过程每次是不独立的pop了就真的没有了
-        self.root.cut_tree()  # 所有节点中的self.tree=None了， 但是nodes依然存在
-        tmp_nodes = [node for node in self.nodes if node.category is None]  # node没有经过排序吧
-        _thresholds = np.array([node.get_threshold() for node in tmp_nodes])
-        # 对所有阈值进行遍历
-        while True:
-            # 利用deepcopy对当前的根节点进行深拷贝，存入self.roots列表
-            # 如果前面没有记录Tree的属性置为None，那么这里也会对整个Tree做深拷贝。
-            # 可以想象，这样会引发严重的内存问题，速度也会拖慢很多
-            root_copy = deepcopy(self.root)
-            self.roots.append(root_copy)  # 每次循环好像都会往里面加入一个self.root
-            if self.root.height == 1:
-                break
-            # 从阈值最小的开始，逐渐递增，问题在于这种方法必然会执行到最后一个阈值，对于只有根节点，并没有选择最优解
-            p = np.argmin(_thresholds)  # type: int
-            tmp_nodes[p].prune()
-            for i, node in enumerate(tmp_nodes):
-                # 更新被影响的阈值
-                if node.affected:
-                    _thresholds[i] = node.get_threshold()
-                    node.affected = False
-            for i in range(len(tmp_nodes) - 1, - 1, -1):  # -1
-                # 除去各列表相应位置的元素
-                if tmp_nodes[i].pruned:
-                    tmp_nodes.pop(i)
-                    _thresholds = np.delete(_thresholds, i)
-                    # _prune()的对象是_tmp_nodes,_threshold，通过遍历的方式对所有可能节点进行剪枝
-        self.reduce_nodes()
+        tmp_nodes = list({id(node): node for node in self.nodes if node.category is None}.values())
+        _index = {id(node): i for i, node in enumerate(tmp_nodes)}
+        _n_leafs = np.array([node.n_leafs for node in tmp_nodes], dtype=float)
+        _costs = np.array([node.cost() for node in tmp_nodes], dtype=float)
+        _alive = np.ones(len(tmp_nodes), dtype=bool)
+
+        def _threshold(i):
+            return (tmp_nodes[i].cost(pruned=True) - _costs[i]) / (_n_leafs[i] - 1)
+
+        # 阈值相同时先剪掉在nodes中靠前的节点
+        _heap = [(_threshold(i), i) for i in range(len(tmp_nodes))]
+        heapq.heapify(_heap)
+        self.prune_path = []
+        while _heap:
+            alpha, p = heapq.heappop(_heap)
+            if self.stats is not None:
+                self.stats.add("prune_iterations")
+            if not _alive[p] or alpha != _threshold(p):
+                continue
+            node = tmp_nodes[p]
+            self.prune_path.append((float(alpha), node))
+            # 被剪掉的节点及其子孙不再是候选
+            _stack = [node]
+            while _stack:
+                _node = _stack.pop()
+                i = _index.get(id(_node))
+                if i is not None and _alive[i]:
+                    _alive[i] = False
+                    _stack += [_child for _child in _node.children.values() if _child is not None]
+            _d_leafs, _d_cost = 1 - _n_leafs[p], node.cost(pruned=True) - _costs[p]
+            _parent = node.parent
+            while _parent is not None:
+                i = _index[id(_parent)]
+                _n_leafs[i] += _d_leafs
+                _costs[i] += _d_cost
+                heapq.heappush(_heap, (_threshold(i), i))
+                _parent = _parent.parent
+
+    # 剪枝路径上每一棵子树在交叉验证集上的（加权）准确率
+    # 每个样本只在整棵树上走一遍：若某个节点在第s步被剪掉，第s棵以后的子树中经过它的样本都停在它那里
+    # 所以对一个样本，记到达节点路径上的第一个（最浅的）已被剪掉的节点，它在各棵子树中的预测在若干个连续的区间上不变，
+    # 区间的端点就是路径上“到根节点为止最早被剪掉的步数”的各个前缀最小值
+    def _prune_path_acc(self, x_cv, y_cv, weights=None):
+        n_steps = len(self.prune_path) + 1
+        flat = FlatTree(self.root, encoder=self.encoder)
+        nodes, parents = FlatTree.bfs(self.root)
+        _step = {id(node): s + 1 for s, (_, node) in enumerate(self.prune_path)}
+        steps = np.array([_step.get(id(node), n_steps) for node in nodes])
+        parents = np.array([-1 if p is None else p for p in parents])
+        # 从根节点到各节点的路径上最早被剪掉的步数（广度优先的顺序中父节点总在子节点前面）
+        prefix = steps.copy()
+        for i in range(1, len(nodes)):
+            prefix[i] = min(prefix[parents[i]], steps[i])
+        weights = np.ones(len(y_cv)) if weights is None else np.asarray(weights, dtype=float)
+        y_cv = np.asarray(y_cv)
+        cur = flat.apply(x_cv)
+        diff = np.zeros(n_steps + 1)
+        # 第0到prefix[到达节点] - 1棵子树中样本停在到达的节点
+        correct = weights * (flat.category[cur] == y_cv)
+        diff[0] += np.sum(correct)
+        np.add.at(diff, prefix[cur], -correct)
+        rows = np.arange(len(cur))
+        while len(rows) > 0:
+            node = cur[rows]
+            upper = np.where(parents[node] >= 0, prefix[np.maximum(parents[node], 0)], n_steps)
+            # 第steps[node]到upper - 1棵子树中样本停在node
+            record = steps[node] < upper
+            correct = weights[rows] * (flat.category[node] == y_cv[rows]) * record
+            np.add.at(diff, steps[node], correct)
+            np.add.at(diff, upper, -correct)
+            cur[rows] = parents[node]
+            rows = rows[parents[node] >= 0]
+        return np.cumsum(diff)[:n_steps] / np.sum(weights)
 
     @staticmethod
     def acc(y, y_pred, weights):  # 静态方法，无需实例化即可调用
         if weights is not None:
-            return np.sum((np.array(y) == np.array(y_pred) * weights)) / len(y)
+            return np.sum((np.array(y) == np.array(y_pred)) * weights) / np.sum(weights)
         return np.sum(np.array(y) == np.array(y_pred)) / len(y)
 
     def prune_(self, x_cv, y_cv, weights=None):
+        _start = time.perf_counter()
         if self.root.is_cart:
             # 如果该node使用cart剪枝，那么只有在确实传入交叉验证集的情况下才能调用相关函数，否则没有意义，选择最佳阈值
             if x_cv is not None and y_cv is not None:
                 self._cart_prune()
-                _arg = np.argmax([Base.acc(y_cv, tree.predict(x_cv), weights) for tree in self.roots])  # type: int
-                _tar_root = self.roots[_arg]  # 对于这里存的信息搞不懂元素是self.root然后呢
+                # 准确率最高的子树中最大的那一棵，依次剪掉剪枝路径上前_arg个节点就得到它
+                _arg = int(np.argmax(self._prune_path_acc(x_cv, y_cv, weights)))
+                for _, node in self.prune_path[:_arg]:
+                    node.prune()
                 self.nodes = []
-                # 调用cart_prune()会先清空node 中的tree属性，所以剪完了还要再feed_tree
-                #
-                _tar_root.feed_tree(self)
-                self.root = _tar_root
+                self.root.feed_tree(self)
+                if self.stats is not None:
+                    self.stats.add("pruned", _arg)
         else:
             self._prune()
+        self._flat = None
+        if self.stats is not None:
+            self.stats.add_time("prune", time.perf_counter() - _start)
+
+    # 超参数搜索：在一棵完全生长（不剪枝）的树上同时评估各个深度上限和各个剪枝惩罚因子，不用为每组参数重新训练
+    # 验证集的每个样本只沿树走一次，统计经过各节点的样本中类别与该节点的类别相同的（加权）个数（由终止节点逐层向上累加）
+    # 深度上限d相当于把深度为d的节点都变成叶节点；剪枝与_prune的准则相同，自底向上逐层对所有alpha同时计算，
+    # 得到的就是代价复杂度最小的子树（也就是CART剪枝路径上对应的子树），只用各节点的统计量，不需要数据
+    # depths默认为0到树的高度 - 1；alphas默认取整棵树的CART剪枝路径上相邻阈值的中点（第一个阈值大于0时第一个点取0），
+    # 每个点对应剪枝路径上的一棵子树；剪与不剪的比较与_prune一样用_prune_ok，恰好相等时两者的结论相同
+    # 返回{"depths", "alphas", "score": (深度数, alpha数)的验证集准确率, "n_leafs": 对应子树的叶节点数,
+    # "best": 准确率最高（相同时叶节点最少）的(深度, alpha)}，之后可以用prune_to得到对应的子树
+    def search(self, x_val, y_val, depths=None, alphas=None, weights=None):
+        nodes, parents = FlatTree.bfs(self.root)
+        flat = FlatTree(self.root, encoder=self.encoder)
+        n_nodes, n_class = len(nodes), len(self.label_dict)
+        parent = np.array([-1 if p is None else p for p in parents])
+        depth = np.array([node._depth for node in nodes]) - self.root._depth
+        is_leaf = flat.kind == LEAF
+        leaf_cost = np.array([(node.chaos or 0) * node._n for node in nodes], dtype=float)
+        levels = [np.flatnonzero(depth == k) for k in range(int(depth.max()) + 1)]
+        if depths is None:
+            depths = range(len(levels))
+        if alphas is None:
+            self._cart_prune()
+            _t = np.unique([alpha for alpha, _ in self.prune_path])
+            _edges = np.concatenate([[0.0], _t[_t > 0]])
+            alphas = np.zeros(1)
+            if len(_edges) > 1:
+                _edges = np.append(_edges, 2 * _edges[-1])
+                alphas = (_edges[:-1] + _edges[1:]) / 2
+                alphas[0] = 0.0 if _t[0] > 0 else alphas[0]
+        depths, alphas = np.array(list(depths), dtype=int), np.array(list(alphas), dtype=float)
+        # 类别编码，训练时没有见过的类别记为-1，永远预测不对
+        _codes = {c: i for i, c in self.label_dict.items()}
+        _uniques, _inverse = np.unique(np.asarray(y_val), return_inverse=True)
+        y_code = np.array([_codes.get(c, -1) for c in _uniques.tolist()], dtype=np.int64)[_inverse.ravel()]
+        weights = np.ones(len(y_code)) if weights is None else np.asarray(weights, dtype=float)
+        end = flat.apply(x_val)
+        # 停在某个节点的样本（多叉节点中找不到对应取值时停在非叶节点），子树在这里继续往下时用该节点的类别预测
+        _known = y_code >= 0
+        through = np.bincount(end[_known] * n_class + y_code[_known], weights[_known],
+                              minlength=n_nodes * n_class).reshape(n_nodes, n_class)
+        end_correct = through[np.arange(n_nodes), flat.category]
+        for level in levels[:0:-1]:
+            np.add.at(through, parent[level], through[level])
+        correct = through[np.arange(n_nodes), flat.category]
+        score = np.zeros((len(depths), len(alphas)))
+        n_leafs = np.zeros((len(depths), len(alphas)), dtype=int)
+        for i, d in enumerate(depths):
+            term = is_leaf | (depth >= d)
+            eff_cost = np.repeat(np.where(term, leaf_cost, 0)[:, None], len(alphas), axis=1)
+            eff_leafs = np.repeat(term[:, None].astype(float), len(alphas), axis=1)
+            pruned = np.zeros((n_nodes, len(alphas)), dtype=bool)
+            for k in range(min(d, len(levels) - 1) - 1, -1, -1):
+                children, level = levels[k + 1], levels[k][~term[levels[k]]]
+                sub_cost, sub_leafs = np.zeros((n_nodes, len(alphas))), np.zeros((n_nodes, len(alphas)))
+                np.add.at(sub_cost, parent[children], eff_cost[children])
+                np.add.at(sub_leafs, parent[children], eff_leafs[children])
+                sub_cost, sub_leafs = sub_cost[level], sub_leafs[level]
+                pruned[level] = _prune_ok(sub_cost + alphas * sub_leafs, leaf_cost[level, None] + alphas)
+                eff_cost[level] = np.where(pruned[level], leaf_cost[level, None], sub_cost)
+                eff_leafs[level] = np.where(pruned[level], 1, sub_leafs)
+            # 自顶向下：各节点是否还在子树中（父节点在子树中且没有变成叶节点）
+            stopped = term[:, None] | pruned
+            active = np.zeros((n_nodes, len(alphas)), dtype=bool)
+            active[levels[0]] = True
+            for level in levels[1:d + 1]:
+                active[level] = active[parent[level]] & ~stopped[parent[level]]
+            leaf = active & stopped
+            score[i] = (correct @ leaf + end_correct @ (active & ~stopped)) / max(np.sum(weights), 1e-12)
+            n_leafs[i] = leaf.sum(axis=0)
+        _order = np.lexsort((n_leafs.ravel(), -score.ravel()))
+        i, j = np.unravel_index(_order[0], score.shape)
+        return {"depths": depths, "alphas": alphas, "score": score, "n_leafs": n_leafs,
+                "best": (int(depths[i]), float(alphas[j]))}
+
+    # 把（完全生长的）树截断到max_depth，再按alpha剪枝（_prune的准则），得到与search中评估的相同的子树
+    # 截断的深度记在pruned_depth中，不改变max_depth这个超参数
+    def prune_to(self, max_depth=None, alpha=None):
+        if max_depth is not None:
+            for node in list(self.nodes):
+                if node._depth - self.root._depth == max_depth and node.category is None and not node.pruned:
+                    node.prune()
+            self.reduce_nodes()
+            self.pruned_depth = max_depth
+        if alpha is not None:
+            self.prune_alpha = alpha
+            self._prune()
+        self.nodes = []
+        self.root.feed_tree(self)
+        self._flat = None
+
+    # 只训练一次的超参数搜索：生成一棵不剪枝的树（max_depth仍是上限），用验证集（没有给出时按cv_rate随机留出）
+    # 搜索深度上限和剪枝惩罚因子，最后把树截断、剪枝成最好的那一组；返回search的结果
+    def fit_search(self, x, y, depths=None, alphas=None, x_val=None, y_val=None, cv_rate=0.2, sample_weight=None,
+                   feature_bound="log", max_bins=None, eps=1e-8):
+        x, y = np.atleast_2d(x), np.asarray(y)
+        if x_val is None:
+            indices = self.rng.permutation(len(x))
+            _train, _valid = indices[:int(len(x) * (1 - cv_rate))], indices[int(len(x) * (1 - cv_rate)):]
+            x_val, y_val = x[_valid], y[_valid]
+            x, y = x[_train], y[_train]
+            sample_weight = None if sample_weight is None else np.asarray(sample_weight)[_train]
+        self.fit(x, y, sample_weight=sample_weight, eps=eps, train_only=True, feature_bound=feature_bound,
+                 max_bins=max_bins, prune=False)
+        res = self.search(x_val, y_val, depths, alphas)
+        self.prune_to(*res["best"])
+        return res
 
     def predict_one(self, x):
             return self.label_dict[self.root.predict_one(x)]
 
+    # 把树编译成FlatTree（只在树的结构改变后重新编译）
+    def compile(self):
+        if self._flat is None:
+            self._flat = FlatTree(self.root, [self.label_dict[i] for i in range(len(self.label_dict))], self.encoder)
+        return self._flat
+
+    # 把树生成为嵌套比较语句组成的Python函数f，f(x)对一行原始取值返回类别，比predict_one快得多
+    # 生成的函数缓存在编译好的FlatTree中，树的结构改变后重新生成
+    def to_function(self):
+        return self.compile().to_function()
+
+    # 把编译好的FlatTree存成不压缩的.npz，只有节点数组、类别和离散特征的取值，不含训练数据和Node对象
+    # 用FlatTree.load(path)读回来（默认内存映射），可以直接predict
+    def save(self, path):
+        self.compile().save(path)
+
+    # 用编译好的FlatTree一层一层地批量预测（有encoder时任意类型的输入都可以），否则逐行预测
     def predict(self, x):
-            return np.array([self.predict_one(xx) for xx in x])  # 尚且可以优化提示运行速度
+            x = np.asarray(x)
+            if self.encoder is not None or x.dtype.kind in "biuf":
+                return self.compile().predict(x)
+            return np.array([self.predict_one(xx) for xx in x])
+
+    # 各样本属于各类别的概率（到达的叶节点中训练样本各类别的比例），各列按label_dict中类别编码的顺序排列
+    def predict_proba(self, x):
+        return self.compile().predict_proba(x)
 
     def estimate(self, x, y, get_raw_result=False):
         y = np.array(y)
@@ -319,17 +788,8 @@ class Base:
                         cv2.line(img, (x, y + radius), (x + int(dx * ratio), y + radius + int(dy * ratio)),
                                  (125, 125, 125), 1)
                         node = self.layers[i + 1][k]
-                        if self.rev_feat_dic is not None:
-                            cv2.putText(img,
-                                        str(self.rev_feat_dic[node.parent.feature_dim][node.prev_feat]
-                                            if node.prev_feat is not "+" and self.rev_feat_dic[
-                                            node.parent.feature_dim] is not None
-                                            else node.prev_feat),
-                                        (x + int(dx * 0.5) - 6, y + radius + int(dy * 0.5)),
-                                        cv2.LINE_AA, 0.6, (0, 0, 0), 1)
-                        else:
-                            cv2.putText(img=img, text=str(node.prev_feat), org=(x+int(dx*0.5)-6, y+radius+int(dy*0.5)),
-                                        fontFace=cv2.LINE_AA, fontScale=0.6, color=(0, 0, 0), thickness=1)
+                        cv2.putText(img=img, text=self._edge_text(node), org=(x+int(dx*0.5)-6, y+radius+int(dy*0.5)),
+                                    fontFace=cv2.LINE_AA, fontScale=0.6, color=(0, 0, 0), thickness=1)
                         cv2.line(img, (new_x - int(dx * ratio), new_y - radius - int(dy * ratio)),
                                  (new_x, new_y - radius), (125, 125, 125), 1)
 
@@ -340,6 +800,16 @@ class Base:
         cv2.waitKey(0)
         return img
 
+    # 子节点连线上的文字，给定rev_feat_dic时换回特征原来的取值
+    # CART离散特征的左子节点对应一个取值集合，逐个换回原来的取值
+    def _edge_text(self, node):
+        _rev = None if self.rev_feat_dic is None else self.rev_feat_dic[node.parent.feature_dim]
+        if isinstance(node.prev_feat, frozenset):
+            return "{" + ",".join(str(v if _rev is None else _rev[v]) for v in sorted(node.prev_feat)) + "}"
+        if _rev is None or isinstance(node.prev_feat, str):
+            return str(node.prev_feat)
+        return str(_rev[node.prev_feat])
+
 
 class ID3Tree(Base):
     def __init__(self, *args, **kwargs):
@@ -0,0 +1,199 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# 分布式训练：多个worker各持有一部分样本（分片），协调者（Base.fit_distributed）只收发统计量，样本不汇集到一处
+# 1. 各worker在自己的分片上扫描一遍，得到QuantileSketch，协调者合并后确定分箱，把Binner发给各worker
+# 2. 每一层协调者把当前的树（FlatTree）和待划分节点的编号发给各worker，worker在自己的分片上统计这些节点的
+#    (节点, 箱, 类别)直方图发回，协调者求和后与流式训练一样用Node._find_hist_split选择划分，直到没有节点可以划分
+# worker与协调者之间用multiprocessing.connection通信：本机的worker是ShardPool启动的子进程（Pipe），
+# 其他机器上的worker用connect连到ShardPool.listen监听的地址（套接字），两种情况下协议相同
+# 连接上传的是pickle，任何能连上端口的人都能借此执行代码，所以套接字连接一定要用authkey认证
+#     python -m DecisionTree.Distributed --connect host:6000 --x shard0_x.npy --y shard0_y.npy --authkey ...
+from DecisionTree.Stream import ChunkSource, QuantileSketch, HistogramSource
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Client, Listener
+import argparse
+import ipaddress
+import logging
+import os
+import socket
+import traceback
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _authkey(authkey):
+    if authkey is None or len(authkey) == 0:
+        raise ValueError("套接字连接必须给定authkey")
+    return authkey.encode() if isinstance(authkey, str) else bytes(authkey)
+
+
+# 是否只有本机能连上：Unix域套接字等非(host, port)地址，或host解析为回环地址
+def _is_loopback(address):
+    if not isinstance(address, tuple):
+        return True
+    try:
+        return all(ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(address[0], None))
+    except (socket.gaierror, ValueError):
+        return False
+
+
+def _as_source(source):
+    if isinstance(source, ChunkSource):
+        return source
+    return ChunkSource(*source) if isinstance(source, tuple) else ChunkSource(source)
+
+
+# worker的主循环：依次处理协调者发来的(命令, 参数)，把("ok", 结果)或("error", 异常信息)发回，收到close时退出
+# source: 本分片的数据，可以是ChunkSource、(x, y[, sample_weight])或返回数据块迭代器的函数（在worker中调用，数据在worker中读入）
+def serve(conn, source):
+    source, hist_source = _as_source(source), None
+    while True:
+        cmd, args = conn.recv()
+        if cmd == "close":
+            break
+        try:
+            if cmd == "sketch":
+                size, cap, whether_continuous, seed = args
+                res = None
+                for x, y, _ in source:
+                    if res is None:
+                        res = QuantileSketch(x.shape[1], size, cap, whether_continuous, seed)
+                    res.update(x, y)
+            elif cmd == "setup":
+                hist_source, res = HistogramSource(source, *args), None
+            elif cmd == "hist":
+                res = hist_source(*args)
+            else:
+                raise ValueError("未知的命令: {}".format(cmd))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+            continue
+        conn.send(("ok", res))
+
+
+# 其他机器上的worker：连到协调者ShardPool.listen的地址，处理完所有命令后返回
+# authkey: 与ShardPool.listen相同的密钥（bytes或str），必须给定
+def connect(address, source, authkey):
+    conn = Client(address, authkey=_authkey(authkey))
+    try:
+        serve(conn, source)
+    finally:
+        conn.close()
+
+
+class ShardPool:
+    """
+    self.conns: 与各worker的连接，本机的worker是Pipe，其他机器上的worker是套接字
+    self.processes: 本机启动的worker进程
+    self.authkey: listen时各worker用来认证的密钥（本机的Pipe不需要，为None）
+    调用时与HistogramSource相同：给定FlatTree和各节点的待划分节点编号，返回所有分片上直方图的和，可直接交给Base._grow_levels
+    """
+    def __init__(self, sources=(), conns=None):
+        self.conns, self.processes = list(conns) if conns is not None else [], []
+        self.authkey = None
+        for source in sources:
+            parent, child = Pipe()
+            process = Process(target=serve, args=(child, source), daemon=True)
+            process.start()
+            child.close()
+            self.conns.append(parent)
+            self.processes.append(process)
+
+    def __str__(self):
+        return "ShardPool ({} workers)".format(len(self.conns))
+
+    __repr__ = __str__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # 在address上等待n_workers个其他机器上的worker（connect）连进来
+    # authkey为None时只允许监听回环地址，并随机生成一个密钥，保存在返回的pool.authkey中
+    # 密钥不会打印到标准输出；本机的worker需要它时，对本模块的logger开启DEBUG级别的日志就能看到
+    @staticmethod
+    def listen(address, n_workers, authkey=None):
+        if authkey is None:
+            if not _is_loopback(address):
+                raise ValueError("监听非回环地址{}时必须给定authkey".format(address))
+            authkey = os.urandom(16).hex()
+            logger.debug("ShardPool authkey: %s", authkey)
+        authkey = _authkey(authkey)
+        with Listener(address, authkey=authkey) as listener:
+            pool = ShardPool(conns=[listener.accept() for _ in range(n_workers)])
+        pool.authkey = authkey
+        return pool
+
+    # 先把命令发给所有worker再依次接收，各worker同时计算；args_list给出各worker的参数，否则都用args
+    def _call(self, cmd, args=None, args_list=None):
+        for i, conn in enumerate(self.conns):
+            conn.send((cmd, args if args_list is None else args_list[i]))
+        results, errors = [], []
+        for conn in self.conns:
+            status, res = conn.recv()
+            (results if status == "ok" else errors).append(res)
+        if errors:
+            raise RuntimeError("worker出错:\n{}".format(errors[0]))
+        return results
+
+    # 合并各分片上的QuantileSketch；各worker的蓄水池用不同的种子
+    def sketch(self, size=100000, cap=255, whether_continuous=None, seed=None):
+        sketches = self._call("sketch", args_list=[
+            (size, cap, whether_continuous, None if seed is None else seed + i) for i in range(len(self.conns))])
+        res = None
+        for sketch in sketches:
+            if sketch is not None:
+                res = sketch if res is None else res.merge(sketch)
+        if res is None:
+            raise ValueError("所有分片都没有数据")
+        return res
+
+    def setup(self, binner, labels):
+        self._call("setup", (binner, labels))
+
+    # 有的分片带样本权重、有的没有时，没有权重的分片的样本数就是它的直方图
+    def __call__(self, flat, slots):
+        hist, sizes, weighted = None, None, False
+        for _hist, _sizes in self._call("hist", (flat, slots)):
+            weighted |= _sizes is not None
+            _sizes = _hist if _sizes is None else _sizes
+            hist = _hist if hist is None else hist + _hist
+            sizes = _sizes if sizes is None else sizes + _sizes
+        return hist, sizes if weighted else None
+
+    def close(self):
+        for conn in self.conns:
+            try:
+                conn.send(("close", None))
+                conn.close()
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join()
+        self.conns, self.processes = [], []
+
+
+def _address(value):
+    host, port = value.rsplit(":", 1)
+    return host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DecisionTree distributed worker")
+    parser.add_argument("--connect", type=_address, required=True, help="协调者监听的地址host:port")
+    parser.add_argument("--x", required=True, help="本分片特征矩阵的.npy文件（以内存映射方式读取）")
+    parser.add_argument("--y", required=True, help="本分片类别向量的.npy文件")
+    parser.add_argument("--sample-weight", help="本分片样本权重的.npy文件")
+    parser.add_argument("--chunk-size", type=int, default=65536)
+    parser.add_argument("--authkey", required=True, help="与ShardPool.listen相同的authkey")
+    args = parser.parse_args(argv)
+    w = None if args.sample_weight is None else np.load(args.sample_weight, mmap_mode="r")
+    source = ChunkSource(np.load(args.x, mmap_mode="r"), np.load(args.y, mmap_mode="r"), w, args.chunk_size)
+    connect(args.connect, source, args.authkey)
+
+
+if __name__ == "__main__":
+    main()
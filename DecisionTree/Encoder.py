@@ -0,0 +1,62 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# Encoder用np.unique一次性地把类别向量和各离散特征编码成整数（排好序的取值中的位置），训练时只用这些编码
+# 训练完把各节点的划分标准换回原始取值；预测时离散特征再按同样的取值编码，可以批量预测任意类型的输入
+import numpy as np
+
+
+class Encoder:
+    """
+    self.labels: 排好序的所有类别，类别编码就是在其中的位置
+    self.values: 各特征排好序的所有取值，编码就是取值在其中的位置；连续特征不编码，记为None
+    self.whether_continuous: 各特征是否连续
+    """
+    def __init__(self, whether_continuous=None):
+        self.labels, self.values = None, []
+        self.whether_continuous = None if whether_continuous is None else np.asarray(whether_continuous)
+
+    def __str__(self):
+        return "Encoder ({})".format(len(self.values))
+
+    __repr__ = __str__
+
+    # 返回类别编码
+    def fit_labels(self, y):
+        self.labels, y = np.unique(np.asarray(y), return_inverse=True)
+        return y.ravel()
+
+    # 判断各特征是否连续（取值个数大于样本数的continuous_rate倍时判定为连续），记录离散特征的取值
+    # 返回训练用的矩阵：连续特征保持原始取值，离散特征换成编码
+    def fit(self, x, continuous_rate=0.2):
+        data_len, data_dim = x.shape
+        _values, _codes = zip(*[np.unique(column, return_inverse=True) for column in x.T])
+        if self.whether_continuous is None:
+            self.whether_continuous = np.array([len(values) > continuous_rate * data_len for values in _values])
+        self.values = [None if continuous else values for continuous, values in zip(self.whether_continuous, _values)]
+        if not np.any(self.whether_continuous):
+            _dtype = np.uint8 if max(len(values) for values in _values) <= 256 else np.int32
+            return np.column_stack([codes.ravel() for codes in _codes]).astype(_dtype)
+        res = np.empty(x.shape)
+        for feat, (continuous, codes) in enumerate(zip(self.whether_continuous, _codes)):
+            res[:, feat] = x[:, feat] if continuous else codes.ravel()
+        return res
+
+    # 把某个离散特征的取值换成编码，没有见过的取值编码为-1
+    def encode(self, feat, data):
+        values = self.values[feat]
+        if len(values) == 0:
+            return np.full(len(data), -1)
+        data = np.asarray(data)
+        pos = np.minimum(np.searchsorted(values, data), len(values) - 1)
+        return np.where(values[pos] == data, pos, -1)
+
+    # 预测时的输入：连续特征保持原始取值，离散特征换成编码
+    def transform(self, x):
+        x = np.atleast_2d(np.asarray(x))
+        res = np.empty(x.shape)
+        for feat, continuous in enumerate(self.whether_continuous):
+            res[:, feat] = x[:, feat] if continuous else self.encode(feat, x[:, feat])
+        return res
+
+    def decode(self, feat, codes):
+        return self.values[feat][codes]
@@ -0,0 +1,306 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# FlatTree把训练好的由Node连接起来的决策树编译成若干个平行的numpy数组，用于批量预测
+# 预测时不再逐行递归，而是让所有样本一层一层地同时往下走
+# to_function把树生成为一个由嵌套的比较语句组成的Python函数（常量直接写在代码里），用于低延迟地逐行预测
+# save把这些数组（连同类别和各离散特征的取值）存成不压缩的.npz，load时直接内存映射，不必读入内存，多个进程共享同一份页面
+from DecisionTree.Encoder import Encoder
+import numpy as np
+import struct
+import zipfile
+
+# 各节点的划分方式
+LEAF, CONTINUOUS, CART, MULTIWAY = 0, 1, 2, 3
+
+# 生成代码时每个函数至多嵌套的层数，更深的子树放到单独的函数中，避免超过解释器的嵌套限制
+_FUNC_DEPTH = 50
+
+# 存盘的节点数组
+_ARRAYS = ("feature", "threshold", "kind", "left", "right", "category", "proba", "child_ptr", "child_values",
+           "child_nodes")
+
+
+# object类型的数组（例如从object矩阵中得到的字符串取值）尽量换成普通类型，这样读取时不需要pickle
+def _plain(arr):
+    if arr.dtype.hasobject and len(arr) > 0:
+        _arr = np.array(arr.tolist())
+        if not _arr.dtype.hasobject and _arr.shape == arr.shape and _arr.tolist() == arr.tolist():
+            return _arr
+    return arr
+
+
+# 按内存映射的方式读取不压缩的.npz中的各个数组：zip中每个成员就是一个.npy文件，找到数据的起始位置即可
+# 压缩的成员、object类型（需要pickle）和空数组没法映射，照常读入内存
+def _load_npz(path, mmap_mode="r", allow_pickle=False):
+    res = {}
+    with open(path, "rb") as f, zipfile.ZipFile(f) as zf:
+        for info in zf.infolist():
+            key = info.filename[:-4] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED or mmap_mode is None:
+                with zf.open(info) as member:
+                    res[key] = np.lib.format.read_array(member, allow_pickle=allow_pickle)
+                continue
+            # zip本地文件头固定30字节，之后是文件名和扩展字段，长度记录在第26~30字节
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or np.prod(shape) == 0:
+                f.seek(info.header_offset + 30 + name_len + extra_len)
+                res[key] = np.lib.format.read_array(f, allow_pickle=allow_pickle)
+                continue
+            res[key] = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape,
+                                 order="F" if fortran_order else "C")
+    return res
+
+
+class FlatTree:
+    """
+    节点按广度优先的顺序编号，根节点为0，以下数组的第i个元素描述第i个节点
+    self.feature: 作为划分标准的特征维度，叶节点为-1
+    self.threshold: 连续特征的二分阈值（x < threshold 走左边）
+    self.kind: 划分方式，LEAF, CONTINUOUS, CART, MULTIWAY 之一
+    self.left, self.right: 二分节点的左右子节点编号，其余为-1
+    self.category: 每个节点（包括非叶节点）所属的类别，非叶节点用于多叉节点找不到对应取值时的预测
+    self.proba: (节点数, 类别数)的float32矩阵，每个节点（包括非叶节点）训练样本中各类别的比例，用于predict_proba
+    self.child_ptr, self.child_values, self.child_nodes: 多叉节点（ID3, C4.5离散特征）的子节点，
+    第i个节点的子节点是child_nodes[child_ptr[i]:child_ptr[i+1]]，对应的取值child_values已排好序；
+    CART离散特征的节点在这里记录分到左边的各取值（对应的子节点都是左子节点），其余取值走右边
+    self.labels: 类别编码对应的原始类别，为None时predict直接返回类别编码
+    self.encoder: 给定时离散特征的取值都记为编码（Encoder），输入先经过encoder.transform，可以是任意类型
+    """
+    def __init__(self, root=None, labels=None, encoder=None):
+        self.feature = self.threshold = self.kind = None
+        self.left = self.right = self.category = self.proba = None
+        self.child_ptr = self.child_values = self.child_nodes = None
+        self.labels = None if labels is None else np.asarray(labels)
+        self.encoder = encoder
+        self._function = None
+        if root is not None:
+            self.compile(root)
+
+    def __str__(self):
+        return "FlatTree ({})".format(0 if self.kind is None else len(self.kind))
+
+    __repr__ = __str__
+
+    def __len__(self):
+        return len(self.kind)
+
+    # 广度优先遍历各节点，返回各节点（顺序就是它们在数组中的编号）及其父节点的编号
+    @staticmethod
+    def bfs(root):
+        nodes, parents = [root], [None]
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            if node.category is None and node.feature_dim is not None:
+                for child in node.children.values():
+                    if child is not None:
+                        nodes.append(child)
+                        parents.append(i)
+            i += 1
+        return nodes, parents
+
+    # 把各节点的信息填进数组
+    def compile(self, root):
+        nodes, parents = FlatTree.bfs(root)
+        ids = {id(node): i for i, node in enumerate(nodes)}
+        n = len(nodes)
+        self.feature = np.full(n, -1, dtype=np.int32)
+        self.threshold = np.zeros(n)
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.left, self.right = np.full(n, -1, dtype=np.int32), np.full(n, -1, dtype=np.int32)
+        self.category = np.zeros(n, dtype=np.int32)
+        n_class = len(self.labels) if self.labels is not None else max(
+            [len(node._counts) for node in nodes if node._counts is not None] or [1])
+        self.proba = np.zeros((n, n_class), dtype=np.float32)
+        child_ptr, child_values, child_nodes = np.zeros(n + 1, dtype=np.int32), [], []
+        for i, node in enumerate(nodes):
+            # 没有样本的子节点（fit时被跳过）沿用父节点的类别和各类别的比例
+            if node._counts is None or np.sum(node._counts) <= 0:
+                self.category[i] = self.category[parents[i]] if parents[i] is not None else 0
+                if parents[i] is not None:
+                    self.proba[i] = self.proba[parents[i]]
+            else:
+                self.category[i] = node.get_category() if node.category is None else node.category
+                self.proba[i, :len(node._counts)] = node._counts / np.sum(node._counts)
+            if node.category is None and node.feature_dim is not None:
+                self.feature[i] = node.feature_dim
+                if node.is_continuous or node.is_cart:
+                    self.left[i], self.right[i] = ids[id(node.left_child)], ids[id(node.right_child)]
+                    if node.is_continuous:
+                        self.kind[i], self.threshold[i] = CONTINUOUS, node.tar
+                    else:
+                        self.kind[i] = CART
+                        values = sorted(node.tar)
+                        child_values += self._encode(node.feature_dim, values)
+                        child_nodes += [self.left[i]] * len(values)
+                else:
+                    self.kind[i] = MULTIWAY
+                    values = sorted(node.children)
+                    child_values += self._encode(node.feature_dim, values)
+                    child_nodes += [ids[id(node.children[value])] for value in values]
+            child_ptr[i + 1] = len(child_nodes)
+        self.child_ptr = child_ptr
+        self.child_values = np.array(child_values, dtype=float)
+        self.child_nodes = np.array(child_nodes, dtype=np.int32)
+        return self
+
+    # 有encoder时把离散特征排好序的取值换成编码（编码的顺序与取值的顺序一致）
+    def _encode(self, feat, values):
+        if self.encoder is None:
+            return values
+        return self.encoder.encode(feat, values).tolist()
+
+    # 返回每个样本最终到达的节点编号
+    def apply(self, x):
+        x = self.encoder.transform(x) if self.encoder is not None else np.atleast_2d(np.asarray(x, dtype=float))
+        node = np.zeros(len(x), dtype=np.int32)
+        active = np.flatnonzero(self.kind[node] != LEAF)
+        while len(active) > 0:
+            cur = node[active]
+            kind = self.kind[cur]
+            values = x[active, self.feature[cur]]
+            nxt = np.where(values < self.threshold[cur], self.left[cur], self.right[cur])
+            lookup = np.flatnonzero(kind >= CART)
+            if len(lookup) > 0:
+                found = self._multiway_children(cur[lookup], values[lookup])
+                # CART节点的取值不在左边的集合中时走右边
+                nxt[lookup] = np.where((found < 0) & (kind[lookup] == CART), self.right[cur[lookup]], found)
+            # 多叉节点找不到对应取值时（nxt为-1）就停在当前节点
+            node[active] = np.where(nxt >= 0, nxt, cur)
+            active = active[nxt >= 0]
+            active = active[self.kind[node[active]] != LEAF]
+        return node
+
+    # 对停在各多叉（或CART离散特征）节点的样本，在该节点排好序的子节点取值中二分查找，找不到的返回-1
+    def _multiway_children(self, cur, values):
+        res = np.full(len(cur), -1, dtype=np.int32)
+        for j in np.unique(cur):
+            mask = cur == j
+            start, stop = self.child_ptr[j], self.child_ptr[j + 1]
+            if start == stop:
+                continue
+            seg = self.child_values[start:stop]
+            pos = np.minimum(np.searchsorted(seg, values[mask]), len(seg) - 1)
+            found = seg[pos] == values[mask]
+            res[mask] = np.where(found, self.child_nodes[start + pos], -1)
+        return res
+
+    # 生成逐行预测的函数的源代码：predict_row(x)，x是一行原始取值（list, tuple或一维数组），返回类别
+    # 离散特征的取值、类别等不便写成字面量的常量放在返回的namespace中，exec时作为全局变量
+    def to_source(self, name="predict_row"):
+        namespace, lines = {}, []
+        labels = None if self.labels is None else self.labels.tolist()
+
+        def _const(value):
+            if isinstance(value, np.generic):
+                value = value.item()
+            if type(value) in (int, str, bool) or (type(value) is float and value == value):
+                return repr(value)
+            key = "_c{}".format(len(namespace))
+            namespace[key] = value
+            return key
+
+        def _values(i):
+            values = self.child_values[self.child_ptr[i]:self.child_ptr[i + 1]]
+            if self.encoder is not None:
+                return self.encoder.decode(int(self.feature[i]), values.astype(np.intp)).tolist()
+            return values.tolist()
+
+        def _leaf(i):
+            category = int(self.category[i])
+            return _const(category if labels is None else labels[category])
+
+        # 从node开始生成函数func_name，嵌套超过_FUNC_DEPTH层的子树放入queue，另外生成函数
+        queue = [(name, 0)]
+        while queue:
+            func_name, root = queue.pop()
+            lines.append("def {}(x):".format(func_name))
+            stack = [(root, 1)]
+            while stack:
+                i, depth = stack.pop()
+                if isinstance(i, str):  # 直接输出的代码行
+                    lines.append("    " * depth + i)
+                    continue
+                pad = "    " * depth
+                if self.kind[i] == LEAF:
+                    lines.append(pad + "return " + _leaf(i))
+                    continue
+                if depth > _FUNC_DEPTH:
+                    sub = "_f{}".format(i)
+                    queue.append((sub, i))
+                    lines.append(pad + "return {}(x)".format(sub))
+                    continue
+                feat = int(self.feature[i])
+                if self.kind[i] == CONTINUOUS:
+                    test = "x[{}] < {}".format(feat, _const(float(self.threshold[i])))
+                    children = [(test, self.left[i]), (None, self.right[i])]
+                elif self.kind[i] == CART:
+                    test = "x[{}] in {}".format(feat, _const(frozenset(_values(i))))
+                    children = [(test, self.left[i]), (None, self.right[i])]
+                else:
+                    start, stop = self.child_ptr[i], self.child_ptr[i + 1]
+                    children = [("x[{}] == {}".format(feat, _const(value)), self.child_nodes[j])
+                                for value, j in zip(_values(i), range(start, stop))]
+                    # 找不到对应取值时返回当前节点的类别
+                    children.append((None, "return " + _leaf(i)))
+                # 每个分支都以return结束，所以不需要else，最后一个分支直接接在后面；栈是后进先出的，倒序压入
+                for test, child in children[::-1]:
+                    if test is None:
+                        stack.append((child if isinstance(child, str) else int(child), depth))
+                    else:
+                        stack.append((int(child), depth + 1))
+                        stack.append(("if {}:".format(test), depth))
+        return "\n".join(lines) + "\n", namespace
+
+    # 生成的函数会缓存起来，只生成一次
+    def to_function(self, name="predict_row"):
+        if self._function is None:
+            source, namespace = self.to_source(name)
+            exec(compile(source, "<FlatTree {}>".format(name), "exec"), namespace)
+            self._function = namespace[name]
+        return self._function
+
+    # 存成不压缩的.npz：节点数组、类别（labels_）和encoder中各特征是否连续及离散特征的取值（values_i）
+    def save(self, path):
+        arrays = {name: getattr(self, name) for name in _ARRAYS}
+        if self.labels is not None:
+            arrays["labels_"] = _plain(self.labels)
+        if self.encoder is not None:
+            arrays["whether_continuous_"] = np.asarray(self.encoder.whether_continuous)
+            for feat, values in enumerate(self.encoder.values):
+                if values is not None:
+                    arrays["values_{}".format(feat)] = _plain(values)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    # mmap_mode为None时全部读入内存；类别或取值是object类型时需要allow_pickle
+    @staticmethod
+    def load(path, mmap_mode="r", allow_pickle=False):
+        arrays = _load_npz(path, mmap_mode, allow_pickle)
+        flat = FlatTree(labels=arrays.get("labels_"))
+        for name in _ARRAYS:
+            setattr(flat, name, arrays.get(name))
+        if "whether_continuous_" in arrays:
+            flat.encoder = Encoder(arrays["whether_continuous_"])
+            flat.encoder.values = [arrays.get("values_{}".format(feat))
+                                   for feat in range(len(flat.encoder.whether_continuous))]
+        return flat
+
+    # 返回(样本数, 类别数)的float32矩阵，各列按类别编码（labels）的顺序排列
+    # 加入proba之前保存的文件中没有各节点的类别比例，也没有能重新算出它的计数，只能预测类别
+    def predict_proba(self, x):
+        if self.proba is None:
+            raise ValueError("FlatTree中没有各类别的比例（文件可能是加入proba之前保存的），请重新编译并保存")
+        return self.proba[self.apply(x)]
+
+    # 返回类别（给定了labels时是原始类别，否则是类别编码）
+    def predict(self, x):
+        category = self.category[self.apply(x)]
+        return category if self.labels is None else self.labels[category]
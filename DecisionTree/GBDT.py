@@ -0,0 +1,295 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# GBDT：直方图梯度提升回归树。每一轮在当前预测值处求损失的一阶导数g和二阶导数h（float32的缓冲区，每轮原地更新），
+# 再用Cluster.grad_split（方差减少 / 二阶近似的增益）生成一棵回归树，叶节点的值为 -G / (H + λ) * learning_rate
+# 训练前用Stream.Binner把特征分箱一次（连续特征至多max_bins个箱），之后所有的树都只在箱的编码上统计直方图；
+# 一个节点划分后只为样本较少的子节点统计直方图，另一个子节点的直方图等于父节点的减去它的
+# 训练集上的预测值由各叶节点的样本直接更新，验证集只分箱一次；验证集上的损失连续n_iter_no_change轮没有改善时提前停止
+from DecisionTree.Cluster import Cluster
+from DecisionTree.Stats import Stats
+from DecisionTree.Stream import Binner, bin_edges
+from itertools import count
+import heapq
+import time
+import numpy as np
+
+
+# 这里没有复用Base/Node的生成过程（Node.fit, Cluster.best_hist_split）：
+# Node的直方图统计的是各类别的样本数，按信息增益/基尼系数划分，叶节点保存类别，每个节点都是带Cluster和子节点的对象；
+# 梯度提升的每个箱统计的是(G, H, n)，增益和叶节点的值都由G和H算出，而且每一轮都要重新生成一棵树，
+# 所以节点直接存成数组，预测时对所有样本一起向下走。分箱（Binner）、按增益从大到小划分的堆、
+# 只为较小的子节点统计直方图再由父节点相减得到另一个，这几部分的做法与Node相同
+class RegressionTree:
+    """
+    一棵回归树的节点数组，按生成的顺序编号（0是根节点），叶节点的feature为-1
+    self.feature, self.split: 内部节点划分的特征和统一箱编号，编号 < split 的样本走左子节点
+    self.threshold: 连续特征上与split等价的原始取值（原始取值 < threshold 走左边），离散特征为nan
+    self.left, self.right, self.value: 左右子节点和叶节点的值（已乘以learning_rate）
+    """
+    def __init__(self, feature, split, threshold, left, right, value):
+        self.feature, self.split, self.threshold = feature, split, threshold
+        self.left, self.right, self.value = left, right, value
+
+    def __str__(self):
+        return "RegressionTree ({})".format(len(self.feature))
+
+    __repr__ = __str__
+
+    # codes: Binner.transform得到的统一箱编号，返回每个样本到达的叶节点
+    def apply(self, codes):
+        node = np.zeros(len(codes), dtype=np.int32)
+        active = np.flatnonzero(self.feature[node] >= 0)
+        while len(active) > 0:
+            cur = node[active]
+            go_left = codes[active, self.feature[cur]] < self.split[cur]
+            node[active] = np.where(go_left, self.left[cur], self.right[cur])
+            active = active[self.feature[node[active]] >= 0]
+        return node
+
+    def predict(self, codes):
+        return self.value[self.apply(codes)]
+
+
+class GBDT:
+    """
+    self.loss: "squared"（回归）或"logistic"（二分类，预测值是对数几率）
+    self.n_estimators, self.learning_rate: 最多的树的棵数和每棵树的缩放系数
+    self.max_leaf_nodes, self.max_depth, self.min_samples_leaf: 每棵树按增益从大到小划分叶节点，直到叶节点数达到上限
+    self.reg_lambda, self.min_child_weight: 叶节点值的L2正则和子节点至少要有的二阶导数和
+    self.max_bins, self.whether_continuous: 连续特征的最多箱数和各特征是否连续（None时全部按连续处理）
+    self.validation_fraction, self.n_iter_no_change, self.tol: 提前停止用的验证集比例（fit没有给出eval_set时），
+    验证集上的损失连续n_iter_no_change轮没有减小tol以上时停止；n_iter_no_change为None时不提前停止
+    self.binner: 训练集上确定的分箱方法
+    self.unseen_bins: 离散特征上训练时没见过的取值归入的箱（训练集上样本最多的取值的箱），连续特征为-1
+    self.trees, self.init_score: 各轮的回归树和初始预测值
+    self.labels: logistic时的两个类别（排好序）
+    self.train_loss, self.valid_loss, self.best_iteration: 各轮的训练集、验证集损失和保留的树的棵数
+    self.record_stats, self.stats: 是否记录训练的计数和计时，及最近一次训练记录的Stats（不记录时为None）
+    """
+    def __init__(self, loss="squared", n_estimators=100, learning_rate=0.1, max_leaf_nodes=31, max_depth=None,
+                 min_samples_leaf=20, reg_lambda=1.0, min_child_weight=1e-3, max_bins=255, whether_continuous=None,
+                 validation_fraction=0.1, n_iter_no_change=10, tol=1e-7, seed=None, stats=False):
+        assert loss in ("squared", "logistic"), "loss应为'squared'或'logistic'"
+        assert 2 <= max_bins <= 256, "max_bins应在2到256之间"
+        self.loss, self.n_estimators, self.learning_rate = loss, n_estimators, learning_rate
+        self.max_leaf_nodes, self.max_depth, self.min_samples_leaf = max_leaf_nodes, max_depth, min_samples_leaf
+        self.reg_lambda, self.min_child_weight = reg_lambda, min_child_weight
+        self.max_bins = max_bins
+        self.whether_continuous = None if whether_continuous is None else np.asarray(whether_continuous)
+        self.validation_fraction, self.n_iter_no_change, self.tol = validation_fraction, n_iter_no_change, tol
+        self.seed = seed
+        self.binner, self.unseen_bins, self.trees, self.init_score, self.labels = None, None, [], 0.0, None
+        self.train_loss, self.valid_loss, self.best_iteration = [], [], 0
+        self.record_stats, self.stats = stats, None
+
+    def __str__(self):
+        return "GBDT ({})".format(len(self.trees))
+
+    __repr__ = __str__
+
+    # 连续特征的分箱边界在至多200000行的随机样本上估计
+    def _fit_binner(self, x, rng):
+        if self.whether_continuous is None:
+            self.whether_continuous = np.ones(x.shape[1], dtype=bool)
+        sample = x[rng.choice(len(x), 200000, replace=False)] if len(x) > 200000 else x
+        edges = [bin_edges(sample[:, feat].astype(float), self.max_bins) if c else None
+                 for feat, c in enumerate(self.whether_continuous)]
+        values, self.unseen_bins = [], np.full(x.shape[1], -1, dtype=np.int64)
+        for feat, c in enumerate(self.whether_continuous):
+            if c:
+                values.append(None)
+                continue
+            _values, _counts = np.unique(x[:, feat], return_counts=True)
+            values.append(_values)
+            self.unseen_bins[feat] = int(np.argmax(_counts))
+        self.binner = Binner(self.whether_continuous, edges, values)
+        self.unseen_bins[~self.whether_continuous] += self.binner.offsets[:-1][~self.whether_continuous]
+
+    # Binner.transform对离散特征用searchsorted，没见过的取值会落到相邻取值的箱（或越界到下一个特征），
+    # 这里把它们改到unseen_bins给出的箱
+    def _codes(self, x):
+        x = np.atleast_2d(x)
+        codes = self.binner.transform(x)
+        offsets = self.binner.offsets
+        for feat in np.flatnonzero(~self.whether_continuous):
+            _values = self.binner.values[feat]
+            _pos = np.minimum(codes[:, feat] - offsets[feat], len(_values) - 1)
+            codes[_values[_pos] != x[:, feat], feat] = self.unseen_bins[feat]
+        return codes.astype(np.int32) if self.binner.n_bins < 2 ** 31 else codes
+
+    # 在预测值raw处，g和h原地更新为各样本损失的一阶和二阶导数（乘以样本权重）
+    def _gradients(self, raw, y, w, g, h):
+        if self.loss == "squared":
+            np.subtract(raw, y, out=g, casting="unsafe")
+            h[:] = 1
+        else:
+            p = 1 / (1 + np.exp(-raw))
+            np.subtract(p, y, out=g, casting="unsafe")
+            np.multiply(p, 1 - p, out=h, casting="unsafe")
+        if w is not None:
+            g *= w
+            h *= w
+
+    def _loss(self, raw, y, w=None):
+        if self.loss == "squared":
+            res = (raw - y) ** 2
+        else:
+            res = np.logaddexp(0, raw) - y * raw
+        return float(np.average(res, weights=w))
+
+    # eval_set: (x_val, y_val)，为None且n_iter_no_change不为None时从训练集中随机留出validation_fraction作为验证集
+    def fit(self, x, y, sample_weight=None, eval_set=None):
+        _fit_start = time.perf_counter()
+        self.stats = Stats() if self.record_stats else None
+        rng = np.random.RandomState(self.seed)
+        x = np.atleast_2d(x)
+        y = self._encode_y(y, fit=True)
+        w = None if sample_weight is None else np.asarray(sample_weight, dtype=np.float32)
+        if eval_set is None and self.n_iter_no_change is not None and self.validation_fraction:
+            indices = rng.permutation(len(x))
+            _n_valid = max(1, int(len(x) * self.validation_fraction))
+            _valid, _train = indices[:_n_valid], indices[_n_valid:]
+            eval_set = (x[_valid], y[_valid], None if w is None else w[_valid])
+            x, y, w = x[_train], y[_train], None if w is None else w[_train]
+        elif eval_set is not None:
+            eval_set = (np.atleast_2d(eval_set[0]), self._encode_y(eval_set[1]), None)
+        self._fit_binner(x, rng)
+        codes = self._codes(x)
+        valid_codes = None if eval_set is None else self._codes(eval_set[0])
+        if self.loss == "squared":
+            self.init_score = float(np.average(y, weights=w))
+        else:
+            p = min(max(float(np.average(y, weights=w)), 1e-12), 1 - 1e-12)
+            self.init_score = float(np.log(p / (1 - p)))
+        raw = np.full(len(y), self.init_score)
+        valid_raw = None if eval_set is None else np.full(len(eval_set[1]), self.init_score)
+        g, h = np.empty(len(y), dtype=np.float32), np.empty(len(y), dtype=np.float32)
+        self.trees, self.train_loss, self.valid_loss = [], [], []
+        _best, _best_iter = np.inf, 0
+        for i in range(self.n_estimators):
+            self._gradients(raw, y, w, g, h)
+            tree, leaves = self._grow(codes, g, h, self.loss == "squared" and w is None)
+            self.trees.append(tree)
+            # 训练集上各叶节点的样本直接加上叶节点的值
+            for leaf, rows in leaves:
+                raw[rows] += tree.value[leaf]
+            self.train_loss.append(self._loss(raw, y, w))
+            if eval_set is None:
+                continue
+            valid_raw += tree.predict(valid_codes)
+            self.valid_loss.append(self._loss(valid_raw, eval_set[1], eval_set[2]))
+            if self.valid_loss[-1] < _best - self.tol:
+                _best, _best_iter = self.valid_loss[-1], i + 1
+            elif self.n_iter_no_change is not None and i + 1 - _best_iter >= self.n_iter_no_change:
+                break
+        self.best_iteration = _best_iter if eval_set is not None else len(self.trees)
+        del self.trees[self.best_iteration:]
+        if self.stats is not None:
+            self.stats.add_time("fit", time.perf_counter() - _fit_start)
+        return self
+
+    def _encode_y(self, y, fit=False):
+        y = np.asarray(y)
+        if self.loss == "squared":
+            return y.astype(float)
+        if fit:
+            self.labels = np.unique(y)
+            assert len(self.labels) <= 2, "logistic只用于二分类"
+        return (y == self.labels[-1]).astype(float)
+
+    # 一个节点的(梯度和, 二阶导数和, 样本数)直方图；h全为1（平方损失、没有样本权重）时二阶导数和就是样本数
+    # np.bincount的权重总是按float64计算，所以直接重复成float64，省去一次类型转换
+    def _histogram(self, codes, rows, g, h, unit_hessian=False):
+        keys, n_feat, n_bins = codes[rows].ravel(), codes.shape[1], self.binner.n_bins
+        hist = np.empty((n_bins, 3))
+        hist[:, 0] = np.bincount(keys, np.repeat(g[rows].astype(np.float64), n_feat), minlength=n_bins)
+        if unit_hessian:
+            hist[:, 1] = hist[:, 2] = np.bincount(keys, minlength=n_bins)
+        else:
+            hist[:, 1] = np.bincount(keys, np.repeat(h[rows].astype(np.float64), n_feat), minlength=n_bins)
+            hist[:, 2] = np.bincount(keys, minlength=n_bins)
+        if self.stats is not None:
+            self.stats.add("hist_bytes", hist.nbytes)
+        return hist
+
+    # 按增益从大到小划分（与max_leaf_nodes时的Node.fit相同），返回RegressionTree和[(叶节点, 该叶节点的样本下标), ...]
+    def _grow(self, codes, g, h, _unit=False):
+        _cluster, _stats = Cluster(None, None), self.stats
+        _cluster.stats = _stats
+        offsets = self.binner.offsets
+        feature, split, left, right, value, depth = [], [], [], [], [], []
+        _heap, _counter, leaves = [], count(), []
+
+        def _new_node(rows, hist, _depth):
+            k = len(feature)
+            feature.append(-1), split.append(0), left.append(-1), right.append(-1), depth.append(_depth)
+            _total = hist[offsets[0]:offsets[1]].sum(axis=0)
+            value.append(-self.learning_rate * _total[0] / (_total[1] + self.reg_lambda))
+            if self.max_depth is None or _depth < self.max_depth:
+                _start = time.perf_counter()
+                res = _cluster.grad_split(hist, offsets, self.reg_lambda, self.min_child_weight,
+                                          self.min_samples_leaf)
+                if _stats is not None:
+                    _stats.add_time("split_search", time.perf_counter() - _start, _depth)
+                if res is not None and res[0] > 1e-12:
+                    heapq.heappush(_heap, (-res[0], next(_counter), k, rows, hist, res))
+                    return
+            leaves.append((k, rows))
+
+        rows = np.arange(len(codes))
+        _new_node(rows, self._histogram(codes, rows, g, h, _unit), 0)
+        _n_leafs = 1
+        while _heap:
+            _, _, k, rows, hist, (_, feat, _split) = heapq.heappop(_heap)
+            if self.max_leaf_nodes is not None and _n_leafs >= self.max_leaf_nodes:
+                leaves.append((k, rows))
+                continue
+            _start = time.perf_counter()
+            mask = codes[rows, feat] < _split
+            left_rows, right_rows = rows[mask], rows[~mask]
+            # 只为样本较少的子节点统计直方图，另一个由父节点的减去它
+            if len(left_rows) <= len(right_rows):
+                left_hist = self._histogram(codes, left_rows, g, h, _unit)
+                right_hist = hist - left_hist
+            else:
+                right_hist = self._histogram(codes, right_rows, g, h, _unit)
+                left_hist = hist - right_hist
+            if _stats is not None:
+                _stats.add_time("partition", time.perf_counter() - _start, depth[k])
+                _stats.add("splits")
+                _stats.add("nodes", 2)
+            feature[k], split[k] = feat, _split
+            left[k] = len(feature)
+            _new_node(left_rows, left_hist, depth[k] + 1)
+            right[k] = len(feature)
+            _new_node(right_rows, right_hist, depth[k] + 1)
+            _n_leafs += 1
+        feature = np.array(feature, dtype=np.int64)
+        split = np.array(split, dtype=np.int64)
+        threshold = np.full(len(feature), np.nan)
+        for k in np.flatnonzero(feature >= 0):
+            feat = feature[k]
+            if self.whether_continuous[feat]:
+                threshold[k] = self.binner.edges[feat][split[k] - offsets[feat] - 1]
+        tree = RegressionTree(feature, split, threshold, np.array(left, dtype=np.int32),
+                              np.array(right, dtype=np.int32), np.array(value))
+        return tree, leaves
+
+    # n_trees: 只用前n_trees棵树
+    def decision_function(self, x, n_trees=None):
+        codes = self._codes(np.atleast_2d(x))
+        raw = np.full(len(codes), self.init_score)
+        for tree in self.trees[:n_trees]:
+            raw += tree.predict(codes)
+        return raw
+
+    def predict(self, x):
+        raw = self.decision_function(x)
+        if self.loss == "squared":
+            return raw
+        return self.labels[(raw > 0).astype(int)]
+
+    def predict_proba(self, x):
+        assert self.loss == "logistic", "只有logistic可以输出概率"
+        p = 1 / (1 + np.exp(-self.decision_function(x)))
+        return np.column_stack([1 - p, p])
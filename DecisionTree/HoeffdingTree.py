@@ -0,0 +1,205 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# HoeffdingTree：在数据流上增量地生成决策树（Very Fast Decision Tree），每来一批数据调用一次partial_fit
+# 各叶节点只保存一个（箱，类别）直方图作为充分统计量，新样本沿着树走到叶节点，把自己记进该叶节点的直方图
+# 所有叶节点的直方图放在同一个数组里（每个叶节点占一个槽位），一批样本用一次np.add.at更新，不用逐个叶节点处理
+# 叶节点每积累grace_period个样本，就用与流式训练相同的方法（Node._eval_hist_feature）算各特征的最佳增益，
+# 最佳和次佳的增益之差超过Hoeffding界 sqrt(R^2 * ln(1/delta) / (2n)) 时（或界已经小于tie_threshold时）就划分
+# 分箱边界由第一批数据确定之后不再改变，所以每个叶节点的内存是固定的，每个样本的更新代价与已经看过的样本数无关
+from DecisionTree.CvDTree import Base
+from DecisionTree.Cluster import Cluster
+from DecisionTree.FlatTree import FlatTree
+from DecisionTree.Stream import QuantileSketch, Binner
+import numpy as np
+
+
+class HoeffdingTree(Base):
+    """
+    self.delta: Hoeffding界的置信参数，划分错误（选到的不是真正最佳的特征）的概率不超过delta
+    self.grace_period: 叶节点每积累这么多个（加权的）样本才尝试划分一次
+    self.tie_threshold: Hoeffding界小于它时，即使最佳和次佳的特征难分高下也直接划分
+    self.max_bins, self.continuous_rate: 第一批数据中确定分箱边界和特征是否连续的参数，与fit_stream相同
+    self.binner: 由第一批数据确定的分箱方法，之后所有的样本都按它分箱；离散特征中没见过的取值不计入直方图
+    self.labels: 所有类别（排好序），第一次调用partial_fit时由classes或第一批数据确定
+    self._slots: {id(叶节点): 槽位}，self._slot_nodes: 各槽位对应的叶节点（空闲的槽位为None）
+    self._hists: (槽位数, 总箱数 + 1, 类别数)的直方图，最后一个箱记录没见过的离散取值，不参与划分；划分后槽位回收再用
+    self._seen: 各槽位上次尝试划分后新来的（加权）样本数
+    self._totals: 各槽位成为叶节点以来记进直方图的（加权）样本数，即Hoeffding界中的n；
+    叶节点的_counts从父节点继承了类别计数，直方图却是从零开始的，两者不能混用
+    self._nodes, self._leaf_slot: self._flat中各节点对应的Node（广度优先的顺序）和槽位（非叶节点为-1）
+    """
+    def __init__(self, criterion="gini", is_cart=True, delta=1e-7, grace_period=200, tie_threshold=0.05,
+                 max_bins=64, continuous_rate=0.2, **kwargs):
+        Base.__init__(self, criterion=criterion, is_cart=is_cart, **kwargs)
+        self.delta, self.grace_period, self.tie_threshold = delta, grace_period, tie_threshold
+        self.max_bins, self.continuous_rate = max_bins, continuous_rate
+        self.binner, self.labels = None, None
+        self._slots, self._slot_nodes, self._hists, self._seen, self._totals = {}, [], None, None, None
+        self._nodes, self._leaf_slot = [], None
+
+    def __str__(self):
+        return "HoeffdingTree ({})".format(self.root.height)
+
+    __repr__ = __str__
+
+    # 第一批数据：确定类别、各特征是否连续和分箱边界，根节点是一个没有样本的叶节点
+    def _init_stream(self, x, y, classes=None):
+        sketch = QuantileSketch(x.shape[1], len(x), self.max_bins, self.whether_continuous).update(x, y)
+        self.binner = Binner.from_sketch(sketch, self.max_bins, self.continuous_rate, self.whether_continuous)
+        self.labels = np.unique(np.asarray(classes)) if classes is not None else sketch.labels
+        if self.label_dict is None:
+            self.label_dict = {i: c for i, c in enumerate(self.labels)}
+        self.whether_continuous = self.binner.whether_continuous
+        self.feature_sets = [np.array([]) if c else v for c, v in zip(self.whether_continuous, self.binner.values)]
+        self.n_dim = x.shape[1]
+        self.root.feats = [i for i in range(self.n_dim)]
+        self.root.label_dict = self.label_dict
+        self.root.feed_tree(self)
+        self._hists = np.zeros((1, self.binner.n_bins + 1, len(self.labels)))
+        self._seen, self._totals = np.zeros(1), np.zeros(1)
+        self._make_leaf(self.root, np.zeros(len(self.labels)))
+        self._compile()
+
+    def _make_leaf(self, node, counts):
+        node._counts, node._n = counts, int(round(counts.sum()))
+        node.chaos = Cluster.chaos(counts, "gini" if self.criterion == "gini" else "ent", node.base)
+        if counts.sum() > 0:
+            node._handle_terminate()
+        else:  # 还没有样本的叶节点沿用父节点的类别
+            node.category = node.parent.category if node.parent is not None else 0
+        # 用空闲的槽位，没有时把数组扩大一倍
+        if None not in self._slot_nodes:
+            _n = len(self._slot_nodes)
+            if _n == len(self._hists):
+                self._hists = np.concatenate([self._hists, np.zeros_like(self._hists)])
+                self._seen = np.concatenate([self._seen, np.zeros_like(self._seen)])
+                self._totals = np.concatenate([self._totals, np.zeros_like(self._totals)])
+            self._slot_nodes.append(None)
+        slot = self._slot_nodes.index(None)
+        self._slot_nodes[slot], self._slots[id(node)] = node, slot
+        self._hists[slot], self._seen[slot], self._totals[slot] = 0, 0, 0
+
+    # 树的结构改变后重新编译，只在划分时发生
+    def _compile(self):
+        self._nodes, _ = FlatTree.bfs(self.root)
+        self._leaf_slot = np.array([self._slots.get(id(node), -1) for node in self._nodes], dtype=np.intp)
+        self.root.update_aggregates()
+        self._flat = FlatTree(self.root, [self.label_dict[i] for i in range(len(self.label_dict))])
+
+    # 各样本在各特征上的统一箱编号，离散特征中没见过的取值记为最后一个箱（不参与划分）
+    def _codes(self, x):
+        codes = self.binner.transform(x)
+        for feat in np.flatnonzero(~self.whether_continuous):
+            values = self.binner.values[feat]
+            pos = np.minimum(codes[:, feat] - self.binner.offsets[feat], max(len(values) - 1, 0))
+            unseen = (values[pos] != x[:, feat]) if len(values) > 0 else np.ones(len(x), dtype=bool)
+            codes[unseen, feat] = self.binner.n_bins
+        return codes
+
+    # classes: 所有可能的类别，第一批数据中可能没有出现所有类别时要在第一次调用时给出
+    def partial_fit(self, x, y, sample_weight=None, classes=None):
+        x, y = np.atleast_2d(np.asarray(x, dtype=float)), np.asarray(y)
+        if self.binner is None:
+            self._init_stream(x, y, classes)
+        y_code = np.searchsorted(self.labels, y)
+        if np.any(y_code >= len(self.labels)) or np.any(self.labels[np.minimum(y_code, len(self.labels) - 1)] != y):
+            raise ValueError("partial_fit遇到了没有见过的类别，请在第一次调用时用classes给出所有类别")
+        w = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+        n_class, n_bins = len(self.labels), self.binner.n_bins + 1
+        leaf = self._flat.apply(x)
+        slot = self._leaf_slot[leaf]
+        # 停在多叉节点上（没有对应取值的子节点）的样本不能用来生成
+        mask = slot >= 0
+        x, y_code, w, leaf, slot = x[mask], y_code[mask], w[mask], leaf[mask], slot[mask]
+        keys = (slot[:, None] * n_bins + self._codes(x)) * n_class + y_code[:, None]
+        np.add.at(self._hists.reshape(-1), keys.ravel(), np.repeat(w, x.shape[1]))
+        np.add.at(self._seen, slot, w)
+        np.add.at(self._totals, slot, w)
+        # 各叶节点的类别计数和类别只对这批样本到达的叶节点更新
+        touched, first = np.unique(slot, return_index=True)
+        counts = np.zeros((len(touched), n_class))
+        np.add.at(counts, (np.searchsorted(touched, slot), y_code), w)
+        sizes = np.bincount(np.searchsorted(touched, slot), minlength=len(touched))
+        for s, i, _counts, _size in zip(touched, leaf[first], counts, sizes):
+            node = self._slot_nodes[s]
+            node._counts, node._n = node._counts + _counts, node._n + int(_size)
+            node.category = node.get_category()
+            self._flat.category[i] = node.category
+        _changed = False
+        for s in np.flatnonzero(self._seen >= self.grace_period):
+            self._seen[s] = 0
+            _changed |= self._try_split(self._slot_nodes[s], self._hists[s, :-1], self._totals[s])
+        if _changed:
+            self._compile()
+        return self
+
+    # 用叶节点的直方图比较各特征的最佳增益，满足Hoeffding界时划分，返回是否划分了
+    # n: 直方图中的（加权）样本数，增益就是由这些样本算出的
+    def _try_split(self, node, hist, n):
+        node.chaos = Cluster.chaos(node._counts, "gini" if self.criterion == "gini" else "ent", node.base)
+        if self.max_leaf_nodes is not None and len(self._slots) >= self.max_leaf_nodes:
+            return False
+        # 停止准则与一次性生成时相同（stop1会把该节点标为叶节点，这里它本来就是叶节点）
+        if node.stop1(1e-8):
+            return False
+        _cluster = Cluster(None, None, base=node.base)
+        _cluster.stats = self.stats
+        candidates = []
+        feats = node._candidate_feats(None)
+        for feat, u in zip(feats, node._random_u(len(feats))):
+            _slice = slice(self.binner.offsets[feat], self.binner.offsets[feat + 1])
+            _gain, _tar, _chaos_lst, _sizes = node._eval_hist_feature(
+                feat, _cluster, hist[_slice], hist[_slice].sum(axis=1), self.binner, u)
+            if _tar is not None or (not self.whether_continuous[feat] and not self.is_cart and _chaos_lst):
+                candidates.append((_gain, feat, _tar, _chaos_lst, _sizes))
+        if not candidates:
+            return False
+        candidates.sort(key=lambda c: -c[0])
+        best = candidates[0]
+        # 不划分也是一个候选，其增益为0
+        second = max(candidates[1][0], 0) if len(candidates) > 1 else 0
+        if self.criterion == "gini":
+            _range = 1
+        else:
+            _range = np.log(max(len(self.labels), 2)) / np.log(node.base)
+        bound = np.sqrt(_range ** 2 * np.log(1 / self.delta) / (2 * n))
+        if best[0] <= 1e-8 or (best[0] - second <= bound and bound >= self.tie_threshold):
+            return False
+        self._split(node, hist, *best)
+        return True
+
+    def _split(self, node, hist, gain, feat, tar, chaos_lst, sizes):
+        hist = hist.copy()  # 槽位回收后会被子节点重新使用
+        self._slot_nodes[self._slots.pop(id(node))] = None
+        node.category, node.feature_dim, node.tar = None, feat, tar
+        node.is_continuous = continuous = self.whether_continuous[feat]
+        values = None if (continuous or self.is_cart) else list(self.feature_sets[feat])
+        # 多叉时也为（第一批数据中出现过的）每个取值都生成子节点，以后的样本总能走到某个叶节点
+        if values is not None:
+            sizes = [max(size, 1) for size in sizes]
+        children = node._make_children(chaos_lst, sizes, values)
+        _table = hist[self.binner.offsets[feat]:self.binner.offsets[feat + 1]]
+        if continuous:
+            t = int(np.searchsorted(self.binner.edges[feat], tar)) + 1
+            counts = [_table[:t].sum(axis=0), _table[t:].sum(axis=0)]
+        elif self.is_cart:
+            left = np.isin(self.binner.values[feat], list(tar))
+            counts = [_table[left].sum(axis=0), _table[~left].sum(axis=0)]
+        else:
+            counts = list(_table)
+        for child, _counts in zip(children, counts):
+            if child is not None:
+                self._make_leaf(child, _counts)
+        if self.stats is not None:
+            self.stats.add("splits")
+            self.stats.add("nodes", sum(child is not None for child in children))
+
+    # 一次性训练：把数据按chunk_size分批依次调用partial_fit
+    def fit(self, x, y, sample_weight=None, chunk_size=1000, classes=None):
+        x, y = np.atleast_2d(x), np.asarray(y)
+        for start in range(0, len(x), chunk_size):
+            stop = start + chunk_size
+            self.partial_fit(x[start:stop], y[start:stop],
+                             None if sample_weight is None else sample_weight[start:stop],
+                             classes=np.unique(y) if classes is None else classes)
+        return self
@@ -0,0 +1,118 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# RandomForest用自助采样（bootstrap）得到的样本训练多棵随机特征的决策树（Base.fit(rf=True)），预测时投票
+# 各棵树在进程池中同时训练，训练数据放在共享内存里，子进程直接读取，不用把整个矩阵pickle给每个进程
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from DecisionTree.CvDTree import CartTree
+import numpy as np
+import os
+
+# 子进程中的训练数据，{名字: ndarray}；共享内存的句柄另外保存，保证进程结束前不被回收
+_shared, _blocks = {}, []
+
+
+# 进程池的initializer：按(共享内存名, 形状, 类型)在子进程中挂载训练数据
+# objects是不能放进共享内存的数组（例如字符串特征），随initializer传给各进程
+def _attach(specs, objects):
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _blocks.append(shm)
+        _shared[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _shared.update(objects)
+
+
+# 训练一棵树：按seed做自助采样并固定随机特征的选择（树自己的RandomState，不改变全局的np.random），
+# 返回编译好的FlatTree（只有几个数组，传回主进程很便宜）
+def _fit_tree(tree_cls, tree_kwargs, fit_kwargs, seed, x=None, y=None):
+    if x is None:
+        x, y = _shared["x"], _shared["y"]
+    rng = np.random.RandomState(seed)
+    indices = rng.randint(len(y), size=len(y))
+    tree = tree_cls(random_state=rng, **tree_kwargs)
+    tree.fit(x[indices], y[indices], train_only=True, rf=True, **fit_kwargs)
+    return tree.compile()
+
+
+class RandomForest:
+    """
+    self.tree_cls, self.tree_kwargs: 组成森林的决策树类型（CartTree, ID3Tree, C45Tree）及其参数
+    self.n_estimators: 树的棵数
+    self.n_jobs: 同时训练的进程数，None或1时在当前进程中依次训练，-1表示使用所有CPU
+    self.trees: 训练好的各棵树编译成的FlatTree，类别是self.labels中的位置
+    self.labels: 训练集中出现过的所有类别（排好序）
+    self.whether_continuous: 各特征是否连续，在整个训练集上判断一次，所有树共用
+    """
+    def __init__(self, tree_cls=CartTree, n_estimators=10, n_jobs=None, **tree_kwargs):
+        self.tree_cls, self.tree_kwargs = tree_cls, tree_kwargs
+        self.n_estimators, self.n_jobs = n_estimators, n_jobs
+        self.trees, self.labels = [], None
+        self.whether_continuous = tree_kwargs.pop("whether_continuous", None)
+
+    def __str__(self):
+        return "RandomForest ({})".format(len(self.trees))
+
+    __repr__ = __str__
+
+    # feature_bound和max_bins会传给每棵树的Base.fit
+    def fit(self, x, y, feature_bound="log", max_bins=None, continuous_rate=0.2, seed=None):
+        x = np.atleast_2d(x)
+        self.labels, y = np.unique(y, return_inverse=True)
+        y = y.astype(np.int32)
+        # 与Base.feed_data的判断方法相同，但在整个训练集上判断，避免各棵树因采样不同而得出不同的结论
+        if self.whether_continuous is None:
+            self.whether_continuous = np.array([len(np.unique(col)) > continuous_rate * len(x) for col in x.T])
+        tree_kwargs = dict(self.tree_kwargs, whether_continuous=self.whether_continuous)
+        fit_kwargs = {"feature_bound": feature_bound, "max_bins": max_bins}
+        seeds = np.random.RandomState(seed).randint(2 ** 31 - 1, size=self.n_estimators)
+        n_jobs = os.cpu_count() if self.n_jobs == -1 else self.n_jobs
+        if n_jobs is None or n_jobs <= 1:
+            self.trees = [_fit_tree(self.tree_cls, tree_kwargs, fit_kwargs, s, x, y) for s in seeds]
+            return self
+        blocks, specs, objects = [], {}, {}
+        try:
+            for key, arr in (("x", x), ("y", y)):
+                # object类型的数组（例如字符串特征）不能放进共享内存
+                if arr.dtype.kind not in "biuf":
+                    objects[key] = arr
+                    continue
+                arr = np.ascontiguousarray(arr)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+                blocks.append(shm)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                specs[key] = (shm.name, arr.shape, arr.dtype)
+            with ProcessPoolExecutor(n_jobs, initializer=_attach, initargs=(specs, objects)) as pool:
+                self.trees = list(pool.map(
+                    _fit_tree, *zip(*[(self.tree_cls, tree_kwargs, fit_kwargs, s) for s in seeds])))
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+        return self
+
+    # 各棵树的类别编码组成(n_estimators, 样本数)的矩阵，一次bincount统计所有样本的票数
+    # x与fit时一样原样交给各棵树（各树的encoder负责编码离散特征），所以可以含字符串等类型的特征
+    def votes(self, x):
+        x = np.atleast_2d(x)
+        n, n_class = len(x), len(self.labels)
+        pred = np.array([tree.predict(x) for tree in self.trees], dtype=np.int64)
+        pred += np.arange(n) * n_class
+        return np.bincount(pred.ravel(), minlength=n * n_class).reshape(n, n_class)
+
+    def predict(self, x):
+        return self.labels[np.argmax(self.votes(x), axis=1)]
+
+    # 各棵树的概率的平均；自助采样可能漏掉某些类别，所以按各棵树的类别（self.labels中的位置）放到对应的列上
+    def predict_proba(self, x):
+        x = np.atleast_2d(x)
+        res = np.zeros((len(x), len(self.labels)), dtype=np.float32)
+        for tree in self.trees:
+            res[:, tree.labels] += tree.predict_proba(x)
+        return res / len(self.trees)
+
+    def estimate(self, x, y, get_raw_result=False):
+        y = np.array(y)
+        if not get_raw_result:
+            print("Acc: {:8.6} %".format(100 * np.sum(self.predict(x) == y) / len(y)))
+        else:
+            return np.average(self.predict(x) == y)
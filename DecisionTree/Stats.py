@@ -0,0 +1,59 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# Stats记录一次训练中的计数和计时，Base(stats=True)时在fit/fit_stream中创建，训练完通过tree.stats查看
+# 各处的钩子只在tree.stats不为None时才记录，不开启时没有额外开销
+from contextlib import contextmanager
+from threading import Lock
+import time
+
+
+class Stats:
+    """
+    self.counters: 计数，{名字: 数值}
+        nodes: 生成的子节点数；splits: 划分的节点数；thresholds: 打分的候选划分数（连续特征的候选分割点、
+        CART离散特征的候选子集、多叉划分各算一个）；bytes_copied: 划分子节点时在样本下标矩阵中移动的字节数；
+        hist_bytes: 为子节点统计（或相减得到）的直方图的字节数；prune_iterations: 剪枝时从堆中取出的节点数；
+        pruned: 剪掉的节点数
+    self.timings: 计时（秒），{名字: 秒数}
+        fit: 整个训练；split_search: 寻找划分；partition: 划分样本下标、统计子节点直方图；prune: 剪枝
+    self.levels: 各深度上寻找划分和划分子节点所用的秒数，第i个元素是深度i
+    """
+    def __init__(self):
+        self.counters, self.timings, self.levels = {}, {}, []
+        self._lock = Lock()
+
+    def __str__(self):
+        return "Stats ({} nodes, {:.3f}s)".format(self.counters.get("nodes", 0), self.timings.get("fit", 0))
+
+    __repr__ = __str__
+
+    # 锁不能pickle，序列化时去掉，读回时重新创建
+    def __getstate__(self):
+        return {key: value for key, value in self.__dict__.items() if key != "_lock"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    # 可能在多个线程中同时调用（n_jobs > 1时各特征在线程池中计算），所以要加锁
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def add_time(self, name, seconds, depth=None):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0) + seconds
+            if depth is not None:
+                self.levels += [0.0] * (depth + 1 - len(self.levels))
+                self.levels[depth] += seconds
+
+    @contextmanager
+    def timer(self, name, depth=None):
+        _start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - _start, depth)
+
+    def as_dict(self):
+        return {"counters": dict(self.counters), "timings": dict(self.timings), "levels": list(self.levels)}
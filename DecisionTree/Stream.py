@@ -0,0 +1,188 @@
+# -*- coding:utf-8 -*-
+# Decision Tree Algorithm
+# 流式（out-of-core）训练用到的工具：数据不必一次读入内存，而是一块一块地反复扫描
+# ChunkSource把内存映射的数组（np.memmap, np.load(mmap_mode="r")）或返回迭代器的函数包装成可以反复遍历的数据块
+# QuantileSketch在一遍扫描中用有限的内存记录类别、各特征的取值（不多于cap个时）和蓄水池抽样，用来确定分箱边界
+# Binner把一块原始数据转换成所有特征统一编号的箱编码，HistogramSource在一遍扫描中统计各待划分节点的直方图
+# 分布式训练（Distributed.ShardPool）时各worker在自己的分片上用同样的QuantileSketch和HistogramSource，结果在协调者处合并
+import numpy as np
+
+
+# 连续特征的分箱边界：取值个数不超过max_bins时以相邻取值的中点为边界（与逐点扫描等价），否则以分位数为边界
+# values是该特征所有的取值（排好序，未知时为None），data是用来估计分位数的样本
+def bin_edges(data, max_bins=255, values=None):
+    if values is None or len(values) > max_bins:
+        values = np.unique(data)
+    if len(values) <= max_bins:
+        return (values[:-1] + values[1:]) * 0.5
+    return np.unique(np.quantile(data, np.linspace(0, 1, max_bins + 1)[1:-1]))
+
+
+class ChunkSource:
+    """
+    self.x, self.y, self.sample_weight: 特征矩阵（可以是np.memmap）、类别向量和样本权重，按行切成块依次读入内存
+    x也可以是一个函数，每次调用返回一个新的迭代器，依次给出(x, y)或(x, y, sample_weight)，每次给出的数据必须相同
+    self.chunk_size: 每块的行数
+    """
+    def __init__(self, x, y=None, sample_weight=None, chunk_size=65536):
+        self.x, self.y, self.sample_weight = x, y, sample_weight
+        self.chunk_size = chunk_size
+
+    def __str__(self):
+        return "ChunkSource ({})".format(self.chunk_size)
+
+    __repr__ = __str__
+
+    def __iter__(self):
+        if callable(self.x):
+            for chunk in self.x():
+                yield np.atleast_2d(chunk[0]), np.asarray(chunk[1]), np.asarray(chunk[2]) if len(chunk) > 2 else None
+            return
+        for start in range(0, len(self.x), self.chunk_size):
+            stop = start + self.chunk_size
+            w = None if self.sample_weight is None else np.asarray(self.sample_weight[start:stop])
+            yield np.asarray(self.x[start:stop]), np.asarray(self.y[start:stop]), w
+
+
+class QuantileSketch:
+    """
+    self.n: 已经看过的样本数
+    self.labels: 出现过的所有类别（排好序）
+    self.values: 各特征出现过的所有取值（排好序），个数超过cap后不再记录，置为None
+    self.keep: 各特征是否一定要记录所有取值（事先指定为离散的特征）
+    self.sample, self.size: 蓄水池抽样得到的至多size行样本，用来估计连续特征的分位数
+    """
+    def __init__(self, n_dim, size=100000, cap=255, whether_continuous=None, seed=None):
+        self.n, self.labels = 0, np.array([])
+        self.values = [np.array([]) for _ in range(n_dim)]
+        self.keep = np.zeros(n_dim, dtype=bool) if whether_continuous is None else ~np.asarray(whether_continuous)
+        self.sample, self.size, self.cap = np.empty((size, n_dim)), size, cap
+        self._rng = np.random.RandomState(seed)
+
+    def __str__(self):
+        return "QuantileSketch ({})".format(self.n)
+
+    __repr__ = __str__
+
+    def update(self, x, y):
+        self.labels = np.union1d(self.labels, np.unique(y)) if self.n > 0 else np.unique(y)
+        for feat, values in enumerate(self.values):
+            if values is not None:
+                values = np.union1d(values, np.unique(x[:, feat]))
+                self.values[feat] = values if self.keep[feat] or len(values) <= self.cap else None
+        # 蓄水池抽样：第i个样本（从0开始）以size/(i+1)的概率替换蓄水池中随机的一行，同一位置被多次替换时后面的样本生效
+        fill = min(max(self.size - self.n, 0), len(x))
+        self.sample[self.n:self.n + fill] = x[:fill]
+        pos = self._rng.randint(0, self.n + np.arange(fill, len(x)) + 1)
+        mask = pos < self.size
+        self.sample[pos[mask]] = x[fill:][mask]
+        self.n += len(x)
+        return self
+
+    # 合并在另一个数据分片上得到的sketch（分布式训练时各worker各自扫描自己的分片）
+    # 两个蓄水池中的每一行分别代表n/蓄水池行数个样本，合并后的蓄水池从两边按各自的样本数所占比例随机抽取
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if len(other.values) != len(self.values):
+            raise ValueError("两个sketch的特征数不同: {} != {}".format(len(self.values), len(other.values)))
+        self.labels = np.union1d(self.labels, other.labels) if self.n > 0 else other.labels
+        for feat, (values, _other) in enumerate(zip(self.values, other.values)):
+            if values is not None:
+                values = None if _other is None else np.union1d(values, _other)
+                self.values[feat] = values if values is not None and (
+                    self.keep[feat] or len(values) <= self.cap) else None
+        a, b = self.sample[:min(self.n, self.size)], other.sample[:min(other.n, other.size)]
+        if len(a) + len(b) <= self.size:
+            sample = np.concatenate([a, b])
+        else:
+            k = self._rng.binomial(self.size, self.n / (self.n + other.n))
+            k = min(max(k, self.size - len(b)), len(a))
+            sample = np.concatenate([a[self._rng.choice(len(a), k, replace=False)],
+                                     b[self._rng.choice(len(b), self.size - k, replace=False)]])
+        self.sample = np.empty_like(self.sample)
+        self.sample[:len(sample)] = sample
+        self.n += other.n
+        return self
+
+    # 各特征是否连续：取值个数超过cap（没有记录所有取值）或超过continuous_rate * 样本数时判定为连续
+    def whether_continuous(self, continuous_rate=0.2):
+        return np.array([not self.keep[feat] and (values is None or len(values) > continuous_rate * self.n)
+                         for feat, values in enumerate(self.values)])
+
+    def bin_edges(self, feat, max_bins=255):
+        return bin_edges(self.sample[:min(self.n, self.size), feat], max_bins, self.values[feat])
+
+
+class Binner:
+    """
+    self.whether_continuous: 各特征是否连续
+    self.edges: 连续特征的分箱边界（编码 < t 等价于 原始取值 < edges[t - 1]），离散特征为None
+    self.values: 离散特征排好序的所有取值（编码就是取值在其中的位置），连续特征为None
+    self.offsets: 各特征的箱在统一编号中的起始位置，第i个特征的箱是offsets[i]到offsets[i + 1]
+    """
+    def __init__(self, whether_continuous, edges, values):
+        self.whether_continuous = np.asarray(whether_continuous)
+        self.edges, self.values = edges, values
+        n_bins = [len(e) + 1 if c else len(v) for c, e, v in zip(self.whether_continuous, edges, values)]
+        self.offsets = np.concatenate([[0], np.cumsum(n_bins)]).astype(np.int64)
+
+    def __str__(self):
+        return "Binner ({})".format(self.n_bins)
+
+    __repr__ = __str__
+
+    @property
+    def n_bins(self):
+        return int(self.offsets[-1])
+
+    @staticmethod
+    def from_sketch(sketch, max_bins=255, continuous_rate=0.2, whether_continuous=None):
+        if whether_continuous is None:
+            whether_continuous = sketch.whether_continuous(continuous_rate)
+        edges = [sketch.bin_edges(feat, max_bins) if c else None for feat, c in enumerate(whether_continuous)]
+        values = [None if c else sketch.values[feat] for feat, c in enumerate(whether_continuous)]
+        return Binner(whether_continuous, edges, values)
+
+    # 返回各样本在各特征上的统一箱编号（已加上offsets）
+    def transform(self, x):
+        codes = np.empty(x.shape, dtype=np.int64)
+        for feat, continuous in enumerate(self.whether_continuous):
+            if continuous:
+                codes[:, feat] = np.searchsorted(self.edges[feat], x[:, feat], side="right")
+            else:
+                codes[:, feat] = np.searchsorted(self.values[feat], x[:, feat])
+        return codes + self.offsets[:-1]
+
+
+class HistogramSource:
+    """
+    self.source, self.binner: 数据块的来源和分箱方法
+    self.labels: 所有类别（排好序），类别编码就是在其中的位置
+    调用时给定当前（部分生成的）树编译成的FlatTree和各节点对应的待划分节点编号（其余为-1），
+    扫描一遍数据，返回各待划分节点的(加权)直方图(节点数, 总箱数, 类别数)和不加权的样本数（没有样本权重时为None）
+    """
+    def __init__(self, source, binner, labels):
+        self.source, self.binner, self.labels = source, binner, labels
+
+    def __str__(self):
+        return "HistogramSource ({})".format(self.source)
+
+    __repr__ = __str__
+
+    def __call__(self, flat, slots):
+        n_slots, n_bins, n_class = int(slots.max()) + 1, self.binner.n_bins, len(self.labels)
+        hist, sizes = np.zeros(n_slots * n_bins * n_class), None
+        for x, y, w in self.source:
+            node = slots[flat.apply(x)]
+            mask = node >= 0
+            x, y, node = x[mask], np.searchsorted(self.labels, y[mask]), node[mask]
+            keys = ((node[:, None] * n_bins + self.binner.transform(x)) * n_class + y[:, None]).ravel()
+            _len = len(hist)
+            if w is None:
+                hist += np.bincount(keys, minlength=_len)
+                continue
+            hist += np.bincount(keys, np.repeat(w[mask], x.shape[1]), minlength=_len)
+            sizes = np.bincount(keys, minlength=_len) + (0 if sizes is None else sizes)
+        shape = (n_slots, n_bins, n_class)
+        return hist.reshape(shape), None if sizes is None else sizes.reshape(shape)
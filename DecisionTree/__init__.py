@@ -0,0 +1,9 @@
+from DecisionTree.RandomForest import RandomForest
+from DecisionTree.Stream import ChunkSource
+from DecisionTree.Encoder import Encoder
+from DecisionTree.Stats import Stats
+from DecisionTree.HoeffdingTree import HoeffdingTree
+from DecisionTree.Distributed import ShardPool
+from DecisionTree.AdaBoost import AdaBoost
+from DecisionTree.GBDT import GBDT
+from DecisionTree.CrossValidation import cross_validate, k_fold
@@ -0,0 +1,6 @@
+# -*- coding:utf-8 -*-
+# 让测试在仓库根目录之外运行时也能import DecisionTree
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
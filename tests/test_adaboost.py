@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.AdaBoost import AdaBoost
+from DecisionTree.CvDTree import CartTree
+import numpy as np
+
+
+# 第0个特征：x < 0的一侧类别0的样本多、类别1的权重大，另一侧反过来；第1个特征是噪声
+def _weighted_data():
+    rng = np.random.RandomState(0)
+    x = np.column_stack([np.concatenate([rng.uniform(-1, -0.1, 1000), rng.uniform(0.1, 1, 1000)]), rng.rand(2000)])
+    y = np.concatenate([rng.rand(1000) < 0.3, rng.rand(1000) < 0.7]).astype(int)
+    w = np.where(x[:, 0] < 0, np.where(y == 1, 4.0, 1.0), np.where(y == 0, 4.0, 1.0))
+    return x, y, w / w.sum()
+
+
+def _majority(y, w=None):
+    return int(np.argmax(np.bincount(y, weights=w, minlength=2)))
+
+
+# 各叶节点预测的是它的样本中权重之和最大的类别，而不是样本数最多的类别
+def _check_leaves(pred, y, w):
+    for category in np.unique(pred):
+        rows = pred == category
+        assert _majority(y[rows], w[rows]) == category
+        assert _majority(y[rows]) != category
+
+
+def test_weighted_stump_predicts_weighted_majority():
+    x, y, w = _weighted_data()
+    tree = CartTree(max_depth=1)
+    tree.fit(x, y, sample_weight=w, train_only=True, feature_bound=None)
+    pred = tree.predict(x)
+    assert len(np.unique(pred)) == 2
+    _check_leaves(pred, y, w)
+
+
+def test_weighted_stump_stream():
+    x, y, w = _weighted_data()
+    tree = CartTree(max_depth=1)
+    tree.fit_stream((x, y, w), feature_bound=None, max_bins=16)
+    pred = tree.predict(x)
+    assert len(np.unique(pred)) == 2
+    _check_leaves(pred, y, w)
+
+
+def test_refit_train_pred_uses_weights():
+    x, y, w = _weighted_data()
+    tree = CartTree(max_depth=1).prepare(x, y)
+    try:
+        tree.refit(w, feature_bound=None)
+        _check_leaves(tree._train_pred, y, w)
+        assert np.array_equal(tree._train_pred, tree.predict(x))
+    finally:
+        tree.release()
+
+
+def test_boosting_keeps_improving_on_circle():
+    rng = np.random.RandomState(0)
+    x = rng.randn(2000, 2)
+    y = (np.sum(x ** 2, axis=1) < 1.4).astype(int)
+    model = AdaBoost(n_estimators=100).fit(x, y)
+    assert len(model.trees) == 100
+    assert np.mean(model.predict(x) == y) > 0.95
@@ -0,0 +1,12 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import run_one
+import numpy as np
+
+
+def test_run_one_uses_tree_random_state():
+    _state = np.random.get_state()
+    a = run_one("CartTree", "mixed", 800, 6, feature_bound="log", memory=False, seed=3)
+    b = run_one("CartTree", "mixed", 800, 6, feature_bound="log", memory=False, seed=3)
+    # 随机特征和划分验证集都用树自己的random_state：结果可复现，也不改变全局的随机状态
+    assert (a["n_nodes"], a["height"], a["train_acc"]) == (b["n_nodes"], b["height"], b["train_acc"])
+    assert np.array_equal(_state[1], np.random.get_state()[1]) and _state[2] == np.random.get_state()[2]
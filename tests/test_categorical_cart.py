@@ -0,0 +1,43 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.CvDTree import CartTree
+import numpy as np
+
+
+# 一个有60个取值的离散特征，类别由取值属于哪个（随机的）集合决定，另有一个噪声特征
+def _high_cardinality(n=3000, seed=0):
+    rng = np.random.RandomState(seed)
+    values = np.array(["c%02d" % i for i in range(60)])
+    positive = set(rng.choice(values, 25, replace=False).tolist())
+    x = np.column_stack([rng.choice(values, n), rng.rand(n)]).astype(object)
+    x[:, 1] = x[:, 1].astype(float)
+    y = np.array([v in positive for v in x[:, 0]], dtype=int)
+    return x, y, positive
+
+
+def test_high_cardinality_subset_split():
+    x, y, positive = _high_cardinality()
+    tree = CartTree(whether_continuous=[False, True], max_depth=1)
+    tree.fit(x, y, train_only=True, feature_bound=None)
+    # 一次二分就把两个集合完全分开，分到左边的是其中一个集合
+    assert tree.root.feature_dim == 0
+    assert isinstance(tree.root.tar, frozenset)
+    assert tree.root.tar in (frozenset(positive), frozenset(set(np.unique(x[:, 0])) - positive))
+    assert np.array_equal(tree.predict(x), y)
+    assert [tree.predict_one(row) for row in x[:100]] == y[:100].tolist()
+    # 没见过的取值走右边
+    right = tree.root.right_child.category
+    assert tree.predict(np.array([["unseen", 0.5]], dtype=object))[0] == tree.label_dict[right]
+
+
+# fit_stream只接受数值，离散特征用整数编码
+def test_high_cardinality_stream_matches_fit():
+    x, y, positive = _high_cardinality(seed=1)
+    x[:, 0] = [int(v[1:]) for v in x[:, 0]]
+    x = x.astype(float)
+    a = CartTree(whether_continuous=[False, True], max_depth=1)
+    a.fit(x, y, train_only=True, feature_bound=None)
+    b = CartTree(whether_continuous=[False, True], max_depth=1)
+    b.fit_stream((x, y), feature_bound=None)
+    assert b.root.feature_dim == a.root.feature_dim == 0
+    assert b.root.tar == a.root.tar
+    assert np.array_equal(b.predict(x), y)
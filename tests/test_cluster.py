@@ -0,0 +1,135 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Cluster import Cluster
+import numpy as np
+import pytest
+
+
+def _gain(y, w, left, criterion, n_class):
+    method = "gini" if criterion == "gini" else "ent"
+    total = np.bincount(y, w, minlength=n_class)
+    parts = [np.bincount(y[mask], None if w is None else w[mask], minlength=n_class) for mask in (left, ~left)]
+    lens = np.array([part.sum() for part in parts])
+    gain = Cluster.chaos(total, method) - np.sum(lens / lens.sum() * Cluster.chaos(np.array(parts), method))
+    if criterion == "ratio":
+        gain /= Cluster.chaos(lens, "ent")
+    return gain
+
+
+# 逐个尝试相邻取值的中点
+def _brute_threshold(x, y, w, criterion, min_leaf, n_class):
+    values = np.unique(x)
+    res = {}
+    for t in (values[:-1] + values[1:]) * 0.5:
+        left = x < t
+        if min(left.sum(), (~left).sum()) >= min_leaf:
+            res[t] = _gain(y, w, left, criterion, n_class)
+    return res
+
+
+@pytest.mark.parametrize("criterion", ["gini", "ent", "ratio"])
+@pytest.mark.parametrize("weighted", [False, True])
+@pytest.mark.parametrize("min_leaf", [1, 7])
+def test_best_bin_split_matches_brute_force(criterion, weighted, min_leaf):
+    rng = np.random.RandomState(0)
+    for _ in range(30):
+        n, n_class = rng.randint(5, 60), rng.randint(2, 4)
+        # 取值很少，有大量相同的取值
+        x = rng.randint(0, rng.randint(2, 12), size=n).astype(float)
+        y = rng.randint(n_class, size=n)
+        w = rng.rand(n) if weighted else None
+        n_class = int(y.max()) + 1
+        cluster = Cluster(x[:, None], y, w)
+        gain, tar, chaos_lst = cluster.best_bin_split(0, criterion, min_leaf=min_leaf)
+        brute = _brute_threshold(x, y, w, criterion, min_leaf, n_class)
+        if not brute:
+            assert tar is None
+            continue
+        assert gain == pytest.approx(max(brute.values()), abs=1e-12)
+        assert brute[tar] == pytest.approx(max(brute.values()), abs=1e-12)
+        left = x < tar
+        assert min(left.sum(), (~left).sum()) >= min_leaf
+
+
+def test_best_bin_split_presorted_order():
+    rng = np.random.RandomState(1)
+    x, y = rng.rand(200, 3), rng.randint(3, size=200)
+    indices = np.sort(rng.choice(200, 120, replace=False))
+    cluster = Cluster(x, y, indices=indices)
+    order = np.argsort(x[:, 1], kind="mergesort")
+    order = order[np.isin(order, indices)]
+    assert cluster.best_bin_split(1, "gini", order=order)[:2] == Cluster(x[indices], y[indices]).best_bin_split(
+        1, "gini")[:2]
+
+
+def test_best_bin_split_tied_gains_take_first():
+    # 两个对称的分割增益相同，取第一个
+    x = np.array([0., 1., 2., 3.])
+    y = np.array([0, 1, 1, 0])
+    gain, tar, _ = Cluster(x[:, None], y).best_bin_split(0, "gini")
+    assert tar == 0.5
+
+
+def _table_gain(table, left, criterion):
+    return Cluster(None, None).table_gain(np.array([table[left].sum(axis=0), table[~left].sum(axis=0)]),
+                                          criterion)[0]
+
+
+# 两类时按正类比例排序后的一趟扫描就是所有二分中最好的（Breiman）
+@pytest.mark.parametrize("criterion", ["gini", "ent"])
+def test_best_subset_split_binary_is_optimal(criterion):
+    rng = np.random.RandomState(2)
+    cluster = Cluster(None, None)
+    for _ in range(300):
+        k = rng.randint(2, 9)
+        table = rng.randint(0, 15, size=(k, 2)).astype(float)
+        table = table[table.sum(axis=1) > 0]
+        if len(table) < 2 or np.any(table.sum(axis=0) == 0):
+            continue
+        gain, left, _ = cluster.best_subset_split(table, criterion)
+        brute = 0
+        # 第0个取值固定在右边，每个二分只数一次
+        for mask in range(1, 2 ** (len(table) - 1)):
+            subset = np.array([(mask >> i) & 1 for i in range(len(table))], dtype=bool)
+            brute = max(brute, _table_gain(table, subset, criterion))
+        assert gain == pytest.approx(brute, abs=1e-12)
+        subset = np.zeros(len(table), dtype=bool)
+        subset[left] = True
+        assert _table_gain(table, subset, criterion) == pytest.approx(gain, abs=1e-12)
+
+
+# 多类时依次按各类别的比例排序只是启发式，但不会比原来逐个取值的一对其余差
+@pytest.mark.parametrize("criterion", ["gini", "ent", "ratio"])
+def test_best_subset_split_multiclass_not_worse_than_one_vs_rest(criterion):
+    rng = np.random.RandomState(3)
+    cluster = Cluster(None, None)
+    for _ in range(500):
+        table = rng.randint(0, 20, size=(rng.randint(3, 10), rng.randint(3, 6))).astype(float)
+        table = table[table.sum(axis=1) > 0]
+        if len(table) < 2:
+            continue
+        gain = cluster.best_subset_split(table, criterion)[0]
+        one_vs_rest = max(_table_gain(table, np.arange(len(table)) == i, criterion) for i in range(len(table)))
+        assert gain >= one_vs_rest - 1e-12
+
+
+@pytest.mark.parametrize("k", [1, 4])
+def test_random_bin_split_thresholds_in_node_range(k):
+    rng = np.random.RandomState(4)
+    x, y = rng.randn(300, 5) * [1, 10, 0.1, 5, 1], rng.randint(3, size=300)
+    for _ in range(20):
+        indices = np.sort(rng.choice(300, rng.randint(10, 120), replace=False))
+        u = rng.rand(5, k)
+        res = Cluster(x, y, indices=indices).random_bin_split(range(5), u, "gini")
+        sub = x[indices]
+        for feat, (gain, tar, _) in enumerate(res):
+            if tar is None:
+                continue
+            # 阈值由该节点内的最小值、最大值和u确定，并且两边都有样本
+            assert sub[:, feat].min() < tar <= sub[:, feat].max()
+            assert tar in sub[:, feat].min() + u[feat] * np.ptp(sub[:, feat])
+            assert gain == pytest.approx(_gain(y[indices], None, sub[:, feat] < tar, "gini", 3), abs=1e-12)
+            # 返回的是k个阈值中增益最大的一个
+            for t in sub[:, feat].min() + u[feat] * np.ptp(sub[:, feat]):
+                left = sub[:, feat] < t
+                if 0 < left.sum() < len(left):
+                    assert _gain(y[indices], None, left, "gini", 3) <= gain + 1e-12
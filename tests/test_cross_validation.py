@@ -0,0 +1,56 @@
+# -*- coding:utf-8 -*-
+from Bayes.Original.GaussianNB import GaussianNB
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CrossValidation import cross_validate, k_fold
+from DecisionTree.CvDTree import CartTree, ID3Tree
+import numpy as np
+import pytest
+
+
+def test_k_fold_partitions_and_stratifies():
+    y = np.repeat([0, 1, 2], [50, 30, 20])
+    folds = k_fold(y, 5, seed=0)
+    assert np.array_equal(np.sort(np.concatenate([test for _, test in folds])), np.arange(len(y)))
+    for train, test in folds:
+        assert len(np.intersect1d(train, test)) == 0
+        assert np.array_equal(np.bincount(y[test]), [10, 6, 4])
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree])
+def test_matches_per_fold_fit(tree_cls):
+    x, y, whether_continuous = make_data("mixed", 600, 6, n_class=3, seed=0)
+    fit_kwargs = {"feature_bound": None, "alpha": 1.0}
+    res = cross_validate(tree_cls(whether_continuous=whether_continuous), x, y, k=3, fit_kwargs=fit_kwargs, seed=0)
+    for (train, test), score in zip(res["folds"], res["score"]):
+        tree = tree_cls(whether_continuous=whether_continuous)
+        tree.fit(x[train], y[train], alpha=1.0, train_only=True, feature_bound=None)
+        assert np.mean(tree.predict(x[test]) == y[test]) == pytest.approx(score)
+
+
+def test_parallel_matches_serial_and_keeps_global_rng():
+    x, y, whether_continuous = make_data("mixed", 600, 6, n_class=3, seed=1)
+    np.random.seed(42)
+    expected = np.random.rand()
+    np.random.seed(42)
+    tree = CartTree(whether_continuous=whether_continuous)
+    serial = cross_validate(tree, x, y, k=3, seed=0)
+    assert np.random.rand() == expected
+    assert tree.random_state is None
+    parallel = cross_validate(CartTree(whether_continuous=whether_continuous), x, y, k=3, n_jobs=2, seed=0)
+    assert np.array_equal(serial["score"], parallel["score"])
+
+
+# 非决策树的模型：每折复制一份GaussianNB训练，fit时临时设定的种子不影响全局的np.random
+@pytest.mark.parametrize("n_jobs", [None, 2])
+def test_naive_bayes_matches_per_fold_fit(n_jobs):
+    x, y, _ = make_data("continuous", 300, 4, n_class=3, seed=2)
+    np.random.seed(7)
+    expected = np.random.rand()
+    np.random.seed(7)
+    res = cross_validate(GaussianNB(), x, y, k=3, n_jobs=n_jobs, seed=0)
+    assert np.random.rand() == expected
+    for (train, test), score in zip(res["folds"], res["score"]):
+        model = GaussianNB()
+        model.fit(x[train], y[train])
+        assert np.mean(model.predict(x[test]) == y[test]) == pytest.approx(score)
+    assert res["score"].mean() > 0.5
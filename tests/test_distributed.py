@@ -0,0 +1,79 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import CartTree
+from DecisionTree.Distributed import ShardPool, connect
+from multiprocessing import Process
+import logging
+import socket
+import threading
+import time
+import numpy as np
+import pytest
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_distributed_matches_stream():
+    x, y, whether_continuous = make_data("mixed", 3000, 6, n_class=3, seed=0)
+    stream = CartTree(whether_continuous=whether_continuous)
+    stream.fit_stream((x, y, None, 500), feature_bound=None, max_bins=32, seed=0)
+    shards = [(x[i::3], y[i::3], None, 500) for i in range(3)]
+    distributed = CartTree(whether_continuous=whether_continuous)
+    distributed.fit_distributed(shards, feature_bound=None, max_bins=32, seed=0)
+    assert len(distributed.nodes) == len(stream.nodes)
+    assert np.array_equal(distributed.predict(x), stream.predict(x))
+
+
+def test_listen_requires_authkey_off_loopback():
+    with pytest.raises(ValueError):
+        ShardPool.listen(("0.0.0.0", _free_port()), 1)
+
+
+def test_listen_generated_authkey_not_printed(capsys, caplog):
+    # 不等待worker，只看生成的密钥
+    pool = ShardPool.listen(("127.0.0.1", _free_port()), 0)
+    assert len(pool.authkey) == 32
+    assert pool.authkey.decode() not in capsys.readouterr().out
+    assert not caplog.records
+    # 显式开启DEBUG日志时才记录密钥
+    with caplog.at_level(logging.DEBUG, logger="DecisionTree.Distributed"):
+        pool = ShardPool.listen(("127.0.0.1", _free_port()), 0)
+    assert pool.authkey.decode() in caplog.text
+    assert pool.authkey.decode() not in capsys.readouterr().out
+
+
+def test_connect_requires_authkey():
+    with pytest.raises(ValueError):
+        connect(("127.0.0.1", _free_port()), (np.zeros((2, 2)), np.zeros(2)), None)
+
+
+def test_socket_workers_with_authkey():
+    x, y, _ = make_data("continuous", 1000, 4, seed=1)
+    address, res = ("127.0.0.1", _free_port()), {}
+    listener = threading.Thread(target=lambda: res.update(pool=ShardPool.listen(address, 2, "secret")))
+    listener.start()
+    workers = []
+    for i in range(2):
+        # 监听开始之前连接会被拒绝，worker重试几次
+        worker = Process(target=_connect_retry, args=(address, (x[i::2], y[i::2]), "secret"), daemon=True)
+        worker.start()
+        workers.append(worker)
+    listener.join(30)
+    with res["pool"] as pool:
+        sketch = pool.sketch()
+        assert sketch.n == len(x)
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+
+def _connect_retry(address, source, authkey):
+    for _ in range(50):
+        try:
+            return connect(address, source, authkey)
+        except ConnectionRefusedError:
+            time.sleep(0.1)
@@ -0,0 +1,55 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import CartTree, ID3Tree, C45Tree
+from DecisionTree.FlatTree import FlatTree
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree, C45Tree])
+def test_save_load_round_trip(tmp_path, tree_cls):
+    x, y, whether_continuous = make_data("mixed", 800, 6, n_class=3, seed=0)
+    tree = tree_cls(whether_continuous=whether_continuous, random_state=0)
+    tree.fit(x, y, feature_bound=None)
+    flat = tree.compile()
+    path = str(tmp_path / "tree.npz")
+    flat.save(path)
+    for mmap_mode in ("r", None):
+        loaded = FlatTree.load(path, mmap_mode)
+        assert np.array_equal(loaded.predict(x), flat.predict(x))
+        assert np.array_equal(loaded.predict_proba(x), flat.predict_proba(x))
+    assert np.array_equal(flat.predict(x), tree.predict(x))
+    function = flat.to_function()
+    assert [function(row) for row in x[:50].tolist()] == flat.predict(x[:50]).tolist()
+
+
+def test_string_features_round_trip(tmp_path):
+    rng = np.random.RandomState(1)
+    x = np.column_stack([rng.choice(["a", "b", "c"], 500), rng.rand(500)]).astype(object)
+    x[:, 1] = x[:, 1].astype(float)
+    y = np.where(x[:, 0] == "a", "yes", "no")
+    tree = CartTree(whether_continuous=[False, True])
+    tree.fit(x, y, train_only=True)
+    flat = tree.compile()
+    path = str(tmp_path / "tree.npz")
+    flat.save(path)
+    loaded = FlatTree.load(path)
+    assert np.array_equal(loaded.predict(x), y)
+
+
+def test_file_without_proba(tmp_path):
+    x, y, whether_continuous = make_data("continuous", 300, 4, seed=2)
+    tree = CartTree(whether_continuous=whether_continuous)
+    tree.fit(x, y, train_only=True)
+    flat = tree.compile()
+    # 加入proba之前的格式
+    flat.proba = None
+    arrays = {name: getattr(flat, name) for name in ("feature", "threshold", "kind", "left", "right", "category",
+                                                     "child_ptr", "child_values", "child_nodes")}
+    path = str(tmp_path / "old.npz")
+    with open(path, "wb") as f:
+        np.savez(f, labels_=flat.labels, **arrays)
+    loaded = FlatTree.load(path)
+    assert np.array_equal(loaded.predict(x), tree.predict(x))
+    with pytest.raises(ValueError):
+        loaded.predict_proba(x)
@@ -0,0 +1,116 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Cluster import Cluster
+from DecisionTree.GBDT import GBDT
+import numpy as np
+import pytest
+
+
+def _regression(n=2000, seed=0):
+    rng = np.random.RandomState(seed)
+    x = np.column_stack([rng.rand(n, 3), rng.randint(0, 6, n)])
+    y = np.sin(6 * x[:, 0]) + 2 * x[:, 1] ** 2 + np.array([0, 3, -1, 2, 1, -2])[x[:, 3].astype(int)]
+    return x, y + 0.1 * rng.randn(n)
+
+
+def test_squared_loss_lowers_training_mse():
+    x, y = _regression()
+    model = GBDT(n_estimators=60, n_iter_no_change=None, whether_continuous=[True, True, True, False])
+    model.fit(x, y)
+    assert len(model.trees) == 60
+    assert all(b <= a + 1e-12 for a, b in zip(model.train_loss, model.train_loss[1:]))
+    assert model.train_loss[-1] < 0.05 * np.var(y)
+    assert np.mean((model.predict(x) - y) ** 2) == pytest.approx(model.train_loss[-1])
+
+
+def test_logistic_loss_separates():
+    rng = np.random.RandomState(1)
+    x = rng.randn(1000, 3)
+    y = np.where(x[:, 0] + 0.5 * x[:, 1] > 0, "yes", "no")
+    model = GBDT(loss="logistic", n_estimators=100, learning_rate=0.3, n_iter_no_change=None).fit(x, y)
+    assert list(model.labels) == ["no", "yes"]
+    assert np.mean(model.predict(x) == y) > 0.98
+    proba = model.predict_proba(x)
+    assert np.allclose(proba.sum(axis=1), 1)
+    assert proba[y == "yes", 1].mean() > 0.9 and proba[y == "no", 1].mean() < 0.1
+    assert model.train_loss[-1] < 0.1
+
+
+def test_eval_set_early_stopping_keeps_best_iteration():
+    x, y = _regression(600, seed=2)
+    # 噪声很大，学习率很高，验证集上的损失很快就不再下降
+    y = y + 2 * np.random.RandomState(3).randn(len(y))
+    x_val, y_val = _regression(600, seed=4)
+    model = GBDT(n_estimators=300, learning_rate=0.5, min_samples_leaf=2, n_iter_no_change=5,
+                 whether_continuous=[True, True, True, False])
+    model.fit(x, y, eval_set=(x_val, y_val))
+    assert len(model.valid_loss) < 300
+    assert len(model.valid_loss) == model.best_iteration + 5
+    assert model.valid_loss[model.best_iteration - 1] == min(model.valid_loss)
+    # 之后的树被丢掉，模型在验证集上的损失就是最好一轮的
+    assert len(model.trees) == model.best_iteration
+    assert np.mean((model.predict(x_val) - y_val) ** 2) == pytest.approx(min(model.valid_loss))
+
+
+@pytest.mark.parametrize("loss", ["squared", "logistic"])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_sibling_subtraction_matches_direct_histogram(monkeypatch, loss, weighted):
+    x, y = _regression(1500, seed=5)
+    if loss == "logistic":
+        y = (y > np.median(y)).astype(int)
+    w = np.random.RandomState(6).rand(len(y)) if weighted else None
+    hists = []
+    _grad_split = Cluster.grad_split
+
+    # 按节点编号的顺序记录交给grad_split的直方图（包括由父节点减出来的）
+    def _record(self, hist, *args, **kwargs):
+        hists.append(hist.copy())
+        return _grad_split(self, hist, *args, **kwargs)
+
+    monkeypatch.setattr(Cluster, "grad_split", _record)
+    model = GBDT(loss=loss, n_estimators=1, n_iter_no_change=None, max_leaf_nodes=16, min_samples_leaf=5,
+                 whether_continuous=[True, True, True, False])
+    model.fit(x, y, sample_weight=w)
+    tree, codes = model.trees[0], model._codes(x)
+    g, h = np.empty(len(y), dtype=np.float32), np.empty(len(y), dtype=np.float32)
+    model._gradients(np.full(len(y), model.init_score), model._encode_y(y), None if w is None else w.astype(np.float32),
+                     g, h)
+    rows = {0: np.arange(len(y))}
+    for k in range(len(tree.feature)):
+        if tree.feature[k] >= 0:
+            mask = codes[rows[k], tree.feature[k]] < tree.split[k]
+            rows[tree.left[k]], rows[tree.right[k]] = rows[k][mask], rows[k][~mask]
+    assert len(hists) == len(tree.feature) > 3
+    for k, hist in enumerate(hists):
+        assert np.allclose(hist, model._histogram(codes, rows[k], g, h), atol=1e-6)
+
+
+def test_gradient_buffers_are_float32(monkeypatch):
+    x, y = _regression(500, seed=7)
+    buffers = []
+    _gradients = GBDT._gradients
+
+    def _record(self, raw, y, w, g, h):
+        buffers.append((g, h))
+        return _gradients(self, raw, y, w, g, h)
+
+    monkeypatch.setattr(GBDT, "_gradients", _record)
+    GBDT(loss="logistic", n_estimators=5, n_iter_no_change=None).fit(x, y > np.median(y), sample_weight=np.ones(500))
+    assert len(buffers) == 5
+    # 每轮原地更新同一对缓冲区
+    assert all(g.dtype == h.dtype == np.float32 for g, h in buffers)
+    assert all(g is buffers[0][0] and h is buffers[0][1] for g, h in buffers)
+
+
+def test_unseen_category_goes_to_majority_bin():
+    x, y = _regression(2000, seed=8)
+    # 离散特征取值为0, 2, 4, ...，3最多
+    x[:, 3] = x[:, 3] * 2
+    x[:800, 3] = 6
+    model = GBDT(n_estimators=30, n_iter_no_change=None, whether_continuous=[True, True, True, False]).fit(x, y)
+    assert model.unseen_bins[3] == model.binner.offsets[3] + 3
+    assert np.all(model.unseen_bins[:3] == -1)
+    rows = np.repeat(x[:1], 5, axis=0)
+    # 落在已知取值之间、比所有取值都小或都大的都按样本最多的取值6预测
+    rows[:, 3] = [6, 3, 7, -1, 100]
+    assert np.allclose(model.decision_function(rows), model.decision_function(rows[:1]))
+    assert model._codes(rows)[:, 3].tolist() == [model.unseen_bins[3]] * 5
@@ -0,0 +1,90 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import CartTree, ID3Tree, C45Tree
+import numpy as np
+import pytest
+
+
+def _leaves(tree):
+    return [node for node in {id(node): node for node in tree.nodes}.values() if node.category is not None]
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree, C45Tree])
+@pytest.mark.parametrize("max_leaf_nodes", [2, 5, 17])
+def test_max_leaf_nodes(tree_cls, max_leaf_nodes):
+    x, y, whether_continuous = make_data("mixed", 1000, 6, cardinality=3, n_class=3, seed=0)
+    tree = tree_cls(whether_continuous=whether_continuous, max_leaf_nodes=max_leaf_nodes)
+    tree.fit(x, y, train_only=True, feature_bound=None)
+    assert len(_leaves(tree)) <= max_leaf_nodes
+    # 多叉划分（离散特征有3个取值）一次就要多出2个叶节点，上限为2时ID3, C4.5可能一次也不能划分
+    assert len(_leaves(tree)) > 1 or max_leaf_nodes < 3
+
+
+def test_max_leaf_nodes_keeps_best_first_prefix():
+    # 按增益从大到小生成：叶节点上限较大的树的前几次划分与上限较小的树相同，训练集上的准确率不会更低
+    x, y, whether_continuous = make_data("continuous", 1000, 5, n_class=2, seed=1)
+    accs = []
+    for max_leaf_nodes in (2, 4, 8, 16):
+        tree = CartTree(whether_continuous=whether_continuous, max_leaf_nodes=max_leaf_nodes)
+        tree.fit(x, y, train_only=True, feature_bound=None)
+        accs.append(np.mean(tree.predict(x) == y))
+    assert accs == sorted(accs)
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree, C45Tree])
+@pytest.mark.parametrize("max_bins", [None, 32])
+def test_min_samples_leaf(tree_cls, max_bins):
+    x, y, whether_continuous = make_data("mixed", 1000, 6, cardinality=3, n_class=3, seed=2)
+    tree = tree_cls(whether_continuous=whether_continuous, min_samples_leaf=25)
+    tree.fit(x, y, train_only=True, feature_bound=None, max_bins=max_bins)
+    flat = tree.compile()
+    sizes = np.bincount(flat.apply(x), minlength=len(flat))
+    leaves = flat.kind == 0
+    assert np.sum(leaves) > 1
+    assert np.all(sizes[leaves] >= 25)
+
+
+# 线程池中各特征的计算顺序不定，但选择划分的结果必须与串行相同
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree, C45Tree])
+@pytest.mark.parametrize("max_bins", [None, 32])
+def test_n_jobs_matches_serial(tree_cls, max_bins):
+    x, y, whether_continuous = make_data("mixed", 1500, 8, cardinality=4, n_class=3, seed=3)
+    trees = []
+    for n_jobs in (None, 2):
+        tree = tree_cls(whether_continuous=whether_continuous, n_jobs=n_jobs, random_state=0)
+        tree.fit(x, y, train_only=True, max_bins=max_bins)
+        trees.append(tree)
+    serial, parallel = trees
+    assert [(node.feature_dim, node.tar) for node in serial.nodes] == [
+        (node.feature_dim, node.tar) for node in parallel.nodes]
+    assert np.array_equal(serial.predict(x), parallel.predict(x))
+    assert parallel._executor is None
+
+
+def _splits(node, x, res):
+    # 按训练数据向下分配样本，记录每个连续特征划分的阈值和该节点上这个特征的取值范围
+    if node.category is not None:
+        return res
+    col = x[:, node.feature_dim]
+    left = col < node.tar
+    res.append((node.feature_dim, node.tar, col.min(), col.max()))
+    _splits(node.left_child, x[left], res)
+    return _splits(node.right_child, x[~left], res)
+
+
+@pytest.mark.parametrize("n_thresholds", [1, 5])
+def test_random_splitter_reproducible(n_thresholds):
+    x, y, whether_continuous = make_data("continuous", 1500, 6, n_class=3, seed=4)
+    _state = np.random.get_state()
+    trees = []
+    for seed in (0, 0, 1):
+        tree = CartTree(whether_continuous=whether_continuous, splitter="random", n_thresholds=n_thresholds,
+                        random_state=seed, max_depth=8)
+        tree.fit(x, y, train_only=True, feature_bound=None)
+        trees.append(_splits(tree.root, x, []))
+    # 同一个random_state得到同一棵树，也不改变全局的随机状态
+    assert trees[0] == trees[1]
+    assert trees[0] != trees[2]
+    assert np.array_equal(_state[1], np.random.get_state()[1]) and _state[2] == np.random.get_state()[2]
+    for _, tar, lo, hi in trees[0]:
+        assert lo < tar <= hi
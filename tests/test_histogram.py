@@ -0,0 +1,54 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CVDNode import Node
+from DecisionTree.CvDTree import CartTree, ID3Tree, C45Tree
+import numpy as np
+import pytest
+
+
+# 连续特征只有不多于60个不同的取值，max_bins足够大时每个取值一个箱
+def _few_values(seed=0, n=1500):
+    x, y, whether_continuous = make_data("mixed", n, 6, cardinality=4, n_class=3, seed=seed)
+    x[:, whether_continuous] = np.round(x[:, whether_continuous] * 10) / 10
+    return x, y, whether_continuous
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree, C45Tree])
+@pytest.mark.parametrize("sample_weight", [False, True])
+def test_enough_bins_matches_exact(tree_cls, sample_weight):
+    x, y, whether_continuous = _few_values()
+    assert max(len(np.unique(col)) for col in x.T) <= 64
+    w = np.random.RandomState(1).rand(len(x)) if sample_weight else None
+    trees = []
+    for max_bins in (None, 64):
+        tree = tree_cls(whether_continuous=whether_continuous)
+        tree.fit(x, y, sample_weight=None if w is None else w.copy(), train_only=True, feature_bound=None,
+                 max_bins=max_bins)
+        trees.append(tree)
+    exact, hist = trees
+    assert len({id(node) for node in hist.nodes}) == len({id(node) for node in exact.nodes})
+    assert np.array_equal(hist.predict(x), exact.predict(x))
+    assert np.allclose(hist.predict_proba(x), exact.predict_proba(x))
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, C45Tree])
+def test_sibling_subtraction(monkeypatch, tree_cls):
+    original, checked = Node._children_hist, []
+
+    # 由父节点减去其他子节点得到的直方图必须与直接统计的相同
+    def _checked(self, branch, n_branch, cluster=None, hist=None):
+        hists = original(self, branch, n_branch, cluster, hist)
+        if hist is not None:
+            for i, _hist in enumerate(hists):
+                if _hist is not None:
+                    direct = cluster.histogram(self.tree.hist_feats, self.tree.max_bins, hist.shape[2], branch == i)
+                    assert np.allclose(_hist, direct)
+                    checked.append(i)
+        return hists
+
+    monkeypatch.setattr(Node, "_children_hist", _checked)
+    x, y, whether_continuous = make_data("mixed", 2000, 6, cardinality=4, n_class=3, seed=2)
+    tree = tree_cls(whether_continuous=whether_continuous)
+    tree.fit(x, y, sample_weight=np.random.RandomState(0).rand(len(x)), train_only=True, feature_bound=None,
+             max_bins=32)
+    assert len(checked) > 10
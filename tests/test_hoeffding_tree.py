@@ -0,0 +1,46 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.HoeffdingTree import HoeffdingTree
+import numpy as np
+
+
+# x0 < 0.5时类别为0，否则类别与特征无关：根节点划分一次之后右子节点只有噪声
+def _noise_data(seed, n=6000):
+    rng = np.random.RandomState(seed)
+    x = rng.rand(n, 4)
+    return x, np.where(x[:, 0] < 0.5, 0, rng.randint(2, size=n))
+
+
+class _Recorder(HoeffdingTree):
+    def __init__(self, **kwargs):
+        HoeffdingTree.__init__(self, **kwargs)
+        self.calls = []
+
+    def _try_split(self, node, hist, n):
+        # 第0个特征是连续的，它的各箱之和就是直方图中的样本数
+        self.calls.append((n, hist[self.binner.offsets[0]:self.binner.offsets[1]].sum()))
+        return HoeffdingTree._try_split(self, node, hist, n)
+
+
+def test_bound_uses_histogram_size():
+    x, y = _noise_data(0)
+    tree = _Recorder().fit(x, y, chunk_size=500)
+    assert len(tree._nodes) > 1
+    n, in_hist = np.array(tree.calls).T
+    assert np.allclose(n, in_hist)
+
+
+def test_no_split_on_noise_before_enough_evidence():
+    # 右子节点的直方图不到3224个样本，tie_threshold=0.05的界还没满足，不应在噪声上划分
+    for seed in range(5):
+        x, y = _noise_data(seed)
+        tree = HoeffdingTree(delta=1e-7, grace_period=200, tie_threshold=0.05).fit(x, y, chunk_size=500)
+        assert len(tree._nodes) == 3
+
+
+def test_partial_fit_matches_fit():
+    x, y = _noise_data(1, 3000)
+    a = HoeffdingTree().fit(x, y, chunk_size=300)
+    b = HoeffdingTree()
+    for start in range(0, len(x), 300):
+        b.partial_fit(x[start:start + 300], y[start:start + 300], classes=[0, 1])
+    assert np.array_equal(a.predict(x), b.predict(x))
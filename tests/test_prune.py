@@ -0,0 +1,55 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import ID3Tree, C45Tree, _prune_ok
+import pickle
+import sys
+import numpy as np
+import pytest
+
+
+# 朴素的自底向上代价复杂度剪枝：每个节点都重新对子树的叶节点求和，返回要变成叶节点的节点
+def _naive_prune(node, alpha, collapse):
+    if node.category is not None:
+        return node.chaos * node._n, 1
+    sub_cost, sub_leafs = 0.0, 0
+    for child in node.children.values():
+        if child is not None:
+            cost, leafs = _naive_prune(child, alpha, collapse)
+            sub_cost, sub_leafs = sub_cost + cost, sub_leafs + leafs
+    if _prune_ok(sub_cost + alpha * sub_leafs, node.chaos * node._n + alpha):
+        collapse.append(node)
+        return node.chaos * node._n, 1
+    return sub_cost, sub_leafs
+
+
+def _leaf_paths(node, path=()):
+    if node.category is not None:
+        return [(path, int(node.category), node.chaos * node._n)]
+    return [leaf for key, child in sorted(node.children.items(), key=lambda item: str(item[0]))
+            if child is not None for leaf in _leaf_paths(child, path + (str(key),))]
+
+
+@pytest.mark.parametrize("tree_cls", [ID3Tree, C45Tree])
+@pytest.mark.parametrize("kind", ["mixed", "categorical"])
+def test_heap_prune_matches_naive(tree_cls, kind):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    x, y, whether_continuous = make_data(kind, 800, 6, cardinality=4, n_class=3, seed=0)
+    tree = tree_cls(whether_continuous=whether_continuous)
+    tree.fit(x, y, train_only=True, feature_bound=None, prune=False)
+    blob = pickle.dumps(tree)
+    for alpha in (0.0, 0.5, 2.0, 5.0, 20.0, 1e4):
+        heap = pickle.loads(blob)
+        heap.prune_alpha = alpha
+        heap._prune()
+        naive, collapse = pickle.loads(blob), []
+        _naive_prune(naive.root, alpha, collapse)
+        # collapse是自底向上的顺序，反过来先剪上层的节点，被剪掉的子孙不用再处理
+        for node in reversed(collapse):
+            if not node.pruned and node.category is None:
+                node.prune()
+        leaves = _leaf_paths(naive.root)
+        assert _leaf_paths(heap.root) == leaves
+        # 剪枝时沿路径更新的缓存与重新求和的结果相同
+        assert heap.root.n_leafs == len(leaves)
+        assert heap.root.leaf_cost == pytest.approx(sum(cost for _, _, cost in leaves))
+        assert np.array_equal(heap.predict(x), naive.predict(x))
@@ -0,0 +1,57 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import CartTree
+import pickle
+import numpy as np
+import pytest
+
+
+def _fitted(kind, seed=0):
+    x, y, whether_continuous = make_data(kind, 800, 6, cardinality=5, n_class=3, seed=seed)
+    x_cv, y_cv, _ = make_data(kind, 400, 6, cardinality=5, n_class=3, seed=seed + 50)
+    tree = CartTree(whether_continuous=whether_continuous)
+    tree.fit(x, y, train_only=True, feature_bound=None)
+    return tree, x_cv, y_cv
+
+
+# 剪掉剪枝路径上的前k个节点，返回剪枝后的树
+def _pruned(blob, k):
+    tree = pickle.loads(blob)
+    for _, node in tree.prune_path[:k]:
+        node.prune()
+    tree.nodes = []
+    tree.root.feed_tree(tree)
+    tree._flat = None
+    return tree
+
+
+def _n_leafs(tree):
+    return len({id(node) for node in tree.nodes if node.category is not None})
+
+
+@pytest.mark.parametrize("kind", ["continuous", "mixed", "categorical"])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_path_acc_matches_pruning(kind, weighted):
+    tree, x_cv, y_cv = _fitted(kind)
+    tree._cart_prune()
+    weights = np.random.RandomState(0).rand(len(y_cv)) if weighted else None
+    acc = tree._prune_path_acc(x_cv, y_cv, weights)
+    assert len(acc) == len(tree.prune_path) + 1 > 2
+    blob = pickle.dumps(tree)
+    for k in range(len(acc)):
+        pred = _pruned(blob, k).predict(x_cv)
+        assert acc[k] == pytest.approx(np.average(pred == y_cv, weights=weights))
+
+
+# 准确率最高的子树中保留剪得最少（最大）的那一棵
+@pytest.mark.parametrize("kind", ["continuous", "mixed", "categorical"])
+def test_prune_picks_largest_best_subtree(kind):
+    tree, x_cv, y_cv = _fitted(kind, seed=1)
+    tree._cart_prune()
+    acc = tree._prune_path_acc(x_cv, y_cv)
+    best = int(np.flatnonzero(acc == acc.max())[0])
+    expected = _pruned(pickle.dumps(tree), best)
+    tree.prune_(x_cv, y_cv)
+    assert np.mean(tree.predict(x_cv) == y_cv) == pytest.approx(acc.max())
+    assert _n_leafs(tree) == _n_leafs(expected)
+    assert np.array_equal(tree.predict(x_cv), expected.predict(x_cv))
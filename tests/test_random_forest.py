@@ -0,0 +1,45 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.RandomForest import RandomForest
+import numpy as np
+
+
+def _string_data():
+    x, y, whether_continuous = make_data("mixed", 600, 6, cardinality=4, seed=1)
+    x = x.astype(object)
+    x[:, ~whether_continuous] = np.array(["v%d" % v for v in x[:, ~whether_continuous].ravel()]).reshape(
+        len(x), -1)
+    return x, y, whether_continuous
+
+
+def test_string_features():
+    x, y, whether_continuous = _string_data()
+    forest = RandomForest(n_estimators=5, whether_continuous=whether_continuous).fit(x, y, seed=0)
+    pred = forest.predict(x)
+    assert np.mean(pred == y) > 0.8
+    proba = forest.predict_proba(x)
+    assert np.allclose(proba.sum(axis=1), 1, atol=1e-5)
+    assert np.array_equal(forest.labels[np.argmax(forest.votes(x), axis=1)], pred)
+
+
+def test_string_features_in_process_pool():
+    x, y, whether_continuous = _string_data()
+    serial = RandomForest(n_estimators=3, whether_continuous=whether_continuous).fit(x, y, seed=0)
+    parallel = RandomForest(n_estimators=3, n_jobs=2, whether_continuous=whether_continuous).fit(x, y, seed=0)
+    assert np.array_equal(serial.predict(x), parallel.predict(x))
+
+
+def test_global_random_state_untouched():
+    x, y, _ = make_data("continuous", 300, 5, seed=2)
+    np.random.seed(123)
+    expected = np.random.rand()
+    np.random.seed(123)
+    RandomForest(n_estimators=3).fit(x, y, seed=0)
+    assert np.random.rand() == expected
+
+
+def test_seed_reproducible():
+    x, y, _ = make_data("continuous", 300, 5, seed=3)
+    a = RandomForest(n_estimators=4).fit(x, y, seed=7).predict_proba(x)
+    b = RandomForest(n_estimators=4).fit(x, y, seed=7).predict_proba(x)
+    assert np.array_equal(a, b)
@@ -0,0 +1,51 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import CartTree, ID3Tree, C45Tree
+import pickle
+import sys
+import numpy as np
+import pytest
+
+
+def _check_grid(tree_cls, seed, exact_thresholds=False):
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    x, y, whether_continuous = make_data("mixed", 300, 6, cardinality=4, n_class=3, seed=seed)
+    x_val, y_val, _ = make_data("mixed", 300, 6, cardinality=4, n_class=3, seed=seed + 100)
+    tree = tree_cls(whether_continuous=whether_continuous, random_state=seed)
+    tree.fit(x, y, train_only=True, feature_bound=None, prune=False)
+    blob = pickle.dumps(tree)
+    alphas = None
+    if exact_thresholds:
+        tree._cart_prune()
+        alphas = sorted({alpha for alpha, _ in tree.prune_path})
+    res = tree.search(x_val, y_val, alphas=alphas)
+    for i, depth in enumerate(res["depths"]):
+        for j, alpha in enumerate(res["alphas"]):
+            pruned = pickle.loads(blob)
+            pruned.prune_to(int(depth), float(alpha))
+            assert np.mean(pruned.predict(x_val) == y_val) == pytest.approx(res["score"][i, j])
+            assert sum(node.category is not None for node in pruned.nodes) == res["n_leafs"][i, j]
+            assert pruned.max_depth is None and pruned.pruned_depth == depth
+
+
+# search的每一格都要与prune_to实际得到的子树一致
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree, C45Tree])
+@pytest.mark.parametrize("seed", range(2))
+def test_search_matches_prune_to(tree_cls, seed):
+    _check_grid(tree_cls, seed)
+
+
+# alpha恰好是剪枝路径上的阈值（剪与不剪的损失函数相等）时两者也要一致
+@pytest.mark.parametrize("tree_cls", [CartTree, C45Tree])
+def test_search_matches_prune_to_on_thresholds(tree_cls):
+    _check_grid(tree_cls, 3, exact_thresholds=True)
+
+
+def test_fit_search_keeps_max_depth():
+    x, y, whether_continuous = make_data("mixed", 800, 6, n_class=3, seed=5)
+    tree = CartTree(max_depth=8, whether_continuous=whether_continuous, random_state=0)
+    res = tree.fit_search(x, y, feature_bound=None)
+    assert tree.max_depth == 8
+    assert tree.pruned_depth == res["best"][0]
+    assert tree.prune_alpha == res["best"][1]
+    assert tree.root.height <= tree.pruned_depth + 1
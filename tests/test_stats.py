@@ -0,0 +1,39 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import CartTree, ID3Tree, C45Tree
+import pickle
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree, C45Tree])
+@pytest.mark.parametrize("max_bins", [None, 32])
+def test_stats_filled_after_fit(tree_cls, max_bins):
+    x, y, whether_continuous = make_data("mixed", 600, 6, cardinality=3, n_class=3, seed=0)
+    tree = tree_cls(whether_continuous=whether_continuous, stats=True, random_state=0)
+    tree.fit(x, y, max_bins=max_bins)
+    counters, timings = tree.stats.counters, tree.stats.timings
+    assert counters["splits"] > 0 and counters["thresholds"] > 0
+    assert counters["nodes"] >= 2 * counters["splits"]
+    if tree_cls is CartTree:
+        assert counters["nodes"] == 2 * counters["splits"]
+    if max_bins is not None:
+        assert counters["hist_bytes"] > 0
+    for name in ("fit", "split_search", "partition", "prune"):
+        assert timings[name] > 0
+    assert timings["fit"] >= timings["split_search"] + timings["prune"]
+    assert tree.stats.levels
+    # 只保存统计量，可以随树一起pickle
+    assert pickle.loads(pickle.dumps(tree.stats)).as_dict() == tree.stats.as_dict()
+
+
+def test_stats_off_by_default_and_reset_per_fit():
+    x, y, whether_continuous = make_data("continuous", 400, 4, seed=1)
+    tree = CartTree(whether_continuous=whether_continuous)
+    tree.fit(x, y)
+    assert tree.stats is None
+    tree = CartTree(whether_continuous=whether_continuous, stats=True)
+    tree.fit(x, y, train_only=True, feature_bound=None)
+    first = dict(tree.stats.counters)
+    tree.fit(x, y, train_only=True, feature_bound=None)
+    assert tree.stats.counters == first
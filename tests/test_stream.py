@@ -0,0 +1,25 @@
+# -*- coding:utf-8 -*-
+from DecisionTree.Benchmark import make_data
+from DecisionTree.CvDTree import CartTree, ID3Tree
+from DecisionTree.Stream import ChunkSource
+import numpy as np
+import pytest
+
+
+def test_chunked_matches_single_chunk():
+    x, y, whether_continuous = make_data("mixed", 2000, 6, n_class=3, seed=0)
+    a = CartTree(whether_continuous=whether_continuous)
+    a.fit_stream((x, y), feature_bound=None, max_bins=32)
+    b = CartTree(whether_continuous=whether_continuous)
+    b.fit_stream(ChunkSource(x, y, chunk_size=300), feature_bound=None, max_bins=32)
+    assert np.array_equal(a.predict(x), b.predict(x))
+
+
+@pytest.mark.parametrize("tree_cls", [CartTree, ID3Tree])
+def test_root_leaf(tree_cls):
+    # 只有一个特征时根节点直接满足停止准则
+    x, y, _ = make_data("continuous", 500, 1, seed=1)
+    tree = tree_cls()
+    tree.fit_stream((x, y), feature_bound=None)
+    assert len(np.unique(tree.predict(x))) == 1
+    assert tree.root.leaf_cost == pytest.approx(tree.root.chaos * len(x))